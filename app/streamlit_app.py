@@ -88,23 +88,48 @@ def test_api_connections():
         except Exception as e:
             st.error(f"❌ API测试异常: {str(e)}")
 
+def stream_debate(topic: str) -> dict:
+    """
+    流式展示八仙论道：谁的数据先到谁先发言，不必等待最慢的服务商
+    
+    所有浏览器会话共用进程内的负载均衡器，共享已预热的缓存与限速配额。
+    
+    Returns:
+        仙人名称到API调用结果的映射（按完成顺序）
+    """
+    import asyncio
+    from config.doppler_config import get_rapidapi_key
+    from src.jixia.engines.jixia_load_balancer import get_shared_load_balancer
+    
+    balancer = get_shared_load_balancer(get_rapidapi_key())
+    total = len(balancer.immortal_api_mapping['stock_quote'])
+    progress = st.progress(0.0, text=f"🏛️ 八仙正在就 {topic} 展开论道...")
+    results = {}
+    
+    async def consume():
+        async for immortal_name, result in balancer.stream_immortal_debate(topic):
+            results[immortal_name] = result
+            progress.progress(len(results) / total, text=f"🎭 {immortal_name} 已发言 ({len(results)}/{total})")
+            if result.success:
+                st.write(f"🎭 **{immortal_name}**: 基于 {result.api_used} 数据发言")
+            else:
+                st.write(f"😔 **{immortal_name}**: 暂时无法获取数据 ({result.error})")
+    
+    asyncio.run(consume())
+    progress.empty()
+    return results
+
 def start_jixia_debate():
     """启动稷下学宫辩论"""
-    with st.spinner("正在启动稷下学宫八仙论道..."):
-        try:
-            from config.doppler_config import get_rapidapi_key
-            from src.jixia.engines.perpetual_engine import JixiaPerpetualEngine
-            
-            api_key = get_rapidapi_key()
-            engine = JixiaPerpetualEngine(api_key)
-            
-            # 运行辩论
-            results = engine.simulate_jixia_debate('TSLA')
-            
-            st.success("✅ 八仙论道完成")
-            st.json(results)
-        except Exception as e:
-            st.error(f"❌ 辩论启动失败: {str(e)}")
+    try:
+        # 运行辩论（逐位仙人展示）
+        results = stream_debate('TSLA')
+        
+        st.success("✅ 八仙论道完成")
+        st.json({name: {'success': result.success, 'api_used': result.api_used, 'error': result.error}
+                 for name, result in results.items()})
+    except Exception as e:
+        st.error(f"❌ 辩论启动失败: {str(e)}")
 
 def start_swarm_debate():
     """启动Swarm八仙论道"""
@@ -242,37 +267,31 @@ def start_debate_session(topic: str):
         st.error("请输入辩论主题")
         return
     
-    with st.spinner(f"🏛️ 八仙正在就 {topic} 展开论道..."):
-        try:
-            from config.doppler_config import get_rapidapi_key
-            from src.jixia.engines.perpetual_engine import JixiaPerpetualEngine
-            from datetime import datetime
-            
-            api_key = get_rapidapi_key()
-            engine = JixiaPerpetualEngine(api_key)
-            
-            # 运行辩论
-            results = engine.simulate_jixia_debate(topic)
-            
-            # 保存到会话状态
-            if 'debate_history' not in st.session_state:
-                st.session_state.debate_history = []
-            
-            st.session_state.debate_history.append({
-                'topic': topic,
-                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'results': {name: {'success': result.success, 'api_used': result.api_used} 
-                           for name, result in results.items()}
-            })
-            
-            st.success(f"✅ 八仙论道完成！共有 {len(results)} 位仙人参与")
-            
-            # 显示结果摘要
-            successful_debates = sum(1 for result in results.values() if result.success)
-            st.info(f"📊 成功获取数据: {successful_debates}/{len(results)} 位仙人")
-            
-        except Exception as e:
-            st.error(f"❌ 辩论启动失败: {str(e)}")
+    try:
+        from datetime import datetime
+        
+        # 运行辩论（逐位仙人展示）
+        results = stream_debate(topic)
+        
+        # 保存到会话状态
+        if 'debate_history' not in st.session_state:
+            st.session_state.debate_history = []
+        
+        st.session_state.debate_history.append({
+            'topic': topic,
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'results': {name: {'success': result.success, 'api_used': result.api_used} 
+                       for name, result in results.items()}
+        })
+        
+        st.success(f"✅ 八仙论道完成！共有 {len(results)} 位仙人参与")
+        
+        # 显示结果摘要
+        successful_debates = sum(1 for result in results.values() if result.success)
+        st.info(f"📊 成功获取数据: {successful_debates}/{len(results)} 位仙人")
+        
+    except Exception as e:
+        st.error(f"❌ 辩论启动失败: {str(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -64,6 +64,17 @@ def get_database_config() -> Dict[str, str]:
         'zilliz_token': get_secret('ZILLIZ_TOKEN', '')
     }
 
+def get_state_dir() -> str:
+    """
+    获取本地运行状态目录（限速计数、缓存等持久化文件）
+    
+    Returns:
+        状态目录路径，目录不存在时自动创建
+    """
+    state_dir = get_secret('JIXIA_STATE_DIR', '') or os.path.join(os.path.expanduser('~'), '.jixia')
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
 def validate_config() -> bool:
     """
     验证必要的配置是否存在
@@ -121,42 +121,46 @@ class RSSNewsCollector:
         
         return all_news
     
-    async def store_news_to_mongodb(self, articles: List[Dict[str, Any]], collection_name: str = "news_articles") -> Dict[str, Any]:
-        """将新闻存储到MongoDB"""
+    async def store_news_to_mongodb(self, articles: List[Dict[str, Any]], collection_name: str = "news_articles",
+                                    transaction: bool = False) -> Dict[str, Any]:
+        """
+        将新闻存储到MongoDB
+        
+        每篇文章按 article_id 做一次upsert（已存在则更新，否则插入），
+        全部写入在一次批量调用中完成；transaction=True 时在同一事务中写入（需要副本集）
+        """
         if not articles:
             return {'success': True, 'inserted_count': 0, 'updated_count': 0}
         
+        calls = [
+            ('update_document', {
+                'collection_name': collection_name,
+                'query': {'article_id': article['article_id']},
+                'update': {'$set': article},
+                'upsert': True
+            })
+            for article in articles
+        ]
+        batch_result = self.mongodb_client.batch(calls, transaction=transaction, ordered=transaction)
+        
         inserted_count = 0
         updated_count = 0
-        
-        for article in articles:
-            # 检查文章是否已存在
-            existing = self.mongodb_client.find_documents(
-                collection_name,
-                query={'article_id': article['article_id']},
-                limit=1
-            )
-            
-            if existing.get('success') and existing.get('documents'):
-                # 更新现有文章
-                update_result = self.mongodb_client.update_document(
-                    collection_name,
-                    query={'article_id': article['article_id']},
-                    update={'$set': article}
-                )
-                if update_result.get('success'):
-                    updated_count += 1
+        for result in batch_result.get('results', []):
+            if not result.get('success'):
+                continue
+            if result.get('upserted_id'):
+                inserted_count += 1
             else:
-                # 插入新文章
-                insert_result = self.mongodb_client.insert_document(
-                    collection_name,
-                    document=article
-                )
-                if insert_result.get('success'):
-                    inserted_count += 1
+                updated_count += 1
+        
+        if batch_result.get('aborted'):
+            # 事务已回滚，前面成功的写入都不算数
+            inserted_count = updated_count = 0
+        if not batch_result.get('success'):
+            self.logger.error(f"批量存储新闻失败: {batch_result.get('error')}")
         
         return {
-            'success': True,
+            'success': batch_result.get('success', False),
             'inserted_count': inserted_count,
             'updated_count': updated_count,
             'total_processed': len(articles)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+报价标准化基准测试
+对每个服务商的响应样本，测量 JSON解码 + 标准化 的吞吐量（报价/秒），
+比较已安装的各JSON后端，以及输出报价字典与报价记录两种格式
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.jixia.engines.json_backend import BACKEND, available_backends
+from src.jixia.engines.quote_schema import QUOTE_EXTRACTORS
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures' / 'rapidapi'
+
+# 样本文件 -> 服务商
+FIXTURES = {
+    'alpha_vantage_quote.json': 'alpha_vantage',
+    'yahoo_finance_15_quote.json': 'yahoo_finance_15',
+    'yahoo_finance_15_batch.json': 'yahoo_finance_15',
+    'yh_finance_quotes.json': 'yh_finance',
+    'webull_search.json': 'webull',
+    'seeking_alpha_profile.json': 'seeking_alpha'
+}
+
+def measure(fn: Callable[[], int], seconds: float) -> float:
+    """在给定时间内反复执行fn，返回每秒处理的报价数"""
+    quotes = 0
+    iterations = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        quotes += fn()
+        iterations += 1
+        if iterations % 50 == 0 and time.perf_counter() >= deadline:
+            break
+    return quotes / (time.perf_counter() - start)
+
+def benchmark_fixture(name: str, api_source: str, seconds: float) -> Dict[str, float]:
+    """测试单个样本，返回各场景的吞吐量"""
+    payload = (FIXTURES_DIR / name).read_bytes()
+    extractor = QUOTE_EXTRACTORS[api_source]
+    results = {}
+
+    for backend, loads in available_backends().items():
+        results[f"{backend} + records"] = measure(lambda: len(extractor.records(loads(payload))), seconds)
+
+    decoded = available_backends()[BACKEND](payload)
+    results['records only'] = measure(lambda: len(extractor.records(decoded)), seconds)
+    results['dicts only'] = measure(
+        lambda: len([record.to_dict() for record in extractor.records(decoded)]), seconds
+    )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='报价标准化吞吐量基准测试')
+    parser.add_argument('--seconds', type=float, default=0.5, help='每个场景的测量时间（秒）')
+    args = parser.parse_args()
+
+    print(f"🏁 报价标准化基准测试 (默认JSON后端: {BACKEND}, 可用: {', '.join(available_backends())})")
+    print("=" * 72)
+
+    for name, api_source in FIXTURES.items():
+        quotes = len(QUOTE_EXTRACTORS[api_source].records(
+            available_backends()[BACKEND]((FIXTURES_DIR / name).read_bytes())
+        ))
+        print(f"\n📄 {name} ({api_source}, {quotes} 只股票/响应)")
+        for scenario, rate in benchmark_fixture(name, api_source, args.seconds).items():
+            print(f"   {scenario:<22} {rate:>14,.0f} 报价/秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+论道流量回放基准测试
+启动本地RapidAPI模拟服务器，在多种上游状况下回放八仙论道流量，
+分别通过 JixiaLoadBalancer 与 JixiaPerpetualEngine，报告吞吐量、尾延迟与各服务商配额消耗
+
+用法:
+    python scripts/benchmark_replay.py --debates 20
+    python scripts/benchmark_replay.py --scenario slow_alpha_vantage --engine load_balancer
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_rapidapi_server import FakeRapidAPIServer, ProviderProfile
+
+# 上游状况
+SCENARIOS: Dict[str, Dict[str, ProviderProfile]] = {
+    'healthy': {},
+    'slow_alpha_vantage': {
+        'alpha_vantage': ProviderProfile(latency_median=0.6, latency_sigma=0.8)
+    },
+    'flaky_yahoo': {
+        'yahoo_finance_15': ProviderProfile(latency_median=0.08, error_rate=0.3)
+    },
+    'webull_429_bursts': {
+        'webull': ProviderProfile(latency_median=0.05, burst_every=2.0, burst_duration=1.0)
+    }
+}
+
+# 论道主题：热门股票被讨论得更频繁
+WATCHLIST = ['TSLA', 'NVDA', 'AAPL', 'MSFT', 'AMZN', 'META', 'GOOGL', 'AMD', 'NFLX', 'PLTR']
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def debate_topics(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WATCHLIST))]
+    return rng.choices(WATCHLIST, weights=weights, k=count)
+
+def replay_load_balancer(rapidapi_key: str) -> Callable[[str], float]:
+    from src.jixia.engines.jixia_load_balancer import JixiaLoadBalancer
+    
+    balancer = JixiaLoadBalancer(rapidapi_key, disk_cache_path='')
+    
+    def run(topic: str) -> float:
+        results = balancer.conduct_immortal_debate(topic)
+        # 部分仙人同时关注公司概况与市场新闻
+        for immortal in ('吕洞宾', '何仙姑'):
+            balancer.get_data_for_immortal(immortal, 'company_overview', topic)
+        balancer.get_data_for_immortal('曹国舅', 'market_news', topic)
+        return sum(1 for result in results.values() if result.success) / len(results)
+    
+    return run
+
+def replay_perpetual_engine(rapidapi_key: str) -> Callable[[str], float]:
+    from src.jixia.engines.perpetual_engine import JixiaPerpetualEngine
+    
+    engine = JixiaPerpetualEngine(rapidapi_key, disk_cache_path='')
+    
+    def run(topic: str) -> float:
+        # 与 simulate_jixia_debate 相同：编译数据计划后按计划请求
+        results = engine.execute_plan(engine.compile_debate_plan(topic))
+        return sum(result.success for result in results.values()) / len(results)
+    
+    return run
+
+ENGINES = {
+    'load_balancer': replay_load_balancer,
+    'perpetual_engine': replay_perpetual_engine
+}
+
+def run_scenario(scenario: str, engine: str, debates: int, seed: int, state_root: str) -> Dict[str, Any]:
+    """在一种上游状况下回放一个引擎的论道流量"""
+    topics = debate_topics(debates, seed)
+    with FakeRapidAPIServer(profiles=SCENARIOS[scenario], seed=seed) as server:
+        # 每次回放使用独立的限速状态与上游地址
+        os.environ['JIXIA_UPSTREAM_BASE_URL'] = server.base_url
+        os.environ['JIXIA_STATE_DIR'] = tempfile.mkdtemp(prefix=f"{scenario}-{engine}-", dir=state_root)
+        
+        latencies = []
+        success_rates = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = ENGINES[engine]('fake-rapidapi-key')
+            started = time.perf_counter()
+            for topic in topics:
+                debate_started = time.perf_counter()
+                success_rates.append(run(topic))
+                latencies.append(time.perf_counter() - debate_started)
+            elapsed = time.perf_counter() - started
+        
+        return {
+            'scenario': scenario,
+            'engine': engine,
+            'debates': debates,
+            'throughput': debates / elapsed,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'success_rate': sum(success_rates) / len(success_rates),
+            'upstream': {provider: sum(counts.values()) for provider, counts in server.request_counts.items()},
+            'errors': {
+                provider: {status: count for status, count in counts.items() if status != '200'}
+                for provider, counts in server.request_counts.items()
+                if any(status != '200' for status in counts)
+            }
+        }
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n🎭 {report['scenario']} / {report['engine']} ({report['debates']} 场论道)")
+    print(f"   吞吐量: {report['throughput']:.2f} 场/秒   成功率: {report['success_rate'] * 100:.1f}%")
+    print(f"   单场耗时: p50 {report['p50'] * 1000:.0f}ms, p95 {report['p95'] * 1000:.0f}ms, "
+          f"p99 {report['p99'] * 1000:.0f}ms")
+    total = sum(report['upstream'].values())
+    usage = ', '.join(f"{provider} {count}" for provider, count in sorted(report['upstream'].items()))
+    print(f"   上游调用: {total} 次 ({total / report['debates']:.1f} 次/场) — {usage}")
+    if report['errors']:
+        print(f"   上游错误: {report['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='论道流量回放基准测试')
+    parser.add_argument('--debates', type=int, default=20, help='每种配置回放的论道场数')
+    parser.add_argument('--scenario', choices=list(SCENARIOS), action='append', help='上游状况（可多次指定，默认全部）')
+    parser.add_argument('--engine', choices=list(ENGINES), action='append', help='引擎（可多次指定，默认全部）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    # 限速器在退出时才写入状态，临时目录需在其之后删除（atexit按注册的逆序执行）
+    state_root = tempfile.mkdtemp(prefix='jixia-replay-')
+    atexit.register(shutil.rmtree, state_root, True)
+    
+    print("🏁 论道流量回放基准测试")
+    print("=" * 72)
+    for scenario in args.scenario or list(SCENARIOS):
+        for engine in args.engine or list(ENGINES):
+            print_report(run_scenario(scenario, engine, args.debates, args.seed, state_root))
+
+if __name__ == "__main__":
+    main()
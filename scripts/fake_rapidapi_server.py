@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+本地RapidAPI模拟服务器
+用录制的响应样本模拟 alpha_vantage、yahoo_finance_15、webull、seeking_alpha 与 yh_finance，
+可按服务商配置延迟分布、错误率与周期性429限流，无需真实密钥即可运行负载均衡器与永动机引擎
+
+用法:
+    python scripts/fake_rapidapi_server.py --port 8765
+    JIXIA_UPSTREAM_BASE_URL=http://127.0.0.1:8765 python -m src.jixia.engines.jixia_load_balancer
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.jixia.engines.provider_registry import get_registry
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures' / 'rapidapi'
+
+@dataclass
+class ProviderProfile:
+    """单个服务商的模拟行为"""
+    latency_median: float = 0.05   # 延迟中位数（秒），按对数正态分布采样
+    latency_sigma: float = 0.5     # 对数正态分布的sigma，越大长尾越重
+    error_rate: float = 0.0        # 返回503的概率
+    burst_every: float = 0.0       # 每隔多少秒出现一次429限流窗口，0表示不限流
+    burst_duration: float = 0.0    # 每次429限流窗口持续的秒数
+    
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.latency_median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+# 服务商 -> RapidAPI主机（已接入路由的服务商，来自服务商注册表）
+PROVIDER_HOSTS = {name: get_registry().host(name) for name in get_registry().routable}
+
+def _load(name: str) -> Any:
+    with open(FIXTURES_DIR / name, encoding='utf-8') as f:
+        return json.load(f)
+
+def _symbols(value: Optional[str]) -> List[str]:
+    return [symbol.strip().upper() for symbol in unquote(value or 'AAPL').split(',') if symbol.strip()]
+
+def _jitter(symbol: str, value: float) -> float:
+    """按股票代码确定性地调整价格，同一股票多次请求结果一致"""
+    return round(value * (0.5 + (zlib.crc32(symbol.encode()) % 1000) / 1000), 2)
+
+class FixtureRouter:
+    """按 X-RapidAPI-Host 与路径选择样本，并把请求中的股票代码写入响应"""
+    
+    def __init__(self):
+        self.fixtures = {path.name: _load(path.name) for path in FIXTURES_DIR.glob('*.json')}
+        # (服务商, 路径前缀, 查询参数条件, 处理函数)
+        self.routes: List[Tuple[str, str, Dict[str, str], Callable[[str, Dict[str, str]], Any]]] = [
+            ('alpha_vantage', '/query', {'function': 'GLOBAL_QUOTE'}, self._alpha_vantage_quote),
+            ('alpha_vantage', '/query', {'function': 'OVERVIEW'}, self._alpha_vantage_overview),
+            ('alpha_vantage', '/query', {'function': 'EARNINGS'}, self._alpha_vantage_earnings),
+            ('yahoo_finance_15', '/api/yahoo/qu/quote/', {}, self._yahoo_quote),
+            ('yahoo_finance_15', '/api/yahoo/co/collections/', {}, self._static('yahoo_finance_15_movers.json')),
+            ('yahoo_finance_15', '/api/yahoo/ne/news', {}, self._static('yahoo_finance_15_news.json')),
+            ('webull', '/stock/search', {}, self._webull_search),
+            ('webull', '/market/get-active-gainers', {}, self._static('webull_gainers.json')),
+            ('seeking_alpha', '/symbols/get-profile', {}, self._seeking_alpha_profile),
+            ('seeking_alpha', '/news/list', {}, self._static('seeking_alpha_news.json')),
+            ('yh_finance', '/market/v2/get-quotes', {}, self._yh_finance_quotes)
+        ]
+        self.providers_by_host = {host: provider for provider, host in PROVIDER_HOSTS.items()}
+    
+    def resolve(self, host: str, path: str, query: Dict[str, str]) -> Tuple[Optional[str], Optional[Any]]:
+        """返回 (服务商, 响应体)；未知主机或路径时响应体为None"""
+        provider = self.providers_by_host.get(host)
+        for route_provider, prefix, conditions, handler in self.routes:
+            if route_provider != provider or not path.startswith(prefix):
+                continue
+            if all(query.get(key) == value for key, value in conditions.items()):
+                return provider, handler(path, query)
+        return provider, None
+    
+    def _static(self, name: str):
+        return lambda path, query: self.fixtures[name]
+    
+    def _quote_item(self, template: Dict[str, Any], symbol: str) -> Dict[str, Any]:
+        item = dict(template)
+        item['symbol'] = symbol
+        item['regularMarketPrice'] = _jitter(symbol, template['regularMarketPrice'])
+        return item
+    
+    def _alpha_vantage_quote(self, path, query):
+        payload = copy.deepcopy(self.fixtures['alpha_vantage_quote.json'])
+        symbol = _symbols(query.get('symbol'))[0]
+        payload['Global Quote']['01. symbol'] = symbol
+        payload['Global Quote']['05. price'] = f"{_jitter(symbol, float(payload['Global Quote']['05. price'])):.4f}"
+        return payload
+    
+    def _alpha_vantage_overview(self, path, query):
+        return dict(self.fixtures['alpha_vantage_overview.json'], Symbol=_symbols(query.get('symbol'))[0])
+    
+    def _alpha_vantage_earnings(self, path, query):
+        return dict(self.fixtures['alpha_vantage_earnings.json'], symbol=_symbols(query.get('symbol'))[0])
+    
+    def _yahoo_quote(self, path, query):
+        fixture = self.fixtures['yahoo_finance_15_quote.json']
+        symbols = _symbols(path.rsplit('/', 1)[-1])
+        items = [self._quote_item(fixture['body'], symbol) for symbol in symbols]
+        return dict(fixture, body=items[0] if len(items) == 1 else items)
+    
+    def _yh_finance_quotes(self, path, query):
+        template = self.fixtures['yh_finance_quotes.json']['quoteResponse']['result'][0]
+        items = [self._quote_item(template, symbol) for symbol in _symbols(query.get('symbols'))]
+        return {'quoteResponse': {'result': items, 'error': None}}
+    
+    def _webull_search(self, path, query):
+        payload = copy.deepcopy(self.fixtures['webull_search.json'])
+        symbol = _symbols(query.get('keyword'))[0]
+        payload['stocks'][0].update(symbol=symbol, disSymbol=symbol,
+                                    close=f"{_jitter(symbol, float(payload['stocks'][0]['close'])):.2f}")
+        return payload
+    
+    def _seeking_alpha_profile(self, path, query):
+        template = self.fixtures['seeking_alpha_profile.json']['data'][0]
+        data = []
+        for symbol in _symbols(query.get('symbols')):
+            attributes = dict(template['attributes'], slug=symbol.lower(),
+                              lastPrice=_jitter(symbol, template['attributes']['lastPrice']))
+            data.append(dict(template, id=symbol.lower(), attributes=attributes))
+        return {'data': data}
+
+class FakeRapidAPIServer:
+    """本地RapidAPI模拟服务器"""
+    
+    def __init__(self, port: int = 0, host: str = '127.0.0.1',
+                 profiles: Optional[Dict[str, ProviderProfile]] = None,
+                 default_profile: Optional[ProviderProfile] = None, seed: Optional[int] = None):
+        """
+        初始化模拟服务器
+        
+        Args:
+            port: 监听端口，0表示随机端口
+            profiles: 服务商 -> 模拟行为
+            default_profile: 未单独配置的服务商使用的模拟行为
+            seed: 随机种子，相同种子产生相同的延迟与错误序列
+        """
+        self.profiles = dict(profiles or {})
+        self.default_profile = default_profile or ProviderProfile()
+        self.router = FixtureRouter()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.started_at = time.time()
+        self.request_counts: Dict[str, Dict[str, int]] = {}
+        
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def profile_for(self, provider: Optional[str]) -> ProviderProfile:
+        return self.profiles.get(provider, self.default_profile)
+    
+    def _record(self, provider: Optional[str], status: int):
+        with self._stats_lock:
+            counts = self.request_counts.setdefault(provider or 'unknown', {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+    
+    def _respond(self, host: str, raw_path: str) -> Tuple[int, Dict[str, Any], float, Optional[str]]:
+        """计算响应：(状态码, 响应体, 模拟延迟, 服务商)"""
+        parts = urlsplit(raw_path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        provider, payload = self.router.resolve(host, parts.path, query)
+        profile = self.profile_for(provider)
+        
+        with self._rng_lock:
+            latency = profile.sample_latency(self._rng)
+            failed = self._rng.random() < profile.error_rate
+        
+        elapsed = time.time() - self.started_at
+        if profile.burst_every > 0 and elapsed % profile.burst_every < profile.burst_duration:
+            return 429, {'message': 'You have exceeded the rate limit per second for your plan'}, latency, provider
+        if payload is None:
+            return 404, {'message': f'Endpoint {parts.path} does not exist'}, latency, provider
+        if failed:
+            return 503, {'message': 'Service Unavailable'}, latency, provider
+        return 200, payload, latency, provider
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                host = self.headers.get('X-RapidAPI-Host', '')
+                status, payload, latency, provider = server._respond(host, self.path)
+                time.sleep(latency)
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server._record(provider, status)
+            
+            do_GET = _serve
+            do_POST = _serve
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+    
+    def start(self) -> 'FakeRapidAPIServer':
+        """在后台线程启动服务器"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-rapidapi', daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self):
+        """在当前线程运行服务器"""
+        self._server.serve_forever()
+    
+    def stop(self):
+        """停止服务器"""
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self) -> 'FakeRapidAPIServer':
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def load_profiles(path: str) -> Dict[str, ProviderProfile]:
+    """从JSON文件加载服务商模拟行为: {"alpha_vantage": {"latency_median": 0.2, ...}, ...}"""
+    with open(path, encoding='utf-8') as f:
+        return {provider: ProviderProfile(**options) for provider, options in json.load(f).items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='本地RapidAPI模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--profiles', help='服务商模拟行为JSON文件')
+    parser.add_argument('--latency', type=float, default=0.05, help='默认延迟中位数（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='默认503错误率')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    
+    profiles = load_profiles(args.profiles) if args.profiles else {}
+    server = FakeRapidAPIServer(args.port, args.host, profiles,
+                                ProviderProfile(latency_median=args.latency, error_rate=args.error_rate), args.seed)
+    print(f"🧪 RapidAPI模拟服务器: {server.base_url}")
+    for provider in PROVIDER_HOSTS:
+        print(f"   {provider}: {asdict(server.profile_for(provider))}")
+    print(f"   设置 JIXIA_UPSTREAM_BASE_URL={server.base_url} 后运行引擎")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
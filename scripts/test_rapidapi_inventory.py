@@ -6,11 +6,20 @@ RapidAPI库存测试脚本
 
 import requests
 import json
+import sys
 import time
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Any
 import os
 
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.jixia.engines.http_pool import get_http_pool, upstream_url
+from src.jixia.engines.provider_registry import get_registry
+
 class RapidAPITester:
     """RapidAPI测试器"""
     
@@ -21,46 +30,14 @@ class RapidAPITester:
         if not self.api_key:
             raise ValueError("RAPIDAPI_KEY环境变量未设置")
         
-        # API配置 - 基于永动机引擎的配置
-        self.api_configs = {
-            'alpha_vantage': 'alpha-vantage.p.rapidapi.com',
-            'yahoo_finance_1': 'yahoo-finance15.p.rapidapi.com',
-            'yh_finance_complete': 'yh-finance.p.rapidapi.com',
-            'yahoo_finance_api_data': 'yahoo-finance-api1.p.rapidapi.com',
-            'yahoo_finance_realtime': 'yahoo-finance-low-latency.p.rapidapi.com',
-            'yh_finance': 'yh-finance-complete.p.rapidapi.com',
-            'yahoo_finance_basic': 'yahoo-finance127.p.rapidapi.com',
-            'seeking_alpha': 'seeking-alpha.p.rapidapi.com',
-            'webull': 'webull.p.rapidapi.com',
-            'morning_star': 'morningstar1.p.rapidapi.com',
-            'tradingview': 'tradingview-ta.p.rapidapi.com',
-            'investing_com': 'investing-cryptocurrency-markets.p.rapidapi.com',
-            'finance_api': 'real-time-finance-data.p.rapidapi.com',
-            'ms_finance': 'ms-finance.p.rapidapi.com',
-            'sec_filings': 'sec-filings.p.rapidapi.com',
-            'exchangerate_api': 'exchangerate-api.p.rapidapi.com',
-            'crypto_news': 'cryptocurrency-news2.p.rapidapi.com'
-        }
+        # 同一主机的多个端点复用keep-alive连接
+        self.http = get_http_pool()
         
-        # 测试端点配置
+        # API配置与测试端点来自服务商注册表
+        registry = get_registry()
+        self.api_configs = {name: provider.host for name, provider in registry.providers.items()}
         self.test_endpoints = {
-            'alpha_vantage': '/query?function=GLOBAL_QUOTE&symbol=AAPL',
-            'yahoo_finance_1': '/api/yahoo/qu/quote/AAPL',
-            'yh_finance_complete': '/stock/v2/get-summary?symbol=AAPL',
-            'yahoo_finance_api_data': '/v8/finance/chart/AAPL',
-            'yahoo_finance_realtime': '/stock/v2/get-summary?symbol=AAPL',
-            'yh_finance': '/stock/v2/get-summary?symbol=AAPL',
-            'yahoo_finance_basic': '/api/yahoo/qu/quote/AAPL',
-            'seeking_alpha': '/symbols/get-profile?symbols=AAPL',
-            'webull': '/stock/search?keyword=AAPL',
-            'morning_star': '/market/v2/get-movers?performanceId=0P0000OQN8',
-            'tradingview': '/get-analysis?symbol=AAPL&screener=america&exchange=NASDAQ',
-            'investing_com': '/coins/get-overview',
-            'finance_api': '/stock-price?symbol=AAPL',
-            'ms_finance': '/stock/v2/get-summary?symbol=AAPL',
-            'sec_filings': '/search?query=AAPL',
-            'exchangerate_api': '/latest?base=USD',
-            'crypto_news': '/v1/cryptonews'
+            name: provider.health_check for name, provider in registry.providers.items() if provider.health_check
         }
         
         self.results = {}
@@ -92,7 +69,7 @@ class RapidAPITester:
             'Content-Type': 'application/json'
         }
         
-        url = f"https://{host}{endpoint}"
+        url = upstream_url(host, endpoint)
         
         print(f"🧪 测试 {api_name} ({host})")
         print(f"   URL: {url}")
@@ -100,7 +77,7 @@ class RapidAPITester:
         start_time = time.time()
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.http.get(url, headers=headers, timeout=10)
             response_time = time.time() - start_time
             
             result = {
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫自适应路由器
+按服务商与端点维护延迟、错误率的指数加权移动平均(EWMA)，
+每次请求选择当前表现最好的健康服务商
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+@dataclass
+class RouteStats:
+    """单个服务商+端点的路由统计"""
+    latency_ewma: Optional[float] = None
+    error_ewma: float = 0.0
+    samples: int = 0
+    updated_at: float = 0.0
+    recent_latencies: deque = field(default_factory=lambda: deque(maxlen=64))
+
+class AdaptiveRouter:
+    """基于EWMA延迟与错误率的自适应路由器"""
+    
+    def __init__(self, alpha: float = 0.3, error_penalty: float = 4.0,
+                 half_life: float = 120.0, quota_weight: float = 0.5,
+                 default_latency: float = 1.0, tie_tolerance: float = 0.15):
+        """
+        初始化路由器
+        
+        Args:
+            alpha: EWMA平滑系数，越大越看重最近的样本
+            error_penalty: 错误率对评分的放大系数
+            half_life: 统计随时间衰减的半衰期（秒），长期未被选中的服务商逐渐回到默认评分，重新获得试探流量
+            quota_weight: 月度剩余配额对评分的影响权重
+            default_latency: 尚无样本时假定的延迟（秒）
+            tie_tolerance: 评分不超过最优评分 (1 + tie_tolerance) 倍的候选视为持平，按原有分配表顺序决定
+        """
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.half_life = half_life
+        self.quota_weight = quota_weight
+        self.default_latency = default_latency
+        self.tie_tolerance = tie_tolerance
+        
+        self._stats: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, api_name: str, data_type: str, response_time: float, success: bool):
+        """记录一次上游调用的结果"""
+        now = time.time()
+        with self._lock:
+            stats = self._stats.setdefault((api_name, data_type), RouteStats())
+            stats.error_ewma = self._decayed_error(stats, now)
+            stats.error_ewma += self.alpha * ((0.0 if success else 1.0) - stats.error_ewma)
+            # 失败请求的耗时（如超时）同样计入延迟，否则卡住的服务商看起来很快
+            if stats.latency_ewma is None:
+                stats.latency_ewma = response_time
+            else:
+                stats.latency_ewma += self.alpha * (response_time - stats.latency_ewma)
+            stats.samples += 1
+            stats.updated_at = now
+            stats.recent_latencies.append(response_time)
+    
+    def latency_quantile(self, api_name: str, data_type: str, quantile: float,
+                         min_samples: int = 5) -> Optional[float]:
+        """
+        最近延迟样本的分位数
+        
+        Args:
+            quantile: 分位点 (0~1)，例如0.9表示p90
+            min_samples: 样本不足时返回None
+        """
+        with self._lock:
+            stats = self._stats.get((api_name, data_type))
+            if stats is None or len(stats.recent_latencies) < min_samples:
+                return None
+            ordered = sorted(stats.recent_latencies)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+    
+    def _decay(self, stats: RouteStats, now: float) -> float:
+        """距上次更新的衰减因子"""
+        if not stats.updated_at or self.half_life <= 0:
+            return 1.0
+        return 0.5 ** (max(0.0, now - stats.updated_at) / self.half_life)
+    
+    def _decayed_error(self, stats: RouteStats, now: float) -> float:
+        """按半衰期衰减后的错误率"""
+        return stats.error_ewma * self._decay(stats, now)
+    
+    def _decayed_latency(self, stats: RouteStats, now: float) -> float:
+        """按半衰期向默认延迟回归后的延迟"""
+        return self.default_latency + (stats.latency_ewma - self.default_latency) * self._decay(stats, now)
+    
+    def score(self, api_name: str, data_type: str, quota_ratio: Optional[float] = None) -> float:
+        """计算评分（越小越好）"""
+        now = time.time()
+        with self._lock:
+            stats = self._stats.get((api_name, data_type))
+            if stats is None or stats.latency_ewma is None:
+                latency, error_rate = self.default_latency, 0.0
+            else:
+                latency, error_rate = self._decayed_latency(stats, now), self._decayed_error(stats, now)
+        
+        score = max(latency, 1e-3) * (1 + self.error_penalty * error_rate)
+        if quota_ratio is not None:
+            score *= 1 + self.quota_weight * (1 - max(0.0, min(1.0, quota_ratio)))
+        return score
+    
+    def rank(self, candidates: List[str], data_type: str,
+             quota_ratios: Optional[Dict[str, float]] = None) -> List[str]:
+        """
+        按评分对候选服务商排序
+        
+        Args:
+            candidates: 候选服务商，按原有分配表的优先顺序排列
+            data_type: 数据类型
+            quota_ratios: 各服务商月度剩余配额比例
+        
+        Returns:
+            排序后的服务商列表：评分不超过当前最优评分 (1 + tie_tolerance) 倍的候选视为持平，
+            按原顺序排在前面，其余候选以同样的方式继续排序
+        """
+        quota_ratios = quota_ratios or {}
+        scores = {api_name: self.score(api_name, data_type, quota_ratios.get(api_name)) for api_name in candidates}
+        
+        ranked: List[str] = []
+        remaining = list(candidates)
+        while remaining:
+            limit = min(scores[api_name] for api_name in remaining) * (1 + self.tie_tolerance)
+            ranked.extend(api_name for api_name in remaining if scores[api_name] <= limit)
+            remaining = [api_name for api_name in remaining if scores[api_name] > limit]
+        return ranked
+    
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """导出当前路由统计，按服务商、端点分组"""
+        now = time.time()
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (api_name, data_type), stats in self._stats.items():
+                result.setdefault(api_name, {})[data_type] = {
+                    'latency_ewma': stats.latency_ewma,
+                    'error_rate': self._decayed_error(stats, now),
+                    'samples': stats.samples
+                }
+            return result
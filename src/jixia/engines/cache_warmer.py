@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫缓存预热
+按关注列表与论道日程，在缓存过期前或论道开始前以预取优先级填充负载均衡器的仙人级缓存，
+使每场论道第一位仙人的请求就能命中缓存
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from src.jixia.engines.priority_scheduler import Priority
+
+# 默认关注列表：TSLA为默认论道主题，NVDA、AAPL为天下体系中AI与苹果生态的天子
+DEFAULT_WATCHLIST = ('TSLA', 'NVDA', 'AAPL')
+
+@dataclass
+class WarmTarget:
+    """预热目标：一个标的及其需要的数据类型"""
+    symbol: str
+    data_types: Tuple[str, ...] = ('stock_quote',)
+    immortals: Optional[Tuple[str, ...]] = None  # None表示该数据类型下的全部仙人
+
+@dataclass(order=True)
+class ScheduledDebate:
+    """已排期的论道"""
+    start_at: float
+    target: WarmTarget = field(compare=False)
+
+class CacheWarmer:
+    """缓存预热器"""
+    
+    def __init__(self, balancer, watchlist: Optional[Iterable[str]] = DEFAULT_WATCHLIST,
+                 lead_time: float = 30.0, refresh_ahead: float = 0.2, interval: float = 5.0,
+                 priority: str = Priority.PREFETCH, max_warms_per_pass: int = 32):
+        """
+        初始化预热器
+        
+        Args:
+            balancer: JixiaLoadBalancer
+            watchlist: 持续保持缓存新鲜的股票代码
+            lead_time: 论道开始前多少秒开始预热
+            refresh_ahead: 关注列表条目剩余有效期低于TTL的该比例时提前刷新
+            interval: 后台线程两次检查之间的间隔（秒）
+            priority: 预热请求的优先级，预算紧张时由调度器排队或放弃，不与交互请求争抢
+            max_warms_per_pass: 每轮最多预热的条目数，避免一次性耗尽每分钟预算
+        """
+        self.balancer = balancer
+        self.lead_time = lead_time
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self.priority = priority
+        self.max_warms_per_pass = max_warms_per_pass
+        
+        self._watchlist: Dict[str, WarmTarget] = {}
+        self._debates: List[ScheduledDebate] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'passes': 0, 'warmed': 0, 'failed': 0, 'deferred': 0}
+        
+        for symbol in watchlist or ():
+            self.watch(symbol)
+    
+    def watch(self, symbol: str, data_types: Tuple[str, ...] = ('stock_quote',),
+              immortals: Optional[Tuple[str, ...]] = None):
+        """把标的加入关注列表（重复加入时覆盖其数据类型与仙人）"""
+        symbol = symbol.strip().upper()
+        with self._lock:
+            self._watchlist[symbol] = WarmTarget(symbol, tuple(data_types), immortals)
+    
+    def unwatch(self, symbol: str):
+        """从关注列表移除标的"""
+        with self._lock:
+            self._watchlist.pop(symbol.strip().upper(), None)
+    
+    def schedule_debate(self, symbol: str, start_at: Union[datetime, float],
+                        data_types: Tuple[str, ...] = ('stock_quote',),
+                        immortals: Optional[Tuple[str, ...]] = None):
+        """
+        登记一场论道，开始前 lead_time 秒内保证所需数据在开始时仍然新鲜
+        
+        Args:
+            start_at: 开始时间，datetime或时间戳
+        """
+        if isinstance(start_at, datetime):
+            start_at = start_at.timestamp()
+        target = WarmTarget(symbol.strip().upper(), tuple(data_types), immortals)
+        with self._lock:
+            self._debates.append(ScheduledDebate(start_at, target))
+            self._debates.sort()
+    
+    def _entries(self, target: WarmTarget) -> List[Tuple[str, str, str]]:
+        """展开为 (仙人, 数据类型, 股票代码)，按八仙顺序，论道中第一位仙人排在最前"""
+        entries = []
+        for data_type in target.data_types:
+            mapping = self.balancer.immortal_api_mapping.get(data_type, {})
+            for immortal in target.immortals or tuple(mapping):
+                if immortal in mapping:
+                    entries.append((immortal, data_type, target.symbol))
+        return entries
+    
+    def due_entries(self, now: Optional[float] = None) -> List[Tuple[str, str, str]]:
+        """
+        需要预热的条目，按紧迫程度排序：即将开始的论道优先，其次是关注列表中最早过期的条目
+        """
+        now = time.time() if now is None else now
+        cache = self.balancer.cache
+        due: Dict[Tuple[str, str, str], float] = {}
+        with self._lock:
+            # 已开始的论道不再预热
+            self._debates = [debate for debate in self._debates if debate.start_at > now]
+            debates = [debate for debate in self._debates if debate.start_at - now <= self.lead_time]
+            watchlist = list(self._watchlist.values())
+        
+        for debate in debates:
+            until_start = debate.start_at - now
+            for entry in self._entries(debate.target):
+                remaining = cache.expires_in(self.balancer.immortal_cache_key(*entry))
+                if remaining is None or remaining <= until_start:
+                    due[entry] = min(due.get(entry, until_start), until_start)
+        
+        for target in watchlist:
+            for entry in self._entries(target):
+                if entry in due:
+                    continue
+                remaining = cache.expires_in(self.balancer.immortal_cache_key(*entry))
+                if remaining is None or remaining <= self.refresh_ahead * cache.ttl_for(entry[1]):
+                    # 排在所有论道之后
+                    due[entry] = self.lead_time + max(remaining or 0.0, 0.0)
+        return sorted(due, key=due.get)
+    
+    def run_pending(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        执行一轮预热
+        
+        Returns:
+            本轮的 warmed / failed / deferred 计数；failed 包括被调度器放弃的请求，
+            deferred 为超出每轮上限、留到下一轮的条目数
+        """
+        entries = self.due_entries(now)
+        batch, deferred = entries[:self.max_warms_per_pass], len(entries[self.max_warms_per_pass:])
+        warmed = failed = 0
+        # 同一服务商的仙人共享上游请求级缓存，只有每组的第一位会真正请求上游
+        for immortal, data_type, symbol in batch:
+            # 论道最多提前 lead_time 秒预热，上游缓存剩余有效期不足时一并刷新
+            refresh_within = max(self.refresh_ahead * self.balancer.cache.ttl_for(data_type), self.lead_time)
+            result = self.balancer.warm_for_immortal(immortal, data_type, symbol, self.priority, refresh_within)
+            if result.success:
+                warmed += 1
+            else:
+                failed += 1
+        
+        self.stats['passes'] += 1
+        self.stats['warmed'] += warmed
+        self.stats['failed'] += failed
+        self.stats['deferred'] += deferred
+        return {'warmed': warmed, 'failed': failed, 'deferred': deferred}
+    
+    def start(self):
+        """启动后台预热线程"""
+        if self._thread:
+            return
+        
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.run_pending()
+                except Exception as e:
+                    print(f"⚠️ 缓存预热失败: {e}")
+                self._stop.wait(self.interval)
+        
+        self._thread = threading.Thread(target=run, name='jixia-cache-warmer', daemon=True)
+        self._thread.start()
+        print(f"🔥 缓存预热已启动: 关注 {', '.join(self._watchlist) or '无'}")
+    
+    def stop(self):
+        """停止后台预热线程"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫熔断器
+按服务商+端点的 closed / open / half-open 三态熔断：
+时间窗口内错误率过高即熔断，冷却时间指数增长，半开状态只放行一个探测请求
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class CircuitState:
+    """熔断器状态"""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """单个服务商+端点的熔断器"""
+    
+    def __init__(self, name: str, window: float = 60.0, buckets: int = 12,
+                 min_requests: int = 5, error_threshold: float = 0.5,
+                 base_cooldown: float = 5.0, max_cooldown: float = 300.0,
+                 probe_timeout: float = 30.0,
+                 on_transition: Optional[Callable[[str, str, str, str], None]] = None):
+        """
+        初始化熔断器
+        
+        Args:
+            name: 熔断器名称（服务商/端点）
+            window: 统计错误率的时间窗口（秒）
+            buckets: 窗口切分的桶数，桶内计数使检查保持常数时间
+            min_requests: 窗口内请求数达到此值才评估错误率
+            error_threshold: 触发熔断的错误率
+            base_cooldown: 首次熔断的冷却时间（秒），之后每次半开探测失败翻倍
+            max_cooldown: 冷却时间上限（秒）
+            probe_timeout: 探测请求未回报结果时，超过此时间允许重新探测
+            on_transition: 状态变化回调 (name, from_state, to_state, reason)
+        """
+        self.name = name
+        self.window = window
+        self.bucket_width = window / buckets
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.on_transition = on_transition
+        
+        self.state = CircuitState.CLOSED
+        self.open_until = 0.0
+        self.trips = 0  # 自上次恢复以来的连续熔断次数，决定冷却时间
+        self.probe_started_at: Optional[float] = None
+        self.consecutive_failures = 0
+        
+        # 环形桶: [桶序号, 成功数, 失败数]
+        self._buckets: List[List[int]] = [[-1, 0, 0] for _ in range(buckets)]
+        self._lock = threading.Lock()
+        # 状态变化在持锁时排队，释放锁后再回调：回调可能很慢，也可能读取熔断器状态
+        self._pending_transitions: List[Tuple[str, str, str]] = []
+        self._notify_lock = threading.Lock()
+    
+    def _bucket(self, now: float) -> List[int]:
+        index = int(now // self.bucket_width)
+        bucket = self._buckets[index % len(self._buckets)]
+        if bucket[0] != index:
+            bucket[0], bucket[1], bucket[2] = index, 0, 0
+        return bucket
+    
+    def _window_counts(self, now: float):
+        oldest = int(now // self.bucket_width) - len(self._buckets) + 1
+        successes = failures = 0
+        for index, ok, failed in self._buckets:
+            if index >= oldest:
+                successes += ok
+                failures += failed
+        return successes, failures
+    
+    def _reset_window(self):
+        for bucket in self._buckets:
+            bucket[0], bucket[1], bucket[2] = -1, 0, 0
+    
+    def _transition(self, new_state: str, reason: str):
+        """切换状态（调用方持有锁），回调由 _notify 在释放锁后执行"""
+        old_state = self.state
+        if old_state == new_state:
+            return
+        self.state = new_state
+        if self.on_transition:
+            self._pending_transitions.append((old_state, new_state, reason))
+    
+    def _notify(self):
+        """按发生顺序执行排队的状态变化回调（调用方不持有锁）"""
+        if not self._pending_transitions:
+            return
+        with self._notify_lock:
+            with self._lock:
+                transitions, self._pending_transitions = self._pending_transitions, []
+            for old_state, new_state, reason in transitions:
+                self.on_transition(self.name, old_state, new_state, reason)
+    
+    def _trip(self, now: float, reason: str):
+        cooldown = min(self.max_cooldown, self.base_cooldown * (2 ** self.trips))
+        self.trips += 1
+        self.open_until = now + cooldown
+        self.probe_started_at = None
+        self._transition(CircuitState.OPEN, f"{reason}, 冷却 {cooldown:.1f}s")
+    
+    def is_available(self) -> bool:
+        """是否可能放行请求（不占用探测名额，供路由排序使用）"""
+        now = time.time()
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN:
+                return now >= self.open_until
+            return self.probe_started_at is None or now - self.probe_started_at > self.probe_timeout
+    
+    def allow_request(self) -> bool:
+        """是否放行本次请求；半开状态下只放行一个探测请求"""
+        now = time.time()
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN:
+                if now < self.open_until:
+                    return False
+                self._transition(CircuitState.HALF_OPEN, '冷却结束，发送探测请求')
+            allowed = self.probe_started_at is None or now - self.probe_started_at > self.probe_timeout
+            if allowed:
+                self.probe_started_at = now
+        self._notify()
+        return allowed
+    
+    def record_success(self):
+        """记录成功调用"""
+        now = time.time()
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == CircuitState.HALF_OPEN:
+                self.trips = 0
+                self.probe_started_at = None
+                self._reset_window()
+                self._transition(CircuitState.CLOSED, '探测成功')
+            else:
+                self._bucket(now)[1] += 1
+        self._notify()
+    
+    def record_failure(self):
+        """记录失败调用"""
+        now = time.time()
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == CircuitState.HALF_OPEN:
+                self._trip(now, '探测失败')
+            elif self.state == CircuitState.CLOSED:
+                self._bucket(now)[2] += 1
+                successes, failures = self._window_counts(now)
+                total = successes + failures
+                if total >= self.min_requests and failures / total >= self.error_threshold:
+                    self._trip(now, f"错误率 {failures}/{total}")
+        self._notify()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出当前状态"""
+        now = time.time()
+        with self._lock:
+            successes, failures = self._window_counts(now)
+            total = successes + failures
+            return {
+                'state': self.state,
+                'window_requests': total,
+                'window_error_rate': failures / total if total else 0.0,
+                'consecutive_failures': self.consecutive_failures,
+                'trips': self.trips,
+                'retry_in': max(0.0, self.open_until - now) if self.state == CircuitState.OPEN else 0.0
+            }
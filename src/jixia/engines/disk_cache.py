@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫持久化缓存
+基于SQLite WAL模式的二级缓存，同一主机上的多个进程共享行情数据，
+进程重启后无需重新请求上游API
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config.doppler_config import get_state_dir
+
+class DiskCache:
+    """跨进程共享的SQLite缓存"""
+    
+    def __init__(self, path: Optional[str] = None, namespace: str = 'default', purge_every: int = 500):
+        """
+        初始化持久化缓存
+        
+        Args:
+            path: SQLite文件路径，默认位于状态目录下的 market_cache.db
+            namespace: 键空间前缀，不同引擎缓存的数据格式不同，需相互隔离
+            purge_every: 每写入多少次清理一次过期条目
+        """
+        self.path = path or os.path.join(get_state_dir(), 'market_cache.db')
+        self.namespace = namespace
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' data_type TEXT,'
+            ' stored_at REAL NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)')
+        conn.commit()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接（sqlite3连接不能跨线程共享）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        读取未过期的条目
+        
+        Returns:
+            (缓存值, 过期时间戳)，未命中返回None
+        """
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?',
+                (self._key(key), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ 持久化缓存读取失败: {e}")
+            row = None
+        
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+    
+    def get(self, key: str) -> Optional[Any]:
+        """读取未过期的缓存值"""
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+    
+    def set(self, key: str, value: Any, ttl: float, data_type: Optional[str] = None):
+        """写入缓存值（需可JSON序列化）"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, data_type, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (self._key(key), json.dumps(value, ensure_ascii=False, default=str), data_type, now, now + ttl)
+            )
+            conn.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"⚠️ 持久化缓存写入失败: {e}")
+            return
+        
+        with self._writes_lock:
+            self._writes += 1
+            should_purge = self._writes % self.purge_every == 0
+        if should_purge:
+            self.purge_expired()
+    
+    def delete(self, key: str):
+        """删除缓存条目"""
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM cache WHERE key = ?', (self._key(key),))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ 持久化缓存删除失败: {e}")
+    
+    def purge_expired(self) -> int:
+        """清理过期条目，返回清理数量"""
+        try:
+            conn = self._connection()
+            cursor = conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"⚠️ 持久化缓存清理失败: {e}")
+            return 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计（数据库不可用时条目数为None）"""
+        try:
+            entries = self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ 持久化缓存统计失败: {e}")
+            entries = None
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+    
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
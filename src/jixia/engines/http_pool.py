@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫HTTP连接池
+按上游主机共享keep-alive会话，避免每次调用都重新进行TCP+TLS握手；
+安装了httpx[http2]并设置 JIXIA_HTTP2=1 时改用HTTP/2多路复用
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# upstream_url 定义在不依赖 requests 的服务商注册表中，这里保留原有导入路径
+from src.jixia.engines.provider_registry import upstream_url
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+class HTTPPool:
+    """按主机共享的keep-alive连接池"""
+    
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16,
+                 http2: Optional[bool] = None):
+        """
+        初始化连接池
+        
+        Args:
+            pool_connections: 每个会话缓存的连接池数量
+            pool_maxsize: 每个主机保持的最大连接数，应不小于该主机的最大并发请求数
+            http2: 是否启用HTTP/2（需要httpx与h2），None时读取 JIXIA_HTTP2 环境变量
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        if http2 is None:
+            http2 = os.getenv('JIXIA_HTTP2', '').lower() in ('1', 'true', 'yes')
+        self.http2 = bool(http2 and httpx is not None)
+        
+        self._sessions: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def session_for(self, host: str):
+        """获取主机对应的共享会话"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._create_session()
+                self._sessions[host] = session
+            return session
+    
+    def _create_session(self):
+        if self.http2:
+            limits = httpx.Limits(max_connections=self.pool_maxsize,
+                                  max_keepalive_connections=self.pool_maxsize)
+            return httpx.Client(http2=True, limits=limits)
+        
+        session = requests.Session()
+        # 失败重试由负载均衡器的故障转移负责，这里不做自动重试
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def request(self, method: str, url: str, **kwargs):
+        """
+        通过主机对应的会话发起请求
+        
+        参数与 requests.request 一致；HTTP/2模式下httpx的异常会转换为
+        requests的异常类型，调用方的错误处理无需区分后端。
+        """
+        session = self.session_for(urlsplit(url).netloc)
+        if not self.http2:
+            return session.request(method, url, **kwargs)
+        
+        try:
+            return session.request(method, url, **kwargs)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+    
+    def get(self, url: str, **kwargs):
+        """GET请求"""
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, **kwargs):
+        """POST请求"""
+        return self.request('POST', url, **kwargs)
+    
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+_default_pool: Optional[HTTPPool] = None
+_default_pool_lock = threading.Lock()
+
+def get_http_pool() -> HTTPPool:
+    """获取进程内共享的连接池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPPool()
+        return _default_pool
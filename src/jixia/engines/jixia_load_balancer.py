@@ -5,228 +5,390 @@
 实现八仙论道的API负载分担策略
 """
 
+import asyncio
 import time
 import random
-import requests
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
-from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Any, Optional, Tuple
+from dataclasses import asdict, dataclass, replace
+from collections import deque
 import json
 import os
+import sqlite3
 
-@dataclass
+from src.jixia.engines.adaptive_router import AdaptiveRouter
+from src.jixia.engines.circuit_breaker import CircuitBreaker, CircuitState
+from src.jixia.engines.disk_cache import DiskCache
+from src.jixia.engines.http_pool import get_http_pool
+from src.jixia.engines.json_backend import loads as json_loads
+from src.jixia.engines.metrics import (NON_ERROR_OUTCOMES, OUTCOME_EMPTY, OUTCOME_SUCCESS, MetricsExporter,
+                                      UpstreamMetrics, classify_exception, classify_status)
+from src.jixia.engines.quote_record import QuoteRecord, quotes_to_columns
+from src.jixia.engines.provider_registry import get_registry
+from src.jixia.engines.quote_schema import QUOTE_EXTRACTORS
+from src.jixia.engines.priority_scheduler import Priority, PriorityScheduler
+from src.jixia.engines.rate_limiter import RateLimiter
+from src.jixia.engines.ttl_cache import TTLCache
+
+def _copy_data(value: Any) -> Any:
+    """复制嵌套的 dict/list 数据（上游JSON），比 copy.deepcopy 快得多"""
+    if isinstance(value, dict):
+        return {key: _copy_data(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_data(item) for item in value]
+    return value
+
+@dataclass(frozen=True)
 class APIResult:
-    """API调用结果"""
+    """API调用结果（不可变：同一结果会被缓存并在多个会话间共享，写入与读取缓存时复制 data）"""
     success: bool
     data: Dict[str, Any]
     api_used: str
     response_time: float
     error: Optional[str] = None
     cached: bool = False
+    stale: bool = False
+    error_class: Optional[str] = None  # 失败分类（metrics中的结果分类），决定负缓存时间
 
-class RateLimiter:
-    """速率限制器"""
+class APIHealthChecker:
+    """API健康检查器：按服务商+端点维护熔断器"""
     
-    def __init__(self):
-        self.api_calls = defaultdict(list)
-        self.limits = {
-            'alpha_vantage': {'per_minute': 500, 'per_month': 500000},
-            'yahoo_finance_15': {'per_minute': 500, 'per_month': 500000},
-            'webull': {'per_minute': 500, 'per_month': 500000},
-            'seeking_alpha': {'per_minute': 500, 'per_month': 500000}
+    def __init__(self, **breaker_options):
+        """
+        Args:
+            **breaker_options: 传给每个 CircuitBreaker 的参数（窗口、阈值、冷却时间等）
+        """
+        self.health_status = {
+            api_name: {'healthy': True, 'last_check': 0, 'consecutive_failures': 0}
+            for api_name in get_registry().routable
         }
+        self.breaker_options = breaker_options
+        self.breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self.transitions = deque(maxlen=200)  # 最近的状态变化，供监控查看
+        self._listeners: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
     
-    def is_rate_limited(self, api_name: str) -> bool:
-        """检查是否达到速率限制"""
-        now = time.time()
-        calls = self.api_calls[api_name]
-        
-        # 清理1分钟前的记录
-        self.api_calls[api_name] = [call_time for call_time in calls if now - call_time < 60]
-        
-        # 检查每分钟限制
-        if len(self.api_calls[api_name]) >= self.limits[api_name]['per_minute'] * 0.9:  # 90%阈值
-            return True
-        
-        return False
+    def add_listener(self, callback: Callable[[dict], None]):
+        """注册熔断状态变化回调"""
+        with self._lock:
+            # 写时复制：通知时遍历的列表不会被并发修改
+            self._listeners = self._listeners + [callback]
     
-    def record_call(self, api_name: str):
-        """记录API调用"""
-        self.api_calls[api_name].append(time.time())
-
-class APIHealthChecker:
-    """API健康检查器"""
+    def _breaker(self, api_name: str, endpoint: Optional[str]) -> CircuitBreaker:
+        key = (api_name, endpoint or '*')
+        with self._lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(f"{api_name}/{key[1]}", on_transition=self._on_transition,
+                                         **self.breaker_options)
+                self.breakers[key] = breaker
+            return breaker
     
-    def __init__(self):
-        self.health_status = {
-            'alpha_vantage': {'healthy': True, 'last_check': 0, 'consecutive_failures': 0},
-            'yahoo_finance_15': {'healthy': True, 'last_check': 0, 'consecutive_failures': 0},
-            'webull': {'healthy': True, 'last_check': 0, 'consecutive_failures': 0},
-            'seeking_alpha': {'healthy': True, 'last_check': 0, 'consecutive_failures': 0}
+    def _on_transition(self, name: str, old_state: str, new_state: str, reason: str):
+        """记录熔断状态变化并同步服务商级健康状态"""
+        api_name, endpoint = name.split('/', 1)
+        event = {
+            'time': time.time(),
+            'api': api_name,
+            'endpoint': endpoint,
+            'from': old_state,
+            'to': new_state,
+            'reason': reason
         }
-        self.check_interval = 300  # 5分钟检查一次
+        self.transitions.append(event)
+        print(f"   🔌 熔断器 {name}: {old_state} → {new_state} ({reason})")
+        for listener in self._listeners:
+            listener(event)
     
-    def is_healthy(self, api_name: str) -> bool:
-        """检查API是否健康"""
-        status = self.health_status[api_name]
-        now = time.time()
-        
-        # 如果距离上次检查超过间隔时间，进行健康检查
-        if now - status['last_check'] > self.check_interval:
-            self._perform_health_check(api_name)
+    def is_healthy(self, api_name: str, data_type: Optional[str] = None) -> bool:
+        """
+        检查API是否健康（不占用半开探测名额）
         
-        return status['healthy']
+        指定 data_type 时检查对应端点的熔断器；否则只要该服务商
+        没有任何处于熔断冷却中的端点即视为健康。
+        """
+        if data_type is not None:
+            return self._breaker(api_name, data_type).is_available()
+        with self._lock:
+            breakers = [b for (api, _), b in self.breakers.items() if api == api_name]
+        return all(breaker.is_available() for breaker in breakers)
     
-    def _perform_health_check(self, api_name: str):
-        """执行健康检查"""
-        # 这里可以实现具体的健康检查逻辑
-        # 暂时简化为基于连续失败次数判断
-        status = self.health_status[api_name]
-        status['last_check'] = time.time()
-        
-        # 如果连续失败超过3次，标记为不健康
-        if status['consecutive_failures'] > 3:
-            status['healthy'] = False
-        else:
-            status['healthy'] = True
+    def allow_request(self, api_name: str, data_type: Optional[str] = None) -> bool:
+        """是否放行一次实际请求（半开状态下只放行一个探测请求）"""
+        return self._breaker(api_name, data_type).allow_request()
     
-    def record_success(self, api_name: str):
+    def record_success(self, api_name: str, data_type: Optional[str] = None):
         """记录成功调用"""
-        self.health_status[api_name]['consecutive_failures'] = 0
-        self.health_status[api_name]['healthy'] = True
+        self._breaker(api_name, data_type).record_success()
+        self._refresh_status(api_name)
     
-    def record_failure(self, api_name: str):
+    def record_failure(self, api_name: str, data_type: Optional[str] = None):
         """记录失败调用"""
-        self.health_status[api_name]['consecutive_failures'] += 1
+        self._breaker(api_name, data_type).record_failure()
+        self._refresh_status(api_name)
+    
+    def _refresh_status(self, api_name: str):
+        """汇总端点熔断器，更新服务商级健康状态"""
+        with self._lock:
+            breakers = [b for (api, _), b in self.breakers.items() if api == api_name]
+            # 整体替换状态字典，读取方不会看到更新到一半的状态
+            self.health_status[api_name] = {
+                'healthy': all(b.state == CircuitState.CLOSED for b in breakers),
+                'last_check': time.time(),
+                'consecutive_failures': max((b.consecutive_failures for b in breakers), default=0)
+            }
+    
+    def get_circuit_states(self) -> Dict[str, Dict[str, dict]]:
+        """所有熔断器的当前状态，按服务商、端点分组"""
+        with self._lock:
+            items = list(self.breakers.items())
+        states: Dict[str, Dict[str, dict]] = {}
+        for (api_name, endpoint), breaker in items:
+            states.setdefault(api_name, {})[endpoint] = breaker.snapshot()
+        return states
 
 class DataNormalizer:
     """数据标准化处理器"""
     
+    # 各服务商响应中没有报价数据时的错误信息
+    EMPTY_RESPONSE_ERRORS = {
+        'alpha_vantage': 'No quote data found in Alpha Vantage response',
+        'yahoo_finance_15': 'No quote data found in Yahoo Finance response',
+        'webull': 'No stock data found in Webull response',
+        'seeking_alpha': 'No data found in Seeking Alpha response'
+    }
+    
     def normalize_stock_quote(self, raw_data: dict, api_source: str) -> dict:
         """将不同API的股票报价数据标准化"""
+        if api_source not in QUOTE_EXTRACTORS:
+            return {'error': f'Unknown API source: {api_source}'}
         try:
-            if api_source == 'alpha_vantage':
-                return self._normalize_alpha_vantage_quote(raw_data)
-            elif api_source == 'yahoo_finance_15':
-                return self._normalize_yahoo_quote(raw_data)
-            elif api_source == 'webull':
-                return self._normalize_webull_quote(raw_data)
-            elif api_source == 'seeking_alpha':
-                return self._normalize_seeking_alpha_quote(raw_data)
-            else:
-                return {'error': f'Unknown API source: {api_source}'}
+            record = self.normalize_quote_record(raw_data, api_source)
         except Exception as e:
             return {'error': f'Data normalization failed: {str(e)}'}
+        if record is None:
+            return {'error': self.EMPTY_RESPONSE_ERRORS.get(api_source, f'No quote data found in {api_source} response')}
+        return record.to_dict()
     
-    def _normalize_alpha_vantage_quote(self, data: dict) -> dict:
-        """标准化Alpha Vantage数据格式"""
-        global_quote = data.get('Global Quote', {})
-        return {
-            'symbol': global_quote.get('01. symbol'),
-            'price': float(global_quote.get('05. price', 0)),
-            'change': float(global_quote.get('09. change', 0)),
-            'change_percent': global_quote.get('10. change percent', '0%'),
-            'volume': int(global_quote.get('06. volume', 0)),
-            'high': float(global_quote.get('03. high', 0)),
-            'low': float(global_quote.get('04. low', 0)),
-            'source': 'alpha_vantage',
-            'timestamp': global_quote.get('07. latest trading day')
-        }
+    @staticmethod
+    def is_empty_response(raw_data: Any) -> bool:
+        """
+        响应是否不含任何数据，如 {} 或 webull 的 {'stocks': []}、seeking_alpha 的 {'data': []}，
+        以及 yh_finance 的 {'quoteResponse': {'result': [], 'error': None}} 这类嵌套的空容器
+        """
+        if isinstance(raw_data, dict):
+            return all(value is None or (isinstance(value, (dict, list)) and DataNormalizer.is_empty_response(value))
+                       for value in raw_data.values())
+        return not raw_data
     
-    def _normalize_yahoo_quote(self, data: dict) -> dict:
-        """标准化Yahoo Finance数据格式"""
-        body = data.get('body', {})
-        return {
-            'symbol': body.get('symbol'),
-            'price': float(body.get('regularMarketPrice', 0)),
-            'change': float(body.get('regularMarketChange', 0)),
-            'change_percent': f"{body.get('regularMarketChangePercent', 0):.2f}%",
-            'volume': int(body.get('regularMarketVolume', 0)),
-            'high': float(body.get('regularMarketDayHigh', 0)),
-            'low': float(body.get('regularMarketDayLow', 0)),
-            'source': 'yahoo_finance_15',
-            'timestamp': body.get('regularMarketTime')
-        }
+    def normalize_quote_record(self, raw_data: dict, api_source: str) -> Optional[QuoteRecord]:
+        """将单只股票的报价响应标准化为报价记录，响应中没有数据时返回None"""
+        extractor = QUOTE_EXTRACTORS.get(api_source)
+        if extractor is None:
+            raise ValueError(f'Unknown API source: {api_source}')
+        return extractor.first(raw_data)
     
-    def _normalize_webull_quote(self, data: dict) -> dict:
-        """标准化Webull数据格式"""
-        if 'stocks' in data and len(data['stocks']) > 0:
-            stock = data['stocks'][0]
-            return {
-                'symbol': stock.get('symbol'),
-                'price': float(stock.get('close', 0)),
-                'change': float(stock.get('change', 0)),
-                'change_percent': f"{stock.get('changeRatio', 0):.2f}%",
-                'volume': int(stock.get('volume', 0)),
-                'high': float(stock.get('high', 0)),
-                'low': float(stock.get('low', 0)),
-                'source': 'webull',
-                'timestamp': stock.get('timeStamp')
-            }
-        return {'error': 'No stock data found in Webull response'}
-    
-    def _normalize_seeking_alpha_quote(self, data: dict) -> dict:
-        """标准化Seeking Alpha数据格式"""
-        if 'data' in data and len(data['data']) > 0:
-            stock_data = data['data'][0]
-            attributes = stock_data.get('attributes', {})
-            return {
-                'symbol': attributes.get('slug'),
-                'price': float(attributes.get('lastPrice', 0)),
-                'change': float(attributes.get('dayChange', 0)),
-                'change_percent': f"{attributes.get('dayChangePercent', 0):.2f}%",
-                'volume': int(attributes.get('volume', 0)),
-                'source': 'seeking_alpha',
-                'market_cap': attributes.get('marketCap'),
-                'pe_ratio': attributes.get('peRatio')
-            }
-        return {'error': 'No data found in Seeking Alpha response'}
+    def normalize_batch_quotes(self, raw_data: dict, api_source: str) -> List[dict]:
+        """将批量报价响应标准化为报价列表，无法解析的条目被跳过"""
+        return [record.to_dict() for record in self.normalize_quote_records(raw_data, api_source)]
+    
+    def normalize_quote_records(self, raw_data: dict, api_source: str) -> List[QuoteRecord]:
+        """将批量（或单股）报价响应标准化为报价记录列表，无法解析的条目被跳过"""
+        extractor = QUOTE_EXTRACTORS.get(api_source)
+        return extractor.records(raw_data) if extractor else []
+    
+    def normalize_quote_columns(self, payloads: Iterable[Tuple[dict, str]], as_frame: bool = False):
+        """
+        一次遍历把大量原始响应转换为列式报价数据，供向量化分析使用
+        
+        Args:
+            payloads: (原始响应, 服务商) 序列，单股与批量响应均可
+            as_frame: 是否返回pandas DataFrame
+        
+        Returns:
+            字段名到NumPy数组的映射，或DataFrame；无法解析的响应被跳过
+        """
+        records = (record for raw_data, api_source in payloads
+                   for record in self.normalize_quote_records(raw_data, api_source))
+        return quotes_to_columns(records, as_frame)
+
+class SingleFlight:
+    """在途请求合并：相同键的并发调用只执行一次，其余调用等待同一结果"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+    
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """
+        执行或加入一次调用
+        
+        Args:
+            key: 请求键
+            fn: 无参调用，仅由首个调用者执行
+        
+        Returns:
+            (调用结果, 是否复用了其他调用者的结果)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            return future.result(), True
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+class HedgeBudget:
+    """对冲请求预算：每个主请求积累 ratio 个令牌，每次对冲消耗一个"""
+    
+    def __init__(self, ratio: float = 0.05, burst: float = 1.0):
+        """
+        Args:
+            ratio: 允许的额外请求比例，0.05表示最多多发5%的请求
+            burst: 令牌上限（同时也是初始令牌数）
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+    
+    def record_request(self):
+        """记录一次主请求"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+    
+    def try_acquire(self) -> bool:
+        """尝试消耗一个对冲令牌"""
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
 
 class JixiaLoadBalancer:
     """稷下学宫负载均衡器"""
     
-    def __init__(self, rapidapi_key: str):
+    def __init__(self, rapidapi_key: str, disk_cache_path: Optional[str] = None):
+        """
+        初始化负载均衡器
+        
+        Args:
+            rapidapi_key: RapidAPI密钥
+            disk_cache_path: 跨进程共享的持久化缓存路径，None使用默认路径，空字符串禁用
+        """
         self.rapidapi_key = rapidapi_key
         self.rate_limiter = RateLimiter()
+        # 按优先级放行上游请求：每分钟预算接近用尽时为交互请求与论道预留余量
+        self.scheduler = PriorityScheduler(self.rate_limiter)
         self.health_checker = APIHealthChecker()
         self.data_normalizer = DataNormalizer()
-        self.cache = {}  # 简单的内存缓存
-        self.cache_ttl = 300  # 5分钟缓存
-        
-        # API配置
-        self.api_configs = {
-            'alpha_vantage': {
-                'host': 'alpha-vantage.p.rapidapi.com',
-                'endpoints': {
-                    'stock_quote': '/query?function=GLOBAL_QUOTE&symbol={symbol}',
-                    'company_overview': '/query?function=OVERVIEW&symbol={symbol}',
-                    'earnings': '/query?function=EARNINGS&symbol={symbol}'
-                }
-            },
-            'yahoo_finance_15': {
-                'host': 'yahoo-finance15.p.rapidapi.com',
-                'endpoints': {
-                    'stock_quote': '/api/yahoo/qu/quote/{symbol}',
-                    'market_movers': '/api/yahoo/co/collections/day_gainers',
-                    'market_news': '/api/yahoo/ne/news'
-                }
-            },
-            'webull': {
-                'host': 'webull.p.rapidapi.com',
-                'endpoints': {
-                    'stock_quote': '/stock/search?keyword={symbol}',
-                    'market_movers': '/market/get-active-gainers'
-                }
-            },
-            'seeking_alpha': {
-                'host': 'seeking-alpha.p.rapidapi.com',
-                'endpoints': {
-                    'company_overview': '/symbols/get-profile?symbols={symbol}',
-                    'market_news': '/news/list?category=market-news'
-                }
-            }
+        self.cache_ttl = 300  # 默认5分钟缓存
+        # 按数据类型的缓存时间：报价以秒计，公司概况等以天计
+        self.cache_ttls = {
+            'stock_quote': 60,
+            'stock_quote_batch': 60,
+            'market_movers': 300,
+            'market_news': 600,
+            'company_overview': 86400,
+            'earnings': 86400
+        }
+        self.cache_max_entries = 2048
+        # 过期后仍可使用的最长时间：后台刷新期间或所有API都失败时返回这段时间内的旧数据
+        self.cache_max_staleness = {
+            'stock_quote': 300,
+            'market_movers': 900,
+            'market_news': 1800,
+            'company_overview': 7 * 86400,
+            'earnings': 7 * 86400
         }
+        self.stale_while_revalidate = True
+        self.stale_if_error = True
+        self.cache = TTLCache(self.cache_max_entries, self.cache_ttl, self.cache_ttls,
+                              max_stale=600, max_stale_by_type=self.cache_max_staleness)  # 仙人级缓存
+        self._refreshing: set = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        
+        # 上游请求级缓存：按规范化的上游URL缓存，多个仙人请求同一URL时共享结果
+        self.provider_cache = TTLCache(self.cache_max_entries, self.cache_ttl, self.cache_ttls)
+        # 报价缓存：按股票代码缓存标准化报价（get_quotes），与上游结果分开计数与淘汰
+        self.quote_cache = TTLCache(self.cache_max_entries, self.cache_ttls['stock_quote'])
+        # 二级持久化缓存：同主机多进程共享，重启后不必重新请求上游
+        self.disk_cache = None
+        if disk_cache_path != '':
+            try:
+                self.disk_cache = DiskCache(disk_cache_path, namespace='load_balancer')
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ 持久化缓存不可用，仅使用内存缓存: {e}")
+        self._inflight = SingleFlight()
+        # 负缓存：记住 (服务商, 端点, 股票代码) 的失败，有效期内直接跳过，不再消耗限速与月度配额；
+        # 有效期按失败分类：服务商不认识的代码可以记很久，限流与超时只记几秒
+        self.negative_cache_ttls = {
+            'empty_response': 3600,
+            'http_4xx': 900,
+            'parse_error': 300,
+            'http_429': 30,
+            'http_5xx': 15,
+            'timeout': 10,
+            'connection': 10
+        }
+        self.negative_cache = TTLCache(self.cache_max_entries, 0, self.negative_cache_ttls)
+        self._negative_savings: Dict[Tuple[str, str], int] = {}
+        # 上游调用指标：每个服务商+端点的延迟直方图与按错误类型分类的计数
+        self.metrics = UpstreamMetrics()
+        self.request_stats = {
+            'upstream_calls': 0, 'provider_cache_hits': 0, 'disk_cache_hits': 0, 'coalesced_calls': 0,
+            'hedged_requests': 0, 'hedge_wins': 0,
+            'stale_served': 0, 'stale_if_error': 0, 'background_refreshes': 0,
+            'negative_cache_hits': 0
+        }
+        self._stats_lock = threading.Lock()
+        
+        # 对冲请求（默认关闭）：首选API超过其p90延迟仍未返回时并行请求备用API
+        self.hedging = False
+        self.hedge_quantile = 0.9
+        self.hedge_budget = HedgeBudget(ratio=0.05)
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_executor_lock = threading.Lock()
+        
+        # 并发论道配置：每个上游主机的最大并发请求数
+        self.max_concurrency_per_host = 4
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_semaphores_lock = threading.Lock()
+        
+        # 缓存预热器（CacheWarmer），由 get_shared_load_balancer 按需启动
+        self.warmer = None
+        
+        # 按主机共享的keep-alive连接池，连接数上限不低于每主机并发数与对冲请求之和
+        self.http = get_http_pool()
+        
+        # 服务商主机、端点模板与批量端点统一来自服务商注册表
+        self.registry = get_registry()
+        self.providers = list(self.registry.routable)
+        
+        # 自适应路由：按实测表现选择服务商，上面的分配表仅用于决定持平时的顺序
+        self.router = AdaptiveRouter()
+        self.adaptive_routing = True
+        
+        # 批量报价的服务商优先级（每只股票成本越低越靠前）
+        self.batch_quote_priority = list(self.registry.batch_providers_for('stock_quote'))
+        # 批量未覆盖的股票逐个获取时使用的服务商顺序
+        self.single_quote_priority = list(self.registry.providers_for('stock_quote'))
         
         # 八仙API分配策略
         self.immortal_api_mapping = {
@@ -271,179 +433,699 @@ class JixiaLoadBalancer:
                 '铁拐李': 'yahoo_finance_15'
             }
         }
-        
-        # 故障转移优先级
-        self.failover_priority = {
-            'alpha_vantage': ['webull', 'yahoo_finance_15'],
-            'yahoo_finance_15': ['webull', 'alpha_vantage'],
-            'webull': ['alpha_vantage', 'yahoo_finance_15'],
-            'seeking_alpha': ['yahoo_finance_15', 'alpha_vantage']
-        }
     
-    def get_data_for_immortal(self, immortal_name: str, data_type: str, symbol: str = None) -> APIResult:
-        """为特定仙人获取数据"""
+    def get_data_for_immortal(self, immortal_name: str, data_type: str, symbol: str = None,
+                              priority: str = Priority.INTERACTIVE) -> APIResult:
+        """
+        为特定仙人获取数据
+        
+        Args:
+            priority: 请求优先级（Priority），预算紧张时低优先级请求排队或放弃
+        """
         print(f"🎭 {immortal_name} 正在获取 {data_type} 数据...")
         
-        # 检查缓存
-        cache_key = f"{immortal_name}_{data_type}_{symbol}"
-        cached_result = self._get_cached_data(cache_key)
-        if cached_result:
+        # 检查缓存（过期但仍在保留期内的数据也取出，供下面两种降级模式使用）
+        cache_key = self.immortal_cache_key(immortal_name, data_type, symbol)
+        cached_result = self._get_cached_data(cache_key, allow_stale=True)
+        if cached_result and not cached_result.stale:
             print(f"   📦 使用缓存数据")
             return cached_result
         
+        # stale-while-revalidate：立即返回旧数据，由一个后台任务刷新
+        if cached_result and self.stale_while_revalidate:
+            self._refresh_in_background(
+                cache_key,
+                lambda: self._fetch_for_immortal(immortal_name, data_type, symbol, cache_key, Priority.PREFETCH)
+            )
+            self._count('stale_served')
+            print(f"   📦 使用过期缓存数据，后台刷新中")
+            return cached_result
+        
+        result = self._fetch_for_immortal(immortal_name, data_type, symbol, cache_key, priority)
+        
+        # stale-if-error：所有API都失败时退回保留期内的旧数据
+        if not result.success and cached_result and self.stale_if_error:
+            self._count('stale_if_error')
+            print(f"   📦 使用过期缓存数据")
+            return cached_result
+        return result
+    
+    def warm_for_immortal(self, immortal_name: str, data_type: str, symbol: Optional[str] = None,
+                          priority: str = Priority.PREFETCH, refresh_within: float = 0.0) -> APIResult:
+        """
+        预热仙人级缓存：跳过仙人级缓存直接按路由顺序获取并写入缓存
+        
+        同一标的的多个仙人共享上游请求级缓存，预热整组仙人时每个服务商只请求一次。
+        
+        Args:
+            refresh_within: 上游请求级缓存剩余有效期不超过该秒数时丢弃，重新请求上游，
+                避免把即将过期的数据以完整TTL写入仙人级缓存
+        """
+        if refresh_within > 0 and data_type in self.immortal_api_mapping:
+            preferred_api = self.immortal_api_mapping[data_type].get(immortal_name)
+            for api_name in self.registry.failover_order(preferred_api, data_type):
+                url = self.registry.url(api_name, data_type, symbol)
+                remaining = self.provider_cache.expires_in(url) if url else None
+                if remaining is not None and remaining <= refresh_within:
+                    self.provider_cache.delete(url)
+                    if self.disk_cache:
+                        self.disk_cache.delete(url)
+        return self._fetch_for_immortal(immortal_name, data_type, symbol,
+                                        self.immortal_cache_key(immortal_name, data_type, symbol), priority)
+    
+    @staticmethod
+    def immortal_cache_key(immortal_name: str, data_type: str, symbol: Optional[str]) -> str:
+        """仙人级缓存键（股票代码不区分大小写，与预热器的关注列表一致）"""
+        return f"{immortal_name}_{data_type}_{symbol.strip().upper() if symbol else symbol}"
+    
+    def _fetch_for_immortal(self, immortal_name: str, data_type: str, symbol: Optional[str],
+                            cache_key: str, priority: str = Priority.INTERACTIVE) -> APIResult:
+        """按路由顺序依次尝试各服务商，成功后写入仙人级缓存"""
         # 获取该仙人的首选API
         if data_type not in self.immortal_api_mapping:
             return APIResult(False, {}, '', 0, f"Unsupported data type: {data_type}")
         
         preferred_api = self.immortal_api_mapping[data_type][immortal_name]
         
-        # 尝试首选API
-        result = self._try_api(preferred_api, data_type, symbol)
-        if result.success:
-            self._cache_data(cache_key, result)
-            print(f"   ✅ 成功从 {preferred_api} 获取数据 (响应时间: {result.response_time:.2f}s)")
-            return result
+        # 分配表给出首选API，注册表给出支持该数据类型的备用API，自适应路由再按实测延迟/错误率重排
+        candidates = [api for api in self.registry.failover_order(preferred_api, data_type)
+                      if self.registry.supports(api, data_type)]
         
-        # 故障转移到备用API
-        print(f"   ⚠️ {preferred_api} 不可用，尝试备用API...")
-        backup_apis = self.failover_priority.get(preferred_api, [])
-        
-        for backup_api in backup_apis:
-            if data_type in self.api_configs[backup_api]['endpoints']:
-                result = self._try_api(backup_api, data_type, symbol)
-                if result.success:
-                    self._cache_data(cache_key, result)
-                    print(f"   ✅ 成功从备用API {backup_api} 获取数据 (响应时间: {result.response_time:.2f}s)")
-                    return result
+        ranked = self._rank_apis(candidates, data_type)
+        index = 0
+        while index < len(ranked):
+            api_name = ranked[index]
+            if self.hedging and index + 1 < len(ranked):
+                result, hedged = self._try_api_hedged(api_name, ranked[index + 1], data_type, symbol, priority)
+            else:
+                result, hedged = self._try_api(api_name, data_type, symbol, priority), False
+            
+            if result.success:
+                self._cache_data(cache_key, result, data_type=data_type)
+                source = result.api_used if result.api_used == preferred_api else f"备用API {result.api_used}"
+                print(f"   ✅ 成功从 {source} 获取数据 (响应时间: {result.response_time:.2f}s)")
+                return result
+            if index == 0:
+                print(f"   ⚠️ {api_name} 不可用，尝试备用API...")
+            # 已对冲过的备用API不再重复尝试
+            index += 2 if hedged else 1
         
         # 所有API都失败
         print(f"   ❌ 所有API都不可用")
         return APIResult(False, {}, '', 0, "All APIs failed")
     
-    def _try_api(self, api_name: str, data_type: str, symbol: str = None) -> APIResult:
-        """尝试调用指定API"""
-        # 检查API健康状态和速率限制
-        if not self.health_checker.is_healthy(api_name):
-            return APIResult(False, {}, api_name, 0, "API is unhealthy")
+    def _try_api_hedged(self, primary_api: str, backup_api: str, data_type: str,
+                        symbol: str = None, priority: str = Priority.INTERACTIVE) -> Tuple[APIResult, bool]:
+        """
+        带对冲的API调用
+        
+        首选API在其p90延迟内未返回时，若对冲预算允许则并行请求备用API，
+        取先成功的结果并放弃另一个。
         
-        if self.rate_limiter.is_rate_limited(api_name):
-            return APIResult(False, {}, api_name, 0, "Rate limited")
+        Returns:
+            (调用结果, 是否发出了对冲请求)
+        """
+        self.hedge_budget.record_request()
+        hedge_delay = self.router.latency_quantile(primary_api, data_type, self.hedge_quantile)
+        if hedge_delay is None:
+            # 样本不足，无法判断首选API是否“卡住”
+            return self._try_api(primary_api, data_type, symbol, priority), False
         
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._try_api, primary_api, data_type, symbol, priority)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done or not self.hedge_budget.try_acquire():
+            return primary.result(), False
+        
+        print(f"   ⏱️ {primary_api} 超过p90延迟 {hedge_delay:.2f}s，对冲请求 {backup_api}")
+        self._count('hedged_requests')
+        backup = executor.submit(self._try_api, backup_api, data_type, symbol, priority)
+        pending = {primary, backup}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                candidate = future.result()
+                if candidate.success:
+                    # 放弃仍在进行的请求：未开始的直接取消，已发出的结果仍会写入上游缓存
+                    for loser in pending:
+                        loser.cancel()
+                    if future is backup:
+                        self._count('hedge_wins')
+                    return candidate, True
+                result = result or candidate
+        return result, True
+    
+    def _refresh_in_background(self, cache_key: str, fn: Callable[[], APIResult]):
+        """后台刷新缓存条目；同一键同时只有一个刷新任务"""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='jixia-refresh')
+            executor = self._refresh_executor
+        
+        def run():
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ 后台刷新 {cache_key} 失败: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+        
+        self._count('background_refreshes')
+        executor.submit(run)
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """对冲请求使用的共享线程池"""
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='jixia-hedge')
+            return self._hedge_executor
+    
+    def _rank_apis(self, candidates: List[str], data_type: str) -> List[str]:
+        """
+        按自适应路由对候选服务商排序
+        
+        健康的服务商按EWMA延迟、错误率与月度剩余配额排序，评分持平时保留分配表顺序；
+        不健康的服务商排在最后。关闭自适应路由时原样返回。
+        """
+        if not self.adaptive_routing:
+            return candidates
+        healthy = [api for api in candidates if self.health_checker.is_healthy(api, data_type)]
+        quota_ratios = {api: self.rate_limiter.get_remaining_budget(api)['month_ratio'] for api in healthy}
+        ranked = self.router.rank(healthy, data_type, quota_ratios)
+        return ranked + [api for api in candidates if api not in healthy]
+    
+    def _try_api(self, api_name: str, data_type: str, symbol: str = None,
+                 priority: str = Priority.INTERACTIVE) -> APIResult:
+        """尝试调用指定API"""
         # 构建请求
-        config = self.api_configs[api_name]
-        if data_type not in config['endpoints']:
+        url = self.registry.url(api_name, data_type, symbol)
+        if url is None:
             return APIResult(False, {}, api_name, 0, f"Endpoint {data_type} not supported")
+        return self._request(api_name, data_type, url, (api_name, data_type, symbol) if symbol else None, priority)
+    
+    def _request(self, api_name: str, data_type: str, url: str, negative_key: Optional[Tuple] = None,
+                 priority: str = Priority.INTERACTIVE) -> APIResult:
+        """
+        获取一个上游URL：依次查上游请求级缓存、负缓存、在途请求与持久化缓存，最后经调度放行后请求上游
+        
+        Args:
+            negative_key: 负缓存键，None时不查也不写负缓存
+        """
+        # 同一上游请求优先复用缓存，其次加入在途请求
+        cached_result = self._get_cached_data(url, self.provider_cache)
+        if cached_result:
+            self._count('provider_cache_hits')
+            return cached_result
+        
+        # 已知失败的组合直接跳过，由调用方转向备用API
+        known_failure = self.negative_cache.get(negative_key) if negative_key else None
+        if known_failure:
+            self._record_negative_hit(api_name, known_failure.error_class)
+            return known_failure
+        
+        def fetch() -> APIResult:
+            # 内存未命中时先查持久化缓存（其他进程可能已经取过）
+            disk_result = self._get_disk_cached_data(url, data_type)
+            if disk_result:
+                self._count('disk_cache_hits')
+                return disk_result
+            
+            # 只有真正要发往上游的请求才参与调度（放行即预留令牌）；被放弃的结果不写缓存，调用方转向备用API
+            if not self.scheduler.admit(api_name, priority):
+                if priority == Priority.INTERACTIVE:
+                    self.metrics.record(api_name, data_type, 'rate_limited')
+                    return APIResult(False, {}, api_name, 0, "Rate limited", error_class='rate_limited')
+                self.metrics.record(api_name, data_type, 'shed')
+                return APIResult(False, {}, api_name, 0, f"Shed: {priority} request deferred past budget",
+                                 error_class='shed')
+            
+            # 在唤醒等待者之前写入缓存，避免后来者在空窗期重复请求
+            fetched = self._fetch_upstream(api_name, data_type, url)
+            if fetched.success:
+                self._cache_data(url, fetched, data_type, self.provider_cache)
+                if self.disk_cache:
+                    self.disk_cache.set(url, asdict(fetched), self.provider_cache.ttl_for(data_type), data_type)
+            elif negative_key and fetched.error_class in self.negative_cache_ttls:
+                self.negative_cache.set(negative_key, replace(fetched, response_time=0, cached=True),
+                                        fetched.error_class)
+            return fetched
+        
+        result, shared = self._inflight.do(url, fetch)
+        if shared:
+            # 合并的请求共享同一结果，各自拿到数据的副本
+            self._count('coalesced_calls')
+            result = replace(result, data=_copy_data(result.data))
+        return result
+    
+    def get_quotes(self, symbols: List[str], priority: str = Priority.INTERACTIVE) -> Dict[str, dict]:
+        """
+        批量获取多只股票的标准化报价
+        
+        先查缓存，再按服务商分组走批量端点（按单批上限与限速切分），
+        批量未覆盖的股票最后逐个走常规故障转移链。
+        
+        Args:
+            symbols: 股票代码列表
+            priority: 请求优先级（Priority）
         
-        endpoint = config['endpoints'][data_type]
-        if symbol and '{symbol}' in endpoint:
-            endpoint = endpoint.format(symbol=symbol)
+        Returns:
+            股票代码到标准化报价的映射；获取失败的股票对应 {'error': ...}
+        """
+        wanted = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()))
+        quotes: Dict[str, dict] = {}
         
-        url = f"https://{config['host']}{endpoint}"
+        for symbol in wanted:
+            cached = self.quote_cache.get(symbol)
+            if cached:
+                quotes[symbol] = cached
+        
+        remaining = [symbol for symbol in wanted if symbol not in quotes]
+        for api_name in self.batch_quote_priority:
+            if not remaining:
+                break
+            quotes.update(self._fetch_batch_quotes(api_name, remaining, priority))
+            remaining = [symbol for symbol in remaining if symbol not in quotes]
+        
+        # 批量端点未覆盖的股票逐个获取
+        if remaining:
+            with ThreadPoolExecutor(max_workers=min(8, len(remaining))) as executor:
+                singles = dict(zip(remaining, executor.map(
+                    lambda symbol: self._fetch_single_quote(symbol, priority), remaining
+                )))
+            quotes.update({symbol: quote for symbol, quote in singles.items() if quote})
+        
+        print(f"📈 批量报价: {len(quotes)}/{len(wanted)} 只股票成功")
+        # 缓存中的报价被多个会话共享，返回副本
+        return {symbol: dict(quotes.get(symbol) or {'error': 'Quote unavailable'}) for symbol in wanted}
+    
+    def _fetch_batch_quotes(self, api_name: str, symbols: List[str],
+                            priority: str = Priority.INTERACTIVE) -> Dict[str, dict]:
+        """通过单个服务商的批量端点获取报价"""
+        batch = self.registry.batch(api_name, 'stock_quote')
+        if not batch:
+            return {}
+        
+        size = batch.max_symbols
+        chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+        # 每个批次与单股请求走同一条路径（缓存、负缓存、在途合并、调度放行）；
+        # 放行即预留令牌，一旦某批次因预算降到该优先级的余量而被放弃，后续批次不再申请，留给下一个服务商
+        refused = threading.Event()
+        
+        def fetch_chunk(chunk: List[str]) -> Optional[APIResult]:
+            if refused.is_set():
+                return None
+            url = self.registry.batch_url(api_name, 'stock_quote', chunk)
+            result = self._request(api_name, 'stock_quote_batch', url,
+                                   (api_name, 'stock_quote_batch', ','.join(chunk)), priority)
+            if result.error_class in ('shed', 'rate_limited'):
+                refused.set()
+            return result
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency_per_host, len(chunks))) as executor:
+            results = list(executor.map(fetch_chunk, chunks))
+        
+        quotes = {}
+        for result in results:
+            if result is None or result.error_class in ('shed', 'rate_limited'):
+                continue
+            if not result.success:
+                print(f"   ⚠️ {api_name} 批量报价失败: {result.error}")
+                continue
+            for quote in self.data_normalizer.normalize_batch_quotes(result.data, api_name):
+                symbol = (quote.get('symbol') or '').upper()
+                if symbol and 'error' not in quote:
+                    quote['symbol'] = symbol
+                    quotes[symbol] = quote
+                    self.quote_cache.set(symbol, quote)
+        return {symbol: quote for symbol, quote in quotes.items() if symbol in symbols}
+    
+    def _fetch_single_quote(self, symbol: str, priority: str = Priority.INTERACTIVE) -> Optional[dict]:
+        """逐个服务商尝试获取单只股票报价"""
+        for api_name in self._rank_apis(self.single_quote_priority, 'stock_quote'):
+            result = self._try_api(api_name, 'stock_quote', symbol, priority)
+            if result.success and 'error' not in result.data:
+                self.quote_cache.set(symbol, result.data)
+                return result.data
+        return None
+    
+    def _fetch_upstream(self, api_name: str, data_type: str, url: str) -> APIResult:
+        """
+        向上游发起一次实际的HTTP请求
+        
+        调用方须已通过 scheduler.admit 预留令牌（限速检查在预留时完成）；
+        请求没有发出时归还令牌
+        """
+        # 检查熔断状态
+        if not self.health_checker.allow_request(api_name, data_type):
+            self.rate_limiter.release(api_name)
+            self.metrics.record(api_name, data_type, 'circuit_open')
+            return APIResult(False, {}, api_name, 0, "API is unhealthy (circuit open)", error_class='circuit_open')
+        
+        host = self.registry.host(api_name)
         headers = {
             'X-RapidAPI-Key': self.rapidapi_key,
-            'X-RapidAPI-Host': config['host']
+            'X-RapidAPI-Host': host
         }
         
-        # 发起请求
+        # 发起请求（受每主机并发上限约束）
         start_time = time.time()
+        recorded = False
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            with self._get_host_semaphore(host):
+                response = self.http.get(url, headers=headers, timeout=10)
             response_time = time.time() - start_time
             
-            self.rate_limiter.record_call(api_name)
+            self.rate_limiter.record_call(api_name, reserved=True)
+            recorded = True
+            self._count('upstream_calls')
+            outcome = classify_status(response.status_code)
+            self.router.record(api_name, data_type, response_time, outcome in NON_ERROR_OUTCOMES)
             
-            if response.status_code == 200:
-                data = response.json()
+            if outcome == OUTCOME_EMPTY:
+                # 204 没有响应体：服务商没有该代码的数据，上游是健康的
+                self.health_checker.record_success(api_name, data_type)
+                self.metrics.record(api_name, data_type, outcome, response_time)
+                return APIResult(False, {}, api_name, response_time, f"Empty response (HTTP {response.status_code})",
+                                 error_class=outcome)
+            if outcome == OUTCOME_SUCCESS:
+                data = json_loads(response.content)
                 
                 # 数据标准化
                 if data_type == 'stock_quote':
                     normalized_data = self.data_normalizer.normalize_stock_quote(data, api_name)
+                    error = normalized_data.get('error')
                 else:
                     normalized_data = data
+                    error = 'Empty response' if self.data_normalizer.is_empty_response(data) else None
                 
-                self.health_checker.record_success(api_name)
+                # 上游是健康的，但结果不可用，交给备用API：
+                # 响应为空才说明服务商没有该代码的数据（长TTL负缓存），有内容却无法解析的归为解析错误（短TTL）
+                self.health_checker.record_success(api_name, data_type)
+                if error:
+                    error_class = OUTCOME_EMPTY if self.data_normalizer.is_empty_response(data) else 'parse_error'
+                    self.metrics.record(api_name, data_type, error_class, response_time)
+                    return APIResult(False, {}, api_name, response_time, error, error_class=error_class)
+                self.metrics.record(api_name, data_type, outcome, response_time)
                 return APIResult(True, normalized_data, api_name, response_time)
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
-                self.health_checker.record_failure(api_name)
-                return APIResult(False, {}, api_name, response_time, error_msg)
-                
+                # 只有服务端错误与限流才说明上游不健康；其他4xx是请求本身的问题
+                if response.status_code >= 500 or response.status_code == 429:
+                    self.health_checker.record_failure(api_name, data_type)
+                else:
+                    self.health_checker.record_success(api_name, data_type)
+                self.metrics.record(api_name, data_type, outcome, response_time)
+                return APIResult(False, {}, api_name, response_time, error_msg, error_class=outcome)
+        
         except Exception as e:
             response_time = time.time() - start_time
-            self.health_checker.record_failure(api_name)
-            return APIResult(False, {}, api_name, response_time, str(e))
-    
-    def _get_cached_data(self, cache_key: str) -> Optional[APIResult]:
-        """获取缓存数据"""
-        if cache_key in self.cache:
-            cached_item = self.cache[cache_key]
-            if time.time() - cached_item['timestamp'] < self.cache_ttl:
-                result = cached_item['result']
-                result.cached = True
-                return result
-            else:
-                # 缓存过期，删除
-                del self.cache[cache_key]
-        return None
+            if not recorded:
+                # 请求没有得到响应，不计入调用，归还预留的令牌
+                self.rate_limiter.release(api_name)
+            self.health_checker.record_failure(api_name, data_type)
+            self.router.record(api_name, data_type, response_time, False)
+            outcome = classify_exception(e)
+            self.metrics.record(api_name, data_type, outcome, response_time)
+            return APIResult(False, {}, api_name, response_time, str(e), error_class=outcome)
     
-    def _cache_data(self, cache_key: str, result: APIResult):
-        """缓存数据"""
-        self.cache[cache_key] = {
-            'result': result,
-            'timestamp': time.time()
+    def _count(self, event: str):
+        """事件计数加一（多个会话线程共享同一实例）"""
+        with self._stats_lock:
+            self.request_stats[event] += 1
+    
+    def _record_negative_hit(self, api_name: str, error_class: Optional[str]):
+        """记录一次负缓存命中（即省下的一次上游调用）"""
+        with self._stats_lock:
+            self.request_stats['negative_cache_hits'] += 1
+            key = (api_name, error_class or 'unknown')
+            self._negative_savings[key] = self._negative_savings.get(key, 0) + 1
+    
+    def get_negative_cache_report(self) -> Dict[str, Any]:
+        """
+        负缓存节省报告
+        
+        Returns:
+            entries: 当前记住的失败组合数
+            skipped_calls: 被跳过的上游调用总数（每次都省下一个每分钟令牌与一次月度配额）
+            providers: 每个服务商按失败分类的跳过次数，以及省下的月度配额比例
+        """
+        with self._stats_lock:
+            savings = dict(self._negative_savings)
+        providers: Dict[str, Dict[str, Any]] = {}
+        for (api_name, error_class), count in savings.items():
+            provider = providers.setdefault(api_name, {'skipped_calls': 0, 'by_error_class': {}})
+            provider['skipped_calls'] += count
+            provider['by_error_class'][error_class] = count
+        for api_name, provider in providers.items():
+            monthly_limit = self.rate_limiter.limits.get(api_name, {}).get('per_month', 0)
+            provider['monthly_quota_saved_ratio'] = provider['skipped_calls'] / monthly_limit if monthly_limit else 0.0
+        return {
+            'entries': len(self.negative_cache),
+            'skipped_calls': sum(savings.values()),
+            'providers': providers
         }
     
+    def get_request_stats(self) -> Dict[str, int]:
+        """事件计数快照"""
+        with self._stats_lock:
+            return dict(self.request_stats)
+    
+    def _get_host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        """获取上游主机的并发信号量"""
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_concurrency_per_host)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+    
+    def _get_cached_data(self, cache_key: str, store: Optional[TTLCache] = None,
+                         allow_stale: bool = False) -> Optional[APIResult]:
+        """获取缓存数据（默认读取仙人级缓存）；allow_stale时可能返回标记为stale的过期数据"""
+        store = self.cache if store is None else store
+        lookup = store.lookup(cache_key, allow_stale)
+        if not lookup:
+            return None
+        result, stale = lookup
+        # 缓存中的结果被多个会话共享，返回数据的副本，调用方修改不会影响缓存
+        return replace(result, data=_copy_data(result.data), cached=True, stale=stale)
+    
+    def _cache_data(self, cache_key: str, result: APIResult, data_type: Optional[str] = None,
+                    store: Optional[TTLCache] = None, ttl: Optional[float] = None):
+        """缓存数据（默认写入仙人级缓存），TTL由数据类型决定；写入数据的副本，调用方仍持有原结果"""
+        store = self.cache if store is None else store
+        store.set(cache_key, replace(result, data=_copy_data(result.data)), data_type, ttl=ttl)
+    
+    def _get_disk_cached_data(self, url: str, data_type: str) -> Optional[APIResult]:
+        """从持久化缓存读取上游结果，命中后回填内存缓存（保留剩余TTL）"""
+        if not self.disk_cache:
+            return None
+        entry = self.disk_cache.get_entry(url)
+        if not entry:
+            return None
+        
+        payload, expires_at = entry
+        result = APIResult(**dict(payload, cached=True))
+        self._cache_data(url, result, data_type, self.provider_cache, ttl=max(0.0, expires_at - time.time()))
+        return result
+    
     def get_load_distribution(self) -> dict:
-        """获取负载分布统计"""
+        """获取负载分布统计（最近一分钟调用 + 本月配额消耗 + 缓存命中情况）"""
         api_calls = {}
         total_calls = 0
         
-        for api_name, calls in self.rate_limiter.api_calls.items():
-            call_count = len(calls)
-            api_calls[api_name] = call_count
-            total_calls += call_count
+        for api_name in self.providers:
+            call_count = self.rate_limiter.get_call_count(api_name)
+            if call_count:
+                api_calls[api_name] = call_count
+                total_calls += call_count
         
-        if total_calls == 0:
-            return {}
+        distribution = {
+            'cache': {
+                'immortal': self.cache.stats(),
+                'provider': self.provider_cache.stats(),
+                'quote': self.quote_cache.stats(),
+                'disk': self.disk_cache.stats() if self.disk_cache else None
+            }
+        }
         
-        distribution = {}
+        circuit_states = self.health_checker.get_circuit_states()
         for api_name, call_count in api_calls.items():
             health_status = self.health_checker.health_status[api_name]
+            budget = self.rate_limiter.get_remaining_budget(api_name)
             distribution[api_name] = {
                 'calls': call_count,
                 'percentage': (call_count / total_calls) * 100,
                 'healthy': health_status['healthy'],
-                'consecutive_failures': health_status['consecutive_failures']
+                'consecutive_failures': health_status['consecutive_failures'],
+                'circuits': circuit_states.get(api_name, {}),
+                'monthly_calls': self.rate_limiter.get_monthly_calls(api_name),
+                'monthly_remaining': budget['month'],
+                'routing': self.router.snapshot().get(api_name, {})
             }
         
         return distribution
     
-    def conduct_immortal_debate(self, topic_symbol: str) -> Dict[str, APIResult]:
-        """进行八仙论道，每个仙人获取不同的数据"""
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        导出完整指标快照（自进程启动起累计），供 MetricsExporter 以Prometheus文本或JSON格式输出
+        
+        Returns:
+            providers: 每个服务商的请求数、结果分类、各端点延迟分位数、熔断状态与月度配额
+            cache: 各级缓存命中统计
+            scheduler: 各优先级的放行/排队/放弃次数、队列深度与等待时间
+            negative_cache: 负缓存跳过的上游调用（按服务商与失败分类）
+            events: 负载均衡器事件计数（合并请求、对冲、过期数据等）
+        """
+        providers = self.metrics.snapshot()
+        circuit_states = self.health_checker.get_circuit_states()
+        for api_name in self.providers:
+            provider = providers.setdefault(api_name, {'requests': 0, 'outcomes': {}, 'endpoints': {}})
+            monthly_limit = self.rate_limiter.limits.get(api_name, {}).get('per_month', 0)
+            monthly_calls = self.rate_limiter.get_monthly_calls(api_name)
+            provider['circuits'] = circuit_states.get(api_name, {})
+            provider['quota'] = {
+                'monthly_calls': monthly_calls,
+                'monthly_limit': monthly_limit,
+                'monthly_remaining': self.rate_limiter.get_remaining_budget(api_name)['month'],
+                'used_ratio': monthly_calls / monthly_limit if monthly_limit else 0.0,
+                'calls_last_minute': self.rate_limiter.get_call_count(api_name)
+            }
+        
+        return {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'uptime_seconds': time.time() - self.metrics.started_at,
+            'providers': providers,
+            'cache': {
+                'immortal': self.cache.stats(),
+                'provider': self.provider_cache.stats(),
+                'quote': self.quote_cache.stats(),
+                'disk': self.disk_cache.stats() if self.disk_cache else None,
+                'negative': self.negative_cache.stats()
+            },
+            'negative_cache': self.get_negative_cache_report(),
+            'scheduler': self.scheduler.snapshot(),
+            'events': self.get_request_stats()
+        }
+    
+    def conduct_immortal_debate(self, topic_symbol: str, concurrent: bool = True) -> Dict[str, APIResult]:
+        """
+        进行八仙论道，每个仙人获取不同的数据
+        
+        Args:
+            topic_symbol: 辩论主题股票代码
+            concurrent: 是否并发获取八仙数据；关闭时按顺序逐个获取
+        
+        Returns:
+            仙人名称到API调用结果的映射（按八仙顺序）
+        """
         print(f"\n🏛️ 稷下学宫八仙论道开始 - 主题: {topic_symbol}")
         print("=" * 60)
         
         immortals = ['吕洞宾', '何仙姑', '张果老', '韩湘子', '汉钟离', '蓝采和', '曹国舅', '铁拐李']
         debate_results = {}
         
-        # 每个仙人获取股票报价数据
-        for immortal in immortals:
-            result = self.get_data_for_immortal(immortal, 'stock_quote', topic_symbol)
-            debate_results[immortal] = result
-            
+        if concurrent:
+            # 八仙同时出手，总耗时约等于最慢的单次调用；
+            # 每主机并发上限与共享的限速器负责保护上游
+            with ThreadPoolExecutor(max_workers=len(immortals)) as executor:
+                futures = {
+                    immortal: executor.submit(self.get_data_for_immortal, immortal, 'stock_quote', topic_symbol,
+                                              Priority.DEBATE)
+                    for immortal in immortals
+                }
+                for immortal in immortals:
+                    debate_results[immortal] = futures[immortal].result()
+        else:
+            for immortal in immortals:
+                debate_results[immortal] = self.get_data_for_immortal(immortal, 'stock_quote', topic_symbol,
+                                                                      Priority.DEBATE)
+                time.sleep(0.2)  # 避免过快请求
+        
+        # 每个仙人的股票报价数据
+        for immortal, result in debate_results.items():
             if result.success:
                 data = result.data
                 if 'price' in data:
                     print(f"   💰 {immortal}: ${data['price']:.2f} ({data.get('change_percent', 'N/A')}) via {result.api_used}")
-            
-            time.sleep(0.2)  # 避免过快请求
         
         print("\n📊 负载分布统计:")
         distribution = self.get_load_distribution()
         for api_name, stats in distribution.items():
+            if api_name == 'cache':
+                continue
             print(f"   {api_name}: {stats['calls']} 次调用 ({stats['percentage']:.1f}%) - {'健康' if stats['healthy'] else '异常'}")
         
         return debate_results
+    
+    async def stream_immortal_debate(self, topic_symbol: str) -> AsyncIterator[Tuple[str, APIResult]]:
+        """
+        流式八仙论道：八仙同时获取数据，谁的数据先到谁先发言
+        
+        与 conduct_immortal_debate 相同，每位仙人的请求照常经过缓存、single-flight与限速；
+        提前停止迭代时不再等待仍在进行的请求。
+        
+        Args:
+            topic_symbol: 辩论主题股票代码
+        
+        Yields:
+            (仙人名称, API调用结果)，按完成先后顺序
+        """
+        loop = asyncio.get_running_loop()
+        immortals = list(self.immortal_api_mapping['stock_quote'])
+        executor = ThreadPoolExecutor(max_workers=len(immortals))
+        
+        async def resolve(immortal_name: str) -> Tuple[str, APIResult]:
+            try:
+                result = await loop.run_in_executor(executor, self.get_data_for_immortal, immortal_name,
+                                                    'stock_quote', topic_symbol, Priority.DEBATE)
+            except Exception as e:
+                result = APIResult(False, {}, '', 0, f"Unexpected error: {str(e)}")
+            return immortal_name, result
+        
+        tasks = [asyncio.ensure_future(resolve(immortal_name)) for immortal_name in immortals]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False)
+
+_shared_balancers: Dict[str, JixiaLoadBalancer] = {}
+_shared_balancers_lock = threading.Lock()
+
+def get_shared_load_balancer(rapidapi_key: Optional[str] = None) -> JixiaLoadBalancer:
+    """
+    获取进程内共享的负载均衡器（每个密钥一个实例）
+    
+    Streamlit每个浏览器会话运行在独立线程上，共用一个实例后所有会话
+    共享已预热的缓存、限速配额、熔断状态与路由统计。
+    
+    Args:
+        rapidapi_key: RapidAPI密钥，默认读取 RAPIDAPI_KEY 环境变量
+    """
+    rapidapi_key = rapidapi_key or os.getenv('RAPIDAPI_KEY')
+    if not rapidapi_key:
+        raise ValueError("RapidAPI密钥不能为空")
+    with _shared_balancers_lock:
+        balancer = _shared_balancers.get(rapidapi_key)
+        if balancer is None:
+            balancer = JixiaLoadBalancer(rapidapi_key)
+            _shared_balancers[rapidapi_key] = balancer
+            # 可选：按关注列表在后台预热缓存，如 JIXIA_PREWARM_WATCHLIST=TSLA,NVDA,AAPL
+            watchlist = [symbol.strip().upper() for symbol in os.getenv('JIXIA_PREWARM_WATCHLIST', '').split(',')
+                         if symbol.strip()]
+            if watchlist:
+                from src.jixia.engines.cache_warmer import CacheWarmer
+                balancer.warmer = CacheWarmer(balancer, watchlist)
+                balancer.warmer.start()
+        return balancer
 
 # 使用示例
 if __name__ == "__main__":
@@ -453,10 +1135,23 @@ if __name__ == "__main__":
         print("❌ 请设置RAPIDAPI_KEY环境变量")
         exit(1)
     
-    # 创建负载均衡器
-    load_balancer = JixiaLoadBalancer(rapidapi_key)
+    # 获取进程内共享的负载均衡器
+    load_balancer = get_shared_load_balancer(rapidapi_key)
+    
+    # 可选：暴露Prometheus指标端点
+    metrics_port = os.getenv('JIXIA_METRICS_PORT')
+    if metrics_port:
+        MetricsExporter(load_balancer).serve(int(metrics_port))
     
     # 进行八仙论道
     results = load_balancer.conduct_immortal_debate('TSLA')
     
-    print("\n🎉 八仙论道完成！")
\ No newline at end of file
+    print("\n🎉 八仙论道完成！")
+    
+    print("\n⏱️ 上游延迟:")
+    for api_name, provider in load_balancer.get_metrics()['providers'].items():
+        for data_type, endpoint in provider['endpoints'].items():
+            latency = endpoint['latency']
+            if latency:
+                print(f"   {api_name}/{data_type}: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, "
+                      f"p99 {latency['p99']:.2f}s ({latency['count']} 次, 结果 {endpoint['outcomes']})")
\ No newline at end of file
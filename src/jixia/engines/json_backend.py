@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫JSON解码
+按 orjson > ujson > 标准库json 的顺序选择已安装的最快后端，
+可通过 JIXIA_JSON_BACKEND 环境变量指定
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Union
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+def available_backends() -> Dict[str, Callable[[Union[bytes, str]], Any]]:
+    """已安装的JSON解码后端（按速度从快到慢）"""
+    backends: Dict[str, Callable[[Union[bytes, str]], Any]] = {}
+    try:
+        import orjson
+        backends['orjson'] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends['ujson'] = ujson.loads
+    except ImportError:
+        pass
+    backends['json'] = _stdlib_loads
+    return backends
+
+def _select_backend():
+    backends = available_backends()
+    preferred = os.getenv('JIXIA_JSON_BACKEND', '').lower()
+    if preferred in backends:
+        return preferred, backends[preferred]
+    return next(iter(backends.items()))
+
+BACKEND, loads = _select_backend()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫指标
+按服务商+端点记录上游延迟直方图与按错误类型分类的调用计数，
+并以Prometheus文本格式或定期JSON文件导出负载均衡器的完整指标
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# 直方图桶上界（秒），与Prometheus默认桶相近，覆盖RapidAPI常见的0.1s~10s响应时间
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 调用结果分类
+OUTCOME_SUCCESS = 'success'
+OUTCOME_EMPTY = 'empty_response'
+# 不计为错误的分类：上游正常响应（空响应只是没有该代码的数据）
+NON_ERROR_OUTCOMES = (OUTCOME_SUCCESS, OUTCOME_EMPTY)
+
+def classify_status(status_code: int) -> str:
+    """按HTTP状态码分类（204 没有响应体，如 yh_finance 对未知代码的响应，归为空响应）"""
+    if status_code == 204:
+        return OUTCOME_EMPTY
+    if 200 <= status_code < 300:
+        return OUTCOME_SUCCESS
+    if status_code == 429:
+        return 'http_429'
+    if 400 <= status_code < 500:
+        return 'http_4xx'
+    if status_code >= 500:
+        return 'http_5xx'
+    return 'http_other'
+
+def classify_exception(error: BaseException) -> str:
+    """按异常类型分类（按类名判断，不依赖具体的HTTP库）"""
+    name = type(error).__name__
+    if 'Timeout' in name:
+        return 'timeout'
+    if 'Connect' in name:
+        return 'connection'
+    if isinstance(error, ValueError):
+        return 'parse_error'
+    return 'exception'
+
+class LatencyHistogram:
+    """固定桶延迟直方图"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        """记录一个样本（调用方持有锁）"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶内线性插值估算分位数"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """导出直方图"""
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+            'buckets': list(self.buckets),
+            'bucket_counts': list(self.counts)
+        }
+
+class UpstreamMetrics:
+    """上游调用指标：延迟直方图 + 分类计数"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._outcomes: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+    
+    def record(self, api_name: str, data_type: str, outcome: str, latency: Optional[float] = None):
+        """
+        记录一次调用
+        
+        Args:
+            outcome: 结果分类，success / http_429 / http_5xx / timeout / rate_limited 等
+            latency: 响应时间（秒），未实际发出请求时为None
+        """
+        with self._lock:
+            key = (api_name, data_type, outcome)
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+            if latency is not None:
+                histogram = self._histograms.get((api_name, data_type))
+                if histogram is None:
+                    histogram = self._histograms[(api_name, data_type)] = LatencyHistogram(self.buckets)
+                histogram.observe(latency)
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """按服务商、端点导出延迟与计数"""
+        with self._lock:
+            providers: Dict[str, Dict[str, Any]] = {}
+            for (api_name, data_type, outcome), count in self._outcomes.items():
+                provider = providers.setdefault(api_name, {'requests': 0, 'outcomes': {}, 'endpoints': {}})
+                endpoint = provider['endpoints'].setdefault(data_type, {'outcomes': {}, 'latency': None})
+                provider['requests'] += count
+                provider['outcomes'][outcome] = provider['outcomes'].get(outcome, 0) + count
+                endpoint['outcomes'][outcome] = count
+            for (api_name, data_type), histogram in self._histograms.items():
+                providers[api_name]['endpoints'][data_type]['latency'] = histogram.snapshot()
+            return providers
+
+_CIRCUIT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+def render_prometheus(snapshot: Dict[str, Any]) -> str:
+    """把负载均衡器指标快照渲染为Prometheus文本格式"""
+    lines: List[str] = []
+    
+    def metric(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{_labels(**labels) if labels else ''} {value}")
+    
+    providers = snapshot['providers']
+    
+    duration_samples = []
+    outcome_samples = []
+    for api_name, provider in providers.items():
+        for data_type, endpoint in provider['endpoints'].items():
+            for outcome, count in endpoint['outcomes'].items():
+                outcome_samples.append(('', {'provider': api_name, 'endpoint': data_type, 'outcome': outcome}, count))
+            latency = endpoint['latency']
+            if not latency:
+                continue
+            cumulative = 0
+            for bound, count in zip(latency['buckets'] + ['+Inf'], latency['bucket_counts']):
+                cumulative += count
+                duration_samples.append(('_bucket', {'provider': api_name, 'endpoint': data_type, 'le': bound}, cumulative))
+            duration_samples.append(('_sum', {'provider': api_name, 'endpoint': data_type}, latency['sum']))
+            duration_samples.append(('_count', {'provider': api_name, 'endpoint': data_type}, latency['count']))
+    metric('jixia_upstream_request_duration_seconds', 'histogram', '上游请求耗时', duration_samples)
+    metric('jixia_upstream_requests_total', 'counter', '上游请求数（按结果分类）', outcome_samples)
+    
+    circuit_samples = [
+        ('', {'provider': api_name, 'endpoint': endpoint}, _CIRCUIT_STATE_VALUES.get(state['state'], -1))
+        for api_name, provider in providers.items()
+        for endpoint, state in provider.get('circuits', {}).items()
+    ]
+    metric('jixia_circuit_state', 'gauge', '熔断器状态（0=closed, 1=half_open, 2=open）', circuit_samples)
+    
+    quota = [(api_name, provider['quota']) for api_name, provider in providers.items() if provider.get('quota')]
+    metric('jixia_quota_monthly_calls', 'gauge', '本月已用调用次数',
+           [('', {'provider': api_name}, q['monthly_calls']) for api_name, q in quota])
+    metric('jixia_quota_monthly_limit', 'gauge', '每月调用限额',
+           [('', {'provider': api_name}, q['monthly_limit']) for api_name, q in quota])
+    metric('jixia_quota_monthly_used_ratio', 'gauge', '本月配额消耗比例',
+           [('', {'provider': api_name}, q['used_ratio']) for api_name, q in quota])
+    
+    caches = [(name, stats) for name, stats in snapshot['cache'].items() if stats]
+    metric('jixia_cache_hits_total', 'counter', '缓存命中次数',
+           [('', {'cache': name}, stats['hits']) for name, stats in caches])
+    metric('jixia_cache_misses_total', 'counter', '缓存未命中次数',
+           [('', {'cache': name}, stats['misses']) for name, stats in caches])
+    metric('jixia_cache_hit_ratio', 'gauge', '缓存命中率',
+           [('', {'cache': name}, stats['hit_rate']) for name, stats in caches])
+    
+    negative = (snapshot.get('negative_cache') or {}).get('providers', {})
+    metric('jixia_negative_cache_skipped_calls_total', 'counter', '负缓存跳过的上游调用数',
+           [('', {'provider': api_name, 'error_class': error_class}, count)
+            for api_name, provider in negative.items()
+            for error_class, count in provider['by_error_class'].items()])
+    
+    scheduler = snapshot.get('scheduler') or {}
+    for outcome, help_text in (('admitted', '调度器放行请求数'), ('deferred', '调度器排队请求数'),
+                               ('shed', '调度器放弃请求数')):
+        metric(f'jixia_scheduler_{outcome}_total', 'counter', help_text,
+               [('', {'priority': priority}, stats[outcome]) for priority, stats in scheduler.items()])
+    metric('jixia_scheduler_queue_depth', 'gauge', '调度器当前排队请求数',
+           [('', {'priority': priority}, stats['queue_depth']) for priority, stats in scheduler.items()])
+    metric('jixia_scheduler_wait_seconds_p95', 'gauge', '调度器近期排队等待时间p95',
+           [('', {'priority': priority}, stats['wait_p95']) for priority, stats in scheduler.items()])
+    
+    metric('jixia_load_balancer_events_total', 'counter', '负载均衡器事件计数',
+           [('', {'event': event}, count) for event, count in snapshot['events'].items()])
+    return '\n'.join(lines) + '\n'
+
+class MetricsExporter:
+    """指标导出器：Prometheus HTTP端点，或定期写入JSON文件"""
+    
+    def __init__(self, balancer, json_path: Optional[str] = None, interval: float = 60.0):
+        """
+        初始化导出器
+        
+        Args:
+            balancer: 提供 get_metrics() 的负载均衡器
+            json_path: 定期写入指标快照的JSON文件路径
+            interval: JSON写入间隔（秒）
+        """
+        self.balancer = balancer
+        self.json_path = json_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def dump_json(self, path: Optional[str] = None) -> str:
+        """写入一次指标快照（先写临时文件再替换，读取方不会看到半个文件）"""
+        path = path or self.json_path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.balancer.get_metrics(), f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+    
+    def start(self):
+        """启动后台线程，每隔 interval 秒写入一次JSON快照"""
+        if not self.json_path or self._thread:
+            return
+        
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.dump_json()
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"⚠️ 指标导出失败: {e}")
+        
+        self._thread = threading.Thread(target=run, name='jixia-metrics', daemon=True)
+        self._thread.start()
+    
+    def serve(self, port: int = 9108, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """在后台线程启动HTTP端点：/metrics 为Prometheus文本，/metrics.json 为JSON快照"""
+        balancer = self.balancer
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = render_prometheus(balancer.get_metrics()).encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(balancer.get_metrics(), ensure_ascii=False, default=str).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='jixia-metrics-http', daemon=True).start()
+        print(f"📈 指标端点: http://{host}:{self._server.server_port}/metrics")
+        return self._server
+    
+    def stop(self):
+        """停止导出"""
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -10,11 +10,22 @@
 - 统一配置管理
 """
 
+import asyncio
 import requests
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from src.jixia.engines.disk_cache import DiskCache
+from src.jixia.engines.http_pool import get_http_pool, upstream_url
+from src.jixia.engines.json_backend import loads as json_loads
+from src.jixia.engines.provider_registry import get_registry
+from src.jixia.engines.usage_ledger import UsageLedger, get_usage_ledger
 
 @dataclass
 class ImmortalConfig:
@@ -32,15 +43,68 @@ class APIResult:
     usage_count: Optional[int] = None
     error: Optional[str] = None
 
+@dataclass(frozen=True)
+class PlannedFetch:
+    """数据计划中的一次上游请求"""
+    api_name: str
+    data_type: str
+    url: str
+
+@dataclass
+class DebatePlan:
+    """论道数据计划：每位仙人的请求链（主要API + 备用API），相同URL只请求一次"""
+    topic_symbol: str
+    chains: Dict[str, List[PlannedFetch]]
+    
+    @property
+    def primary_fetches(self) -> Dict[str, PlannedFetch]:
+        """去重后的首轮请求（URL -> 请求）"""
+        unique: Dict[str, PlannedFetch] = {}
+        for chain in self.chains.values():
+            if chain:
+                unique.setdefault(chain[0].url, chain[0])
+        return unique
+    
+    @property
+    def calls_saved(self) -> int:
+        """首轮因URL相同而省下的请求数"""
+        return sum(1 for chain in self.chains.values() if chain) - len(self.primary_fetches)
+    
+    def describe(self) -> str:
+        """计划概要：每个上游URL由哪些仙人共享"""
+        fetches = self.primary_fetches
+        lines = [f"📋 数据计划: {len(self.chains)} 位仙人 → {len(fetches)} 次上游请求 (节省 {self.calls_saved} 次)"]
+        for url, fetch in fetches.items():
+            parts = urlsplit(url)
+            path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+            immortals = [name for name, chain in self.chains.items() if chain and chain[0].url == url]
+            lines.append(f"   {fetch.api_name} {path} ← {'、'.join(immortals)}")
+        return '\n'.join(lines)
+
 class JixiaPerpetualEngine:
     """稷下学宫永动机引擎"""
     
-    def __init__(self, rapidapi_key: str):
+    # 八仙专长 -> 论道时请求的数据类型
+    SPECIALTY_DATA_TYPES: Dict[str, str] = {
+        'comprehensive_analysis': 'overview',
+        'etf_tracking': 'quote',
+        'fundamental_analysis': 'profile',
+        'emerging_trends': 'news',
+        'hot_trends': 'gainers',
+        'undervalued_stocks': 'search',
+        'institutional_analysis': 'profile',
+        'contrarian_analysis': 'analysis'
+    }
+    
+    def __init__(self, rapidapi_key: str, disk_cache_path: Optional[str] = None,
+                 usage_ledger_path: Optional[str] = None):
         """
         初始化永动机引擎
         
         Args:
             rapidapi_key: RapidAPI密钥，从环境变量或Doppler获取
+            disk_cache_path: 跨进程共享的持久化缓存路径，None使用默认路径，空字符串禁用
+            usage_ledger_path: 调用账本路径，None使用默认路径，空字符串禁用
         """
         if not rapidapi_key:
             raise ValueError("RapidAPI密钥不能为空")
@@ -91,16 +155,44 @@ class JixiaPerpetualEngine:
             )
         }
         
-        # API池配置 - 只保留4个可用的API
+        # API池配置 - 只保留4个可用的API（主机与端点来自服务商注册表）
+        self.registry = get_registry()
         self.api_configs: Dict[str, str] = {
-            'alpha_vantage': 'alpha-vantage.p.rapidapi.com',        # 1.26s ⚡
-            'webull': 'webull.p.rapidapi.com',                     # 1.56s ⚡
-            'yahoo_finance_1': 'yahoo-finance15.p.rapidapi.com',   # 2.07s
-            'seeking_alpha': 'seeking-alpha.p.rapidapi.com'        # 3.32s
+            api_name: self.registry.host(api_name)
+            for api_name in ('alpha_vantage', 'webull', 'yahoo_finance_1', 'seeking_alpha')
         }
         
-        # 使用统计
+        # 按主机共享的keep-alive连接池
+        self.http = get_http_pool()
+        
+        # 调用账本：每次上游调用一条记录，跨进程、跨重启累计
+        self.ledger: Optional[UsageLedger] = None
+        if usage_ledger_path != '':
+            try:
+                self.ledger = get_usage_ledger(usage_ledger_path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ 调用账本不可用: {e}")
+        
+        # 使用统计（数据计划并发执行时多个线程同时更新），从账本中的本月调用数开始累计
         self.usage_tracker: Dict[str, int] = {api: 0 for api in self.api_configs.keys()}
+        if self.ledger:
+            for api_name, usage in self.ledger.monthly_summary().items():
+                if api_name in self.usage_tracker:
+                    self.usage_tracker[api_name] = usage['calls']
+        self.plan_stats: Dict[str, int] = {'planned_requests': 0, 'fetches': 0}
+        self._usage_lock = threading.Lock()
+        
+        # 数据计划并发执行的最大线程数
+        self.max_plan_workers = 8
+        
+        # 持久化响应缓存：Streamlit每次重跑都会新建引擎，共享缓存避免重复请求
+        self.cache_ttl = 300
+        self.disk_cache: Optional[DiskCache] = None
+        if disk_cache_path != '':
+            try:
+                self.disk_cache = DiskCache(disk_cache_path, namespace='perpetual')
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ 持久化缓存不可用: {e}")
         
     def get_immortal_data(self, immortal_name: str, data_type: str, symbol: str = 'AAPL') -> APIResult:
         """
@@ -122,7 +214,7 @@ class JixiaPerpetualEngine:
         print(f"🧙‍♂️ {immortal_name} 请求 {data_type} 数据 (股票: {symbol})")
         
         # 尝试主要API
-        result = self._call_api(immortal_config.primary, data_type, symbol)
+        result = self._call_api(immortal_config.primary, data_type, symbol, immortal_name)
         if result.success:
             print(f"   ✅ 使用主要API: {immortal_config.primary}")
             return result
@@ -130,7 +222,7 @@ class JixiaPerpetualEngine:
         # 故障转移到备用API
         for backup_api in immortal_config.backup:
             print(f"   🔄 故障转移到: {backup_api}")
-            result = self._call_api(backup_api, data_type, symbol)
+            result = self._call_api(backup_api, data_type, symbol, immortal_name)
             if result.success:
                 print(f"   ✅ 备用API成功: {backup_api}")
                 return result
@@ -138,7 +230,7 @@ class JixiaPerpetualEngine:
         print(f"   ❌ 所有API都失败了")
         return APIResult(success=False, error='All APIs failed')
     
-    def _call_api(self, api_name: str, data_type: str, symbol: str) -> APIResult:
+    def _call_api(self, api_name: str, data_type: str, symbol: str, caller: str = '') -> APIResult:
         """
         调用指定API
         
@@ -146,6 +238,7 @@ class JixiaPerpetualEngine:
             api_name: API名称
             data_type: 数据类型
             symbol: 股票代码
+            caller: 发起调用的仙人，记入调用账本
             
         Returns:
             API调用结果
@@ -153,27 +246,64 @@ class JixiaPerpetualEngine:
         if api_name not in self.api_configs:
             return APIResult(success=False, error=f'API {api_name} not configured')
         
-        host = self.api_configs[api_name]
+        fetch = self._plan_fetch(api_name, data_type, symbol)
+        if not fetch:
+            return APIResult(success=False, error=f'No endpoint for {data_type} on {api_name}')
+        return self._fetch(fetch, caller)
+    
+    def _plan_fetch(self, api_name: str, data_type: str, symbol: str) -> Optional[PlannedFetch]:
+        """解析出实际请求的上游URL；API未配置或没有对应端点时返回None"""
+        if api_name not in self.api_configs:
+            return None
+        endpoint = self._get_endpoint(api_name, data_type, symbol)
+        if not endpoint:
+            return None
+        return PlannedFetch(api_name, data_type, upstream_url(self.api_configs[api_name], endpoint))
+    
+    def _fetch(self, fetch: PlannedFetch, caller: str = '') -> APIResult:
+        """
+        请求一个上游URL（先查持久化缓存）
+        
+        Args:
+            fetch: 计划中的请求
+            caller: 发起调用的仙人（多位仙人共享一个URL时以顿号分隔），记入调用账本
+            
+        Returns:
+            API调用结果
+        """
+        api_name, data_type, url = fetch.api_name, fetch.data_type, fetch.url
         headers = {
             'X-RapidAPI-Key': self.rapidapi_key,
-            'X-RapidAPI-Host': host,
+            'X-RapidAPI-Host': self.api_configs[api_name],
             'Content-Type': 'application/json'
         }
         
-        endpoint = self._get_endpoint(api_name, data_type, symbol)
-        if not endpoint:
-            return APIResult(success=False, error=f'No endpoint for {data_type} on {api_name}')
-        
-        url = f"https://{host}{endpoint}"
+        if self.disk_cache:
+            cached_data = self.disk_cache.get(url)
+            if cached_data is not None:
+                return APIResult(
+                    success=True,
+                    data=cached_data,
+                    api_used=api_name,
+                    usage_count=self.usage_tracker[api_name]
+                )
         
+        started = time.time()
         try:
-            response = requests.get(url, headers=headers, timeout=8)
-            self.usage_tracker[api_name] += 1
+            response = self.http.get(url, headers=headers, timeout=8)
+            with self._usage_lock:
+                self.usage_tracker[api_name] += 1
+            if self.ledger:
+                self.ledger.record(api_name, data_type, response.status_code, time.time() - started,
+                                   len(response.content), caller or 'perpetual_engine', started)
             
             if response.status_code == 200:
+                data = json_loads(response.content)
+                if self.disk_cache:
+                    self.disk_cache.set(url, data, self.cache_ttl, data_type)
                 return APIResult(
                     success=True,
-                    data=response.json(),
+                    data=data,
                     api_used=api_name,
                     usage_count=self.usage_tracker[api_name]
                 )
@@ -183,12 +313,20 @@ class JixiaPerpetualEngine:
                     error=f'HTTP {response.status_code}: {response.text[:100]}'
                 )
         except requests.exceptions.Timeout:
+            self._record_failed_call(fetch, caller, started)
             return APIResult(success=False, error='Request timeout')
         except requests.exceptions.RequestException as e:
+            self._record_failed_call(fetch, caller, started)
             return APIResult(success=False, error=f'Request error: {str(e)}')
         except Exception as e:
             return APIResult(success=False, error=f'Unexpected error: {str(e)}')
     
+    def _record_failed_call(self, fetch: PlannedFetch, caller: str, started: float):
+        """把没有得到响应的上游调用（超时、连接失败）以状态码0记入调用账本"""
+        if self.ledger:
+            self.ledger.record(fetch.api_name, fetch.data_type, 0, time.time() - started, 0,
+                               caller or 'perpetual_engine', started)
+    
     def _get_endpoint(self, api_name: str, data_type: str, symbol: str) -> Optional[str]:
         """
         根据API和数据类型返回合适的端点
@@ -199,41 +337,145 @@ class JixiaPerpetualEngine:
             symbol: 股票代码
             
         Returns:
-            API端点路径
+            API端点路径；该API没有对应数据类型时退回报价端点
+        """
+        return self.registry.path(api_name, data_type, symbol) or self.registry.path(api_name, 'quote', symbol)
+    
+    def compile_debate_plan(self, topic_symbol: str) -> DebatePlan:
+        """
+        把八仙对某个主题的数据需求编译为数据计划
+        
+        许多数据类型在同一服务商上落到同一个URL（如webull的search/quote/analysis/profile
+        都是 /stock/search），计划按URL去重，执行时每个URL只请求一次。
+        
+        Args:
+            topic_symbol: 辩论主题股票代码
+            
+        Returns:
+            数据计划
+        """
+        chains: Dict[str, List[PlannedFetch]] = {}
+        for immortal_name, config in self.immortal_apis.items():
+            data_type = self.SPECIALTY_DATA_TYPES.get(config.specialty, 'quote')
+            chain = []
+            for api_name in [config.primary] + config.backup:
+                fetch = self._plan_fetch(api_name, data_type, topic_symbol)
+                if fetch and fetch not in chain:
+                    chain.append(fetch)
+            chains[immortal_name] = chain
+        return DebatePlan(topic_symbol, chains)
+    
+    def execute_plan(self, plan: DebatePlan) -> Dict[str, APIResult]:
+        """
+        执行数据计划：每轮并发请求去重后的URL，把结果分发给共享该URL的仙人；
+        失败的仙人进入下一轮，改用请求链中的下一个API（已请求过的URL直接复用结果）
+        
+        Args:
+            plan: compile_debate_plan 生成的数据计划
+            
+        Returns:
+            仙人名称到API调用结果的映射（按八仙顺序）
         """
-        endpoint_mapping = {
-            'alpha_vantage': {
-                'quote': f'/query?function=GLOBAL_QUOTE&symbol={symbol}',
-                'overview': f'/query?function=OVERVIEW&symbol={symbol}',
-                'earnings': f'/query?function=EARNINGS&symbol={symbol}',
-                'profile': f'/query?function=OVERVIEW&symbol={symbol}',
-                'analysis': f'/query?function=OVERVIEW&symbol={symbol}'
-            },
-            'yahoo_finance_1': {
-                'quote': f'/api/yahoo/qu/quote/{symbol}',
-                'gainers': '/api/yahoo/co/collections/day_gainers',
-                'losers': '/api/yahoo/co/collections/day_losers',
-                'search': f'/api/yahoo/qu/quote/{symbol}',
-                'analysis': f'/api/yahoo/qu/quote/{symbol}',
-                'profile': f'/api/yahoo/qu/quote/{symbol}'
-            },
-            'seeking_alpha': {
-                'profile': f'/symbols/get-profile?symbols={symbol}',
-                'news': '/news/list?category=market-news',
-                'analysis': f'/symbols/get-profile?symbols={symbol}',
-                'quote': f'/symbols/get-profile?symbols={symbol}'
-            },
-            'webull': {
-                'search': f'/stock/search?keyword={symbol}',
-                'quote': f'/stock/search?keyword={symbol}',
-                'analysis': f'/stock/search?keyword={symbol}',
-                'gainers': '/market/get-active-gainers',
-                'profile': f'/stock/search?keyword={symbol}'
-            }
+        results: Dict[str, APIResult] = {}
+        fetched: Dict[str, APIResult] = {}
+        position = {immortal_name: 0 for immortal_name in plan.chains}
+        pending = [immortal_name for immortal_name, chain in plan.chains.items() if chain]
+        
+        with ThreadPoolExecutor(max_workers=self.max_plan_workers) as executor:
+            while pending:
+                wanted: Dict[str, PlannedFetch] = {}
+                callers: Dict[str, List[str]] = {}
+                for immortal_name in pending:
+                    fetch = plan.chains[immortal_name][position[immortal_name]]
+                    if fetch.url not in fetched:
+                        wanted.setdefault(fetch.url, fetch)
+                        callers.setdefault(fetch.url, []).append(immortal_name)
+                futures = {
+                    url: executor.submit(self._fetch, fetch, '、'.join(callers[url]))
+                    for url, fetch in wanted.items()
+                }
+                for url, future in futures.items():
+                    try:
+                        fetched[url] = future.result()
+                    except Exception as e:
+                        fetched[url] = APIResult(success=False, error=f'Unexpected error: {str(e)}')
+                
+                still_pending = []
+                for immortal_name in pending:
+                    chain = plan.chains[immortal_name]
+                    result = fetched[chain[position[immortal_name]].url]
+                    if result.success:
+                        results[immortal_name] = result
+                    elif position[immortal_name] + 1 < len(chain):
+                        position[immortal_name] += 1
+                        still_pending.append(immortal_name)
+                pending = still_pending
+        
+        self._record_plan(sum(position[name] + 1 for name, chain in plan.chains.items() if chain), len(fetched))
+        
+        return {
+            immortal_name: results.get(immortal_name) or APIResult(success=False, error='All APIs failed')
+            for immortal_name in plan.chains
         }
+    
+    def _record_plan(self, planned_requests: int, fetches: int):
+        """
+        记录一次计划执行
+        
+        Args:
+            planned_requests: 逐个仙人依次请求时会发出的请求数
+            fetches: 实际请求的URL数，两者之差即为计划省下的调用
+        """
+        with self._usage_lock:
+            self.plan_stats['planned_requests'] += planned_requests
+            self.plan_stats['fetches'] += fetches
+    
+    async def stream_jixia_debate(self, topic_symbol: str = 'TSLA') -> AsyncIterator[Tuple[str, APIResult]]:
+        """
+        流式八仙论道：所有仙人同时开始获取数据，谁的数据先到谁先发言
+        
+        按数据计划去重，相同URL只请求一次；某个API失败的仙人立即改用下一个API，
+        不必等待其他仙人。提前停止迭代时不再等待仍在进行的请求。
+        
+        Args:
+            topic_symbol: 辩论主题股票代码
+            
+        Yields:
+            (仙人名称, API调用结果)，按完成先后顺序
+        """
+        plan = self.compile_debate_plan(topic_symbol)
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.max_plan_workers)
+        fetched: Dict[str, asyncio.Future] = {}
+        attempts: Dict[str, int] = {}
+        
+        def fetch_once(fetch: PlannedFetch, immortal_name: str) -> asyncio.Future:
+            future = fetched.get(fetch.url)
+            if future is None:
+                future = fetched[fetch.url] = loop.run_in_executor(executor, self._fetch, fetch, immortal_name)
+            return future
         
-        api_endpoints = endpoint_mapping.get(api_name, {})
-        return api_endpoints.get(data_type, api_endpoints.get('quote'))
+        async def resolve(immortal_name: str) -> Tuple[str, APIResult]:
+            for index, fetch in enumerate(plan.chains[immortal_name]):
+                attempts[immortal_name] = index + 1
+                try:
+                    result = await fetch_once(fetch, immortal_name)
+                except Exception as e:
+                    # 共享该URL的仙人都会等到同一个异常，各自改用下一个API
+                    result = APIResult(success=False, error=f'Unexpected error: {str(e)}')
+                if result.success:
+                    return immortal_name, result
+            return immortal_name, APIResult(success=False, error='All APIs failed')
+        
+        tasks = [asyncio.ensure_future(resolve(immortal_name)) for immortal_name in plan.chains]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False)
+            self._record_plan(sum(attempts.values()), len(fetched))
     
     def simulate_jixia_debate(self, topic_symbol: str = 'TSLA') -> Dict[str, APIResult]:
         """
@@ -248,34 +490,23 @@ class JixiaPerpetualEngine:
         print(f"🏛️ 稷下学宫八仙论道 - 主题: {topic_symbol}")
         print("=" * 60)
         
-        debate_results: Dict[str, APIResult] = {}
+        # 先编译数据计划，相同URL只请求一次，各URL并发请求
+        plan = self.compile_debate_plan(topic_symbol)
+        print(plan.describe())
+        plan_results = self.execute_plan(plan)
         
-        # 数据类型映射
-        data_type_mapping = {
-            'comprehensive_analysis': 'overview',
-            'etf_tracking': 'quote',
-            'fundamental_analysis': 'profile',
-            'emerging_trends': 'news',
-            'hot_trends': 'gainers',
-            'undervalued_stocks': 'search',
-            'institutional_analysis': 'profile',
-            'contrarian_analysis': 'analysis'
-        }
+        debate_results: Dict[str, APIResult] = {}
         
         # 八仙依次发言
         for immortal_name, config in self.immortal_apis.items():
             print(f"\n🎭 {immortal_name} ({config.specialty}) 发言:")
             
-            data_type = data_type_mapping.get(config.specialty, 'quote')
-            result = self.get_immortal_data(immortal_name, data_type, topic_symbol)
-            
+            result = plan_results[immortal_name]
             if result.success:
                 debate_results[immortal_name] = result
                 print(f"   💬 观点: 基于{result.api_used}数据的{config.specialty}分析")
             else:
                 print(f"   😔 暂时无法获取数据: {result.error}")
-            
-            time.sleep(0.5)  # 避免过快请求
         
         return debate_results
     
@@ -287,6 +518,13 @@ class JixiaPerpetualEngine:
             统计信息字典
         """
         total_calls = sum(self.usage_tracker.values())
+        
+        # 月度与近24小时用量来自账本的天/小时汇总，数月的数据也只需读取几十行
+        monthly_usage: Dict[str, Dict[str, Any]] = {}
+        last_24h: Dict[str, Dict[str, Any]] = {}
+        if self.ledger:
+            monthly_usage = self.ledger.monthly_summary()
+            last_24h = self.ledger.summary(time.time() - 86400, granularity='hour')
         active_apis = len([api for api, count in self.usage_tracker.items() if count > 0])
         unused_apis = [api for api, count in self.usage_tracker.items() if count == 0]
         
@@ -297,7 +535,12 @@ class JixiaPerpetualEngine:
             'average_calls_per_api': total_calls / len(self.api_configs) if self.api_configs else 0,
             'usage_by_api': {api: count for api, count in self.usage_tracker.items() if count > 0},
             'unused_apis': unused_apis,
-            'unused_count': len(unused_apis)
+            'unused_count': len(unused_apis),
+            'planned_requests': self.plan_stats['planned_requests'],
+            'plan_fetches': self.plan_stats['fetches'],
+            'calls_saved_by_plan': self.plan_stats['planned_requests'] - self.plan_stats['fetches'],
+            'monthly_usage': monthly_usage,
+            'last_24h': last_24h
         }
     
     def print_perpetual_stats(self) -> None:
@@ -315,6 +558,21 @@ class JixiaPerpetualEngine:
             for api, count in stats['usage_by_api'].items():
                 print(f"  {api}: {count}次")
         
+        if stats['planned_requests']:
+            print(f"\n📋 数据计划: {stats['planned_requests']} 个请求合并为 {stats['plan_fetches']} 次获取，"
+                  f"节省 {stats['calls_saved_by_plan']} 次调用")
+        
+        if stats['monthly_usage']:
+            print(f"\n📒 本月调用账本:")
+            for api, usage in sorted(stats['monthly_usage'].items()):
+                provider = self.registry.get(api)
+                quota = f" / {provider.per_month} ({usage['calls'] / provider.per_month * 100:.2f}%)" \
+                    if provider and provider.per_month else ''
+                recent = stats['last_24h'].get(api, {})
+                print(f"  {api}: {usage['calls']}次{quota}，错误率 {usage['error_rate'] * 100:.1f}%，"
+                      f"平均延迟 {usage['latency_mean'] * 1000:.0f}ms (最大 {usage['latency_max'] * 1000:.0f}ms)，"
+                      f"近24小时 {recent.get('calls', 0)}次")
+        
         print(f"\n🎯 未使用的API储备: {stats['unused_count']}个")
         if stats['unused_apis']:
             unused_display = ', '.join(stats['unused_apis'][:5])
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫请求调度器
+上游请求按优先级分为 interactive / debate / prefetch / backfill 四类：
+每分钟预算接近用尽时，低优先级请求让出为高优先级预留的余量，排队等待或直接放弃；
+放行即从限速器预留一个令牌，并发放行的请求各自扣减预算
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+class Priority:
+    """请求优先级"""
+    INTERACTIVE = 'interactive'  # 用户正在等待的请求
+    DEBATE = 'debate'            # 正在进行的论道
+    PREFETCH = 'prefetch'        # 预热与后台刷新
+    BACKFILL = 'backfill'        # 批量回填
+
+PRIORITY_LEVELS = {
+    Priority.INTERACTIVE: 0,
+    Priority.DEBATE: 1,
+    Priority.PREFETCH: 2,
+    Priority.BACKFILL: 3
+}
+
+# 每类请求放行时要求的最低剩余每分钟预算比例（低于此比例的部分为更高优先级预留）
+DEFAULT_HEADROOM = {
+    Priority.INTERACTIVE: 0.0,
+    Priority.DEBATE: 0.05,
+    Priority.PREFETCH: 0.25,
+    Priority.BACKFILL: 0.5
+}
+
+# 预算不足时最多排队等待的秒数，0表示直接放弃
+DEFAULT_MAX_WAIT = {
+    Priority.INTERACTIVE: 0.0,
+    Priority.DEBATE: 2.0,
+    Priority.PREFETCH: 5.0,
+    Priority.BACKFILL: 0.0
+}
+
+class PriorityStats:
+    """单个优先级的调度统计"""
+    
+    def __init__(self):
+        self.admitted = 0
+        self.deferred = 0
+        self.shed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=256)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits)
+        return {
+            'admitted': self.admitted,
+            'deferred': self.deferred,
+            'shed': self.shed,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'wait_mean': self.total_wait / self.admitted if self.admitted else 0.0,
+            'wait_p95': waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+            'wait_max': self.max_wait
+        }
+
+class PriorityScheduler:
+    """按优先级放行上游请求"""
+    
+    def __init__(self, rate_limiter, headroom: Optional[Dict[str, float]] = None,
+                 max_wait: Optional[Dict[str, float]] = None, poll_interval: float = 0.05):
+        """
+        初始化调度器
+        
+        Args:
+            rate_limiter: 提供 try_reserve() / release() 的限速器
+            headroom: 每类请求放行所需的最低剩余预算比例
+            max_wait: 每类请求预算不足时的最长排队时间（秒）
+            poll_interval: 排队请求重新检查预算的间隔（令牌随时间补充，没有事件可等）
+        """
+        self.rate_limiter = rate_limiter
+        self.headroom = dict(DEFAULT_HEADROOM, **(headroom or {}))
+        self.max_wait = dict(DEFAULT_MAX_WAIT, **(max_wait or {}))
+        self.poll_interval = poll_interval
+        
+        # 每个服务商的等待队列: [(优先级, 序号)]，堆顶为最高优先级、最早到达的请求
+        self._queues: Dict[str, List[Tuple[int, int]]] = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stats = {priority: PriorityStats() for priority in PRIORITY_LEVELS}
+    
+    def _reserve(self, api_name: str, priority: str) -> bool:
+        """剩余预算高于该优先级的预留比例时预留一个令牌"""
+        return self.rate_limiter.try_reserve(api_name, self.headroom[priority])
+    
+    def _admitted(self, stats: PriorityStats, waited: float) -> bool:
+        stats.admitted += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.recent_waits.append(waited)
+        return True
+    
+    def admit(self, api_name: str, priority: str = Priority.INTERACTIVE) -> bool:
+        """
+        申请向服务商发出一次请求
+        
+        预算充足且没有更高优先级的请求在排队时立即放行；否则按优先级排队，
+        超过最长等待时间仍未放行则放弃。interactive 请求从不排队，只要还有令牌就放行，
+        没有令牌即为限速（不计入放弃次数）。
+        
+        放行时已从限速器预留了一个令牌：请求发出后以 record_call(reserved=True) 记录，
+        最终没有发出（熔断、异常）时调用 release 归还。
+        
+        Returns:
+            是否放行；False表示请求被放弃或已限速，调用方应返回失败或改用其他服务商
+        """
+        level = PRIORITY_LEVELS[priority]
+        stats = self._stats[priority]
+        start = time.time()
+        with self._cond:
+            queue = self._queues.setdefault(api_name, [])
+            if priority == Priority.INTERACTIVE:
+                return self._reserve(api_name, priority) and self._admitted(stats, 0.0)
+            if (not queue or level < queue[0][0]) and self._reserve(api_name, priority):
+                return self._admitted(stats, 0.0)
+            
+            max_wait = self.max_wait[priority]
+            if max_wait <= 0:
+                stats.shed += 1
+                return False
+            
+            self._seq += 1
+            entry = (level, self._seq)
+            heapq.heappush(queue, entry)
+            stats.deferred += 1
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+            deadline = start + max_wait
+            try:
+                while True:
+                    if queue[0] == entry and self._reserve(api_name, priority):
+                        heapq.heappop(queue)
+                        return self._admitted(stats, time.time() - start)
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        queue.remove(entry)
+                        heapq.heapify(queue)
+                        stats.shed += 1
+                        return False
+                    self._cond.wait(min(remaining, self.poll_interval))
+            finally:
+                stats.queue_depth -= 1
+                # 队首变化后唤醒其他排队请求重新检查
+                self._cond.notify_all()
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各优先级的放行、排队、放弃次数，当前与最大队列深度，以及等待时间"""
+        with self._cond:
+            return {priority: stats.snapshot() for priority, stats in self._stats.items()}
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫服务商注册表
+RapidAPI服务商的主机、端点模板、能力索引、限速与成本权重的唯一来源。
+每个进程只加载一次，端点模板预先编译，路由查找均为常数时间；
+只依赖标准库，不引入 requests 或 Streamlit
+"""
+
+import os
+import string
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def upstream_url(host: str, path: str) -> str:
+    """
+    构建上游请求URL
+    
+    设置 JIXIA_UPSTREAM_BASE_URL（如 http://127.0.0.1:8765）时所有服务商都指向该地址，
+    用于本地模拟服务器；服务商仍由 X-RapidAPI-Host 请求头区分。
+    """
+    base_url = os.getenv('JIXIA_UPSTREAM_BASE_URL')
+    if base_url:
+        return f"{base_url.rstrip('/')}{path}"
+    return f"https://{host}{path}"
+
+class EndpointTemplate:
+    """预编译的端点路径模板，占位符为 {symbol} 或 {symbols}"""
+    
+    __slots__ = ('path', 'fields', '_format')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.fields = frozenset(name for _, name, _, _ in string.Formatter().parse(path) if name)
+        # 没有占位符的路径直接返回，省去每次格式化
+        self._format = path.format if self.fields else None
+    
+    def render(self, symbol: Optional[str] = None, symbols: Optional[str] = None) -> str:
+        """填入股票代码，返回请求路径"""
+        if self._format is None:
+            return self.path
+        return self._format(symbol=symbol or '', symbols=symbols or symbol or '')
+    
+    def __repr__(self) -> str:
+        return f"EndpointTemplate({self.path!r})"
+
+@dataclass(frozen=True)
+class BatchEndpoint:
+    """批量端点：单次请求最多覆盖 max_symbols 只股票"""
+    template: EndpointTemplate
+    max_symbols: int
+
+@dataclass
+class Provider:
+    """RapidAPI服务商"""
+    name: str
+    host: str
+    display_name: str
+    endpoints: Dict[str, EndpointTemplate] = field(default_factory=dict)
+    batch_endpoints: Dict[str, BatchEndpoint] = field(default_factory=dict)
+    # 永动机引擎使用的数据类型别名 -> 规范数据类型（如 webull 的 search/analysis/profile 都落到报价搜索）
+    aliases: Dict[str, str] = field(default_factory=dict)
+    per_minute: int = 500
+    per_month: int = 500000
+    cost_weight: float = 1.0         # 单次调用的相对成本，能力索引按此排序
+    latency_hint: float = 0.0        # 实测平均响应时间（秒），仅作参考
+    health_check: Optional[str] = None  # 可用性测试端点
+
+# 规范数据类型：stock_quote / company_overview / earnings / market_movers / market_losers / market_news
+PROVIDER_SPECS: Dict[str, dict] = {
+    'alpha_vantage': {
+        'host': 'alpha-vantage.p.rapidapi.com',
+        'display_name': 'Alpha Vantage',
+        'endpoints': {
+            'stock_quote': '/query?function=GLOBAL_QUOTE&symbol={symbol}',
+            'company_overview': '/query?function=OVERVIEW&symbol={symbol}',
+            'earnings': '/query?function=EARNINGS&symbol={symbol}'
+        },
+        'aliases': {
+            'quote': 'stock_quote', 'overview': 'company_overview', 'earnings': 'earnings',
+            'profile': 'company_overview', 'analysis': 'company_overview'
+        },
+        'latency_hint': 1.26,
+        'health_check': '/query?function=GLOBAL_QUOTE&symbol=AAPL'
+    },
+    'yahoo_finance_15': {
+        'host': 'yahoo-finance15.p.rapidapi.com',
+        'display_name': 'Yahoo Finance',
+        'endpoints': {
+            'stock_quote': '/api/yahoo/qu/quote/{symbol}',
+            'market_movers': '/api/yahoo/co/collections/day_gainers',
+            'market_losers': '/api/yahoo/co/collections/day_losers',
+            'market_news': '/api/yahoo/ne/news'
+        },
+        'batch_endpoints': {
+            'stock_quote': ('/api/yahoo/qu/quote/{symbols}', 20)
+        },
+        'aliases': {
+            'quote': 'stock_quote', 'search': 'stock_quote', 'analysis': 'stock_quote', 'profile': 'stock_quote',
+            'gainers': 'market_movers', 'losers': 'market_losers'
+        },
+        'latency_hint': 2.07,
+        'health_check': '/api/yahoo/qu/quote/AAPL'
+    },
+    'webull': {
+        'host': 'webull.p.rapidapi.com',
+        'display_name': 'Webull',
+        'endpoints': {
+            'stock_quote': '/stock/search?keyword={symbol}',
+            'market_movers': '/market/get-active-gainers'
+        },
+        'aliases': {
+            'quote': 'stock_quote', 'search': 'stock_quote', 'analysis': 'stock_quote', 'profile': 'stock_quote',
+            'gainers': 'market_movers'
+        },
+        'latency_hint': 1.56,
+        'health_check': '/stock/search?keyword=AAPL'
+    },
+    'seeking_alpha': {
+        'host': 'seeking-alpha.p.rapidapi.com',
+        'display_name': 'Seeking Alpha',
+        'endpoints': {
+            'company_overview': '/symbols/get-profile?symbols={symbol}',
+            'market_news': '/news/list?category=market-news'
+        },
+        'batch_endpoints': {
+            'stock_quote': ('/symbols/get-profile?symbols={symbols}', 20)
+        },
+        'aliases': {
+            'quote': 'company_overview', 'profile': 'company_overview', 'analysis': 'company_overview',
+            'news': 'market_news'
+        },
+        'cost_weight': 1.5,
+        'latency_hint': 3.32,
+        'health_check': '/symbols/get-profile?symbols=AAPL'
+    },
+    'yh_finance': {
+        'host': 'yh-finance.p.rapidapi.com',
+        'display_name': 'YH Finance',
+        'batch_endpoints': {
+            'stock_quote': ('/market/v2/get-quotes?region=US&symbols={symbols}', 50)
+        },
+        'health_check': '/stock/v2/get-summary?symbol=AAPL'
+    },
+    # 以下服务商已订阅但尚未接入路由，仅用于可用性测试
+    'yh_finance_complete': {
+        'host': 'yh-finance-complete.p.rapidapi.com', 'display_name': 'YH Finance Complete',
+        'health_check': '/stock/v2/get-summary?symbol=AAPL'
+    },
+    'yahoo_finance_api_data': {
+        'host': 'yahoo-finance-api1.p.rapidapi.com', 'display_name': 'Yahoo Finance API Data',
+        'health_check': '/v8/finance/chart/AAPL'
+    },
+    'yahoo_finance_realtime': {
+        'host': 'yahoo-finance-low-latency.p.rapidapi.com', 'display_name': 'Yahoo Finance Realtime',
+        'health_check': '/stock/v2/get-summary?symbol=AAPL'
+    },
+    'yahoo_finance_basic': {
+        'host': 'yahoo-finance127.p.rapidapi.com', 'display_name': 'Yahoo Finance Basic',
+        'health_check': '/api/yahoo/qu/quote/AAPL'
+    },
+    'morning_star': {
+        'host': 'morningstar1.p.rapidapi.com', 'display_name': 'Morningstar',
+        'health_check': '/market/v2/get-movers?performanceId=0P0000OQN8'
+    },
+    'tradingview': {
+        'host': 'tradingview-ta.p.rapidapi.com', 'display_name': 'TradingView',
+        'health_check': '/get-analysis?symbol=AAPL&screener=america&exchange=NASDAQ'
+    },
+    'investing_com': {
+        'host': 'investing-cryptocurrency-markets.p.rapidapi.com', 'display_name': 'Investing.com',
+        'health_check': '/coins/get-overview'
+    },
+    'finance_api': {
+        'host': 'real-time-finance-data.p.rapidapi.com', 'display_name': 'Real-Time Finance Data',
+        'health_check': '/stock-price?symbol=AAPL'
+    },
+    'ms_finance': {
+        'host': 'ms-finance.p.rapidapi.com', 'display_name': 'MS Finance',
+        'health_check': '/stock/v2/get-summary?symbol=AAPL'
+    },
+    'sec_filings': {
+        'host': 'sec-filings.p.rapidapi.com', 'display_name': 'SEC Filings',
+        'health_check': '/search?query=AAPL'
+    },
+    'exchangerate_api': {
+        'host': 'exchangerate-api.p.rapidapi.com', 'display_name': 'ExchangeRate API',
+        'health_check': '/latest?base=USD'
+    },
+    'crypto_news': {
+        'host': 'cryptocurrency-news2.p.rapidapi.com', 'display_name': 'Crypto News',
+        'health_check': '/v1/cryptonews'
+    }
+}
+
+# 旧名称 -> 注册名（永动机引擎与库存测试沿用 yahoo_finance_1）
+PROVIDER_ALIASES = {'yahoo_finance_1': 'yahoo_finance_15'}
+
+class ProviderRegistry:
+    """服务商注册表"""
+    
+    def __init__(self, specs: Dict[str, dict] = PROVIDER_SPECS, aliases: Dict[str, str] = PROVIDER_ALIASES):
+        """
+        编译服务商配置
+        
+        Args:
+            specs: 服务商名称 -> 配置（host、endpoints、batch_endpoints、aliases、限额、成本等）
+            aliases: 旧服务商名称 -> 注册名
+        """
+        self.providers: Dict[str, Provider] = {}
+        for name, spec in specs.items():
+            self.providers[name] = Provider(
+                name=name,
+                host=spec['host'],
+                display_name=spec.get('display_name', name),
+                endpoints={data_type: EndpointTemplate(path) for data_type, path in spec.get('endpoints', {}).items()},
+                batch_endpoints={
+                    data_type: BatchEndpoint(EndpointTemplate(path), max_symbols)
+                    for data_type, (path, max_symbols) in spec.get('batch_endpoints', {}).items()
+                },
+                aliases=dict(spec.get('aliases', {})),
+                per_minute=spec.get('per_minute', 500),
+                per_month=spec.get('per_month', 500000),
+                cost_weight=spec.get('cost_weight', 1.0),
+                latency_hint=spec.get('latency_hint', 0.0),
+                health_check=spec.get('health_check')
+            )
+        self.aliases = {alias: name for alias, name in aliases.items() if name in self.providers}
+        # 已接入路由的服务商（有常规或批量端点），按注册顺序；其余服务商只用于可用性测试
+        self.routable: Tuple[str, ...] = tuple(
+            name for name, provider in self.providers.items() if provider.endpoints or provider.batch_endpoints
+        )
+        
+        # 路由表: (服务商, 数据类型或别名) -> 端点模板，别名与规范名预先展开
+        self._routes: Dict[Tuple[str, str], EndpointTemplate] = {}
+        for name, provider in self.providers.items():
+            for data_type, template in provider.endpoints.items():
+                self._routes[(name, data_type)] = template
+            for alias, data_type in provider.aliases.items():
+                template = provider.endpoints.get(data_type)
+                if template is not None:
+                    self._routes.setdefault((name, alias), template)
+        
+        # 能力索引: 数据类型 -> 支持该类型的服务商（按成本权重、参考延迟排序）
+        capabilities: Dict[str, List[str]] = {}
+        batch_capabilities: Dict[str, List[str]] = {}
+        for name, provider in self.providers.items():
+            for data_type in provider.endpoints:
+                capabilities.setdefault(data_type, []).append(name)
+            for data_type in provider.batch_endpoints:
+                batch_capabilities.setdefault(data_type, []).append(name)
+        self.capabilities = {
+            data_type: tuple(sorted(names, key=lambda n: (self.providers[n].cost_weight, self.providers[n].latency_hint)))
+            for data_type, names in capabilities.items()
+        }
+        # 批量端点按每只股票的成本排序：单次请求覆盖的股票越多越靠前
+        self.batch_capabilities = {
+            data_type: tuple(sorted(names, key=lambda n: (
+                self.providers[n].cost_weight / self.providers[n].batch_endpoints[data_type].max_symbols,
+                self.providers[n].latency_hint
+            )))
+            for data_type, names in batch_capabilities.items()
+        }
+    
+    def resolve_name(self, name: str) -> str:
+        """旧名称转换为注册名"""
+        return self.aliases.get(name, name)
+    
+    def get(self, name: str) -> Optional[Provider]:
+        """按名称（含旧名称）获取服务商"""
+        return self.providers.get(self.aliases.get(name, name))
+    
+    def host(self, name: str) -> str:
+        """服务商主机名"""
+        return self.providers[self.aliases.get(name, name)].host
+    
+    def supports(self, name: str, data_type: str) -> bool:
+        """服务商是否有该数据类型（或别名）的端点"""
+        return (self.aliases.get(name, name), data_type) in self._routes
+    
+    def providers_for(self, data_type: str) -> Tuple[str, ...]:
+        """支持该规范数据类型的服务商（成本低、参考延迟低的在前）"""
+        return self.capabilities.get(data_type, ())
+    
+    def batch_providers_for(self, data_type: str) -> Tuple[str, ...]:
+        """有该数据类型批量端点的服务商（每只股票成本低的在前）"""
+        return self.batch_capabilities.get(data_type, ())
+    
+    def failover_order(self, name: str, data_type: str) -> List[str]:
+        """首选服务商在前，其后为支持该数据类型的其他服务商"""
+        name = self.resolve_name(name)
+        return [name] + [other for other in self.providers_for(data_type) if other != name]
+    
+    def path(self, name: str, data_type: str, symbol: Optional[str] = None) -> Optional[str]:
+        """请求路径，没有对应端点时返回None"""
+        template = self._routes.get((self.aliases.get(name, name), data_type))
+        return template.render(symbol) if template is not None else None
+    
+    def url(self, name: str, data_type: str, symbol: Optional[str] = None) -> Optional[str]:
+        """上游请求URL，没有对应端点时返回None"""
+        name = self.aliases.get(name, name)
+        template = self._routes.get((name, data_type))
+        if template is None:
+            return None
+        return upstream_url(self.providers[name].host, template.render(symbol))
+    
+    def batch(self, name: str, data_type: str) -> Optional[BatchEndpoint]:
+        """批量端点，不支持时返回None"""
+        provider = self.get(name)
+        return provider.batch_endpoints.get(data_type) if provider else None
+    
+    def batch_url(self, name: str, data_type: str, symbols: Iterable[str]) -> Optional[str]:
+        """批量请求URL"""
+        batch = self.batch(name, data_type)
+        if batch is None:
+            return None
+        return upstream_url(self.host(name), batch.template.render(symbols=','.join(symbols)))
+    
+    def rate_limits(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """限速器使用的 per_minute / per_month 限额，默认为所有已接入路由的服务商"""
+        if names is None:
+            names = self.routable
+        return {
+            name: {'per_minute': self.providers[name].per_minute, 'per_month': self.providers[name].per_month}
+            for name in (self.resolve_name(name) for name in names)
+        }
+
+_registry: Optional[ProviderRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ProviderRegistry:
+    """获取进程内共享的服务商注册表（首次调用时编译）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderRegistry()
+    return _registry
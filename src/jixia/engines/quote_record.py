@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫报价记录
+紧凑的报价记录类型（NamedTuple，无实例字典，数值字段均为数字），
+以及把大量报价一次性转换为NumPy列/pandas DataFrame的工具
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+class QuoteRecord(NamedTuple):
+    """标准化报价记录，change_percent 为百分数数值（1.23 表示 1.23%）"""
+    symbol: Optional[str]
+    price: float
+    change: float
+    change_percent: float
+    volume: int
+    source: str
+    high: Optional[float] = None
+    low: Optional[float] = None
+    timestamp: Any = None
+    market_cap: Optional[float] = None
+    pe_ratio: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为原有的报价字典格式（change_percent 为 "1.23%" 字符串，缺失的可选字段省略）"""
+        quote = {
+            'symbol': self.symbol,
+            'price': self.price,
+            'change': self.change,
+            'change_percent': f"{self.change_percent:.2f}%",
+            'volume': self.volume,
+            'source': self.source
+        }
+        for field in _OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                quote[field] = value
+        return quote
+
+_OPTIONAL_FIELDS = ('high', 'low', 'timestamp', 'market_cap', 'pe_ratio')
+
+# 列式输出的数据类型，可选数值字段缺失时为NaN
+_COLUMN_DTYPES = {
+    'symbol': object,
+    'price': 'float64',
+    'change': 'float64',
+    'change_percent': 'float64',
+    'volume': 'int64',
+    'source': object,
+    'high': 'float64',
+    'low': 'float64',
+    'timestamp': object,
+    'market_cap': 'float64',
+    'pe_ratio': 'float64'
+}
+
+def parse_percent(value: Any) -> float:
+    """把 "1.23%"、"+1.23" 或数字解析为百分数数值"""
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).strip().rstrip('%'))
+
+def to_float(value: Any) -> Optional[float]:
+    """可选数值字段：缺失或为空时返回None"""
+    if value is None or value == '':
+        return None
+    return float(value)
+
+def quotes_to_columns(records: Iterable[QuoteRecord], as_frame: bool = False):
+    """
+    把报价记录转换为列式数据
+
+    Args:
+        records: 报价记录
+        as_frame: 是否返回pandas DataFrame
+
+    Returns:
+        字段名到NumPy数组的映射，或DataFrame
+    """
+    import numpy as np
+
+    records = list(records)
+    columns: List[tuple] = list(zip(*records)) if records else [()] * len(QuoteRecord._fields)
+    arrays = {
+        field: np.array(values, dtype=_COLUMN_DTYPES[field])
+        for field, values in zip(QuoteRecord._fields, columns)
+    }
+    if not as_frame:
+        return arrays
+
+    import pandas as pd
+    return pd.DataFrame(arrays, columns=list(QuoteRecord._fields))
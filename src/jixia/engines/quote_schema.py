@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫报价字段映射
+每个服务商的报价字段只在此声明一次，导入时预先解析为键路径与转换函数，
+标准化时不再查找映射表与判断路径类型
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from src.jixia.engines.quote_record import QuoteRecord, parse_percent, to_float
+
+# 字段路径：键名、嵌套键元组，或由多个候选路径组成的列表（取第一个非空值）
+FieldPath = Union[str, Tuple[str, ...], List[Union[str, Tuple[str, ...]]]]
+
+# 服务商报价映射
+#   items: 报价条目在响应中的位置（值可以是单个对象或对象列表）
+#   many: 是否每个条目都是一只股票；False时只取第一个条目（如Webull搜索结果）
+#   fields: QuoteRecord字段 -> (字段路径, 类型)，类型见 _CONVERTERS
+QUOTE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'alpha_vantage': {
+        'items': ('Global Quote',),
+        'many': False,
+        'fields': {
+            'symbol': ('01. symbol', 'raw'),
+            'price': ('05. price', 'float'),
+            'change': ('09. change', 'float'),
+            'change_percent': ('10. change percent', 'percent'),
+            'volume': ('06. volume', 'int'),
+            'high': ('03. high', 'float'),
+            'low': ('04. low', 'float'),
+            'timestamp': ('07. latest trading day', 'raw')
+        }
+    },
+    'yahoo_finance_15': {
+        'items': ('body',),
+        'many': True,
+        'fields': {
+            'symbol': ('symbol', 'raw'),
+            'price': ('regularMarketPrice', 'float'),
+            'change': ('regularMarketChange', 'float'),
+            'change_percent': ('regularMarketChangePercent', 'percent'),
+            'volume': ('regularMarketVolume', 'int'),
+            'high': ('regularMarketDayHigh', 'float'),
+            'low': ('regularMarketDayLow', 'float'),
+            'timestamp': ('regularMarketTime', 'raw')
+        }
+    },
+    'webull': {
+        'items': ('stocks',),
+        'many': False,
+        'fields': {
+            'symbol': ('symbol', 'raw'),
+            'price': ('close', 'float'),
+            'change': ('change', 'float'),
+            'change_percent': ('changeRatio', 'ratio_percent'),
+            'volume': ('volume', 'int'),
+            'high': ('high', 'float'),
+            'low': ('low', 'float'),
+            'timestamp': ('timeStamp', 'raw')
+        }
+    },
+    'seeking_alpha': {
+        'items': ('data',),
+        'many': True,
+        'fields': {
+            'symbol': ([('attributes', 'slug'), 'id'], 'raw'),
+            'price': (('attributes', 'lastPrice'), 'float'),
+            'change': (('attributes', 'dayChange'), 'float'),
+            'change_percent': (('attributes', 'dayChangePercent'), 'percent'),
+            'volume': (('attributes', 'volume'), 'int'),
+            'market_cap': (('attributes', 'marketCap'), 'optional_float'),
+            'pe_ratio': (('attributes', 'peRatio'), 'optional_float')
+        }
+    }
+}
+# yh_finance 与 yahoo_finance_15 字段一致，只是条目位置不同
+QUOTE_SCHEMAS['yh_finance'] = dict(QUOTE_SCHEMAS['yahoo_finance_15'], items=('quoteResponse', 'result'))
+
+def _to_float(value: Any) -> float:
+    return 0.0 if value is None or value == '' else float(value)
+
+def _to_int(value: Any) -> int:
+    if value is None or value == '':
+        return 0
+    return value if isinstance(value, int) else int(float(value))
+
+def _ratio_percent(value: Any) -> float:
+    return parse_percent(value) * 100
+
+_CONVERTERS = {
+    'raw': None,
+    'float': _to_float,
+    'int': _to_int,
+    'percent': parse_percent,
+    'ratio_percent': _ratio_percent,
+    'optional_float': to_float
+}
+
+# 预先解析的字段路径：候选路径元组，每个候选路径为键名元组
+KeyPaths = Tuple[Tuple[str, ...], ...]
+
+def _key_paths(path: FieldPath) -> KeyPaths:
+    """把字段路径统一为候选键路径元组"""
+    alternatives = path if isinstance(path, list) else [path]
+    return tuple((alternative,) if isinstance(alternative, str) else tuple(alternative)
+                 for alternative in alternatives)
+
+def _lookup(item: dict, key_paths: KeyPaths) -> Any:
+    """按候选键路径取值，返回第一个非空值（都为空时返回最后一个候选的值）"""
+    value = None
+    for keys in key_paths:
+        node = item
+        for key in keys[:-1]:
+            node = node.get(key) or {}
+        value = node.get(keys[-1])
+        if value:
+            return value
+    return value
+
+def _field_getter(key_paths: KeyPaths, convert: Optional[Callable[[Any], Any]]) -> Callable[[dict], Any]:
+    """单个字段的取值函数；最常见的单层与两层键路径不经过 _lookup"""
+    if len(key_paths) == 1 and len(key_paths[0]) == 1:
+        key, = key_paths[0]
+        get = lambda item: item.get(key)
+    elif len(key_paths) == 1 and len(key_paths[0]) == 2:
+        parent, key = key_paths[0]
+        get = lambda item: (item.get(parent) or {}).get(key)
+    else:
+        get = lambda item: _lookup(item, key_paths)
+    if convert:
+        return lambda item: convert(get(item))
+    return get
+
+def compile_extractor(source: str, fields: Dict[str, Tuple[FieldPath, str]]) -> Callable[[dict], QuoteRecord]:
+    """
+    把字段映射预先解析为按 QuoteRecord 字段顺序排列的取值函数，返回提取函数
+
+    Args:
+        source: 服务商名称，写入记录的 source 字段
+        fields: QuoteRecord字段 -> (字段路径, 类型)
+
+    Returns:
+        接收单个报价条目（dict）、返回 QuoteRecord 的函数
+    """
+    for field in fields:
+        if field not in QuoteRecord._fields:
+            raise ValueError(f"Unknown quote field: {field}")
+
+    getters: List[Callable[[dict], Any]] = []
+    for field in QuoteRecord._fields:
+        if field == 'source':
+            getters.append(lambda item: source)
+        elif field in fields:
+            path, kind = fields[field]
+            getters.append(_field_getter(_key_paths(path), _CONVERTERS[kind]))
+        else:
+            default = QuoteRecord._field_defaults.get(field)
+            getters.append(lambda item, default=default: default)
+    make = QuoteRecord._make
+
+    def extract(item: dict) -> QuoteRecord:
+        return make([getter(item) for getter in getters])
+
+    return extract
+
+class QuoteExtractor:
+    """单个服务商的报价提取器"""
+
+    __slots__ = ('source', 'items_path', 'many', 'extract')
+
+    def __init__(self, source: str, schema: Dict[str, Any]):
+        self.source = source
+        self.items_path = tuple(schema['items'])
+        self.many = schema['many']
+        self.extract = compile_extractor(source, schema['fields'])
+
+    def _items(self, raw_data: dict) -> list:
+        node: Any = raw_data
+        for key in self.items_path:
+            if not isinstance(node, dict):
+                return []
+            node = node.get(key)
+        if isinstance(node, list):
+            return node if self.many else node[:1]
+        return [node] if node else []
+
+    def first(self, raw_data: dict) -> Optional[QuoteRecord]:
+        """提取第一只股票的报价，响应中没有数据时返回None；字段无法解析时抛出异常"""
+        items = self._items(raw_data)
+        return self.extract(items[0]) if items else None
+
+    def records(self, raw_data: dict) -> List[QuoteRecord]:
+        """提取全部报价，无法解析的条目被跳过"""
+        extract = self.extract
+        records = []
+        for item in self._items(raw_data):
+            try:
+                records.append(extract(item))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        return records
+
+QUOTE_EXTRACTORS: Dict[str, QuoteExtractor] = {
+    source: QuoteExtractor(source, schema) for source, schema in QUOTE_SCHEMAS.items()
+}
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫限速引擎
+令牌桶控制每分钟速率，按月计数控制配额，所有检查均为常数时间；
+月度计数以增量合并的方式持久化，多个进程共享同一状态文件时不会互相覆盖
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，退化为不加锁的合并写入
+    fcntl = None
+
+from config.doppler_config import get_state_dir
+from src.jixia.engines.provider_registry import get_registry
+
+# 默认限额来自服务商注册表
+DEFAULT_LIMITS = get_registry().rate_limits()
+
+def _current_month() -> str:
+    """当前计费月份（UTC）"""
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+class RateLimiter:
+    """速率限制器"""
+    
+    def __init__(self, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 state_path: Optional[str] = None, threshold: float = 0.9,
+                 persist_interval: float = 30.0):
+        """
+        初始化限速器
+        
+        Args:
+            limits: 每个API的 per_minute / per_month 限额
+            state_path: 月度计数持久化文件，传入空字符串则不持久化
+            threshold: 触发限速的限额比例（预留余量）
+            persist_interval: 月度计数落盘的最小间隔（秒）
+        """
+        self.limits = {api: dict(limit) for api, limit in (limits or DEFAULT_LIMITS).items()}
+        self.threshold = threshold
+        self.persist_interval = persist_interval
+        self.state_path = os.path.join(get_state_dir(), 'rate_limits.json') if state_path is None else state_path
+        
+        self._lock = threading.Lock()
+        now = time.time()
+        # 令牌桶: api -> [可用令牌, 上次补充时间]
+        self._buckets = {api: [self._capacity(api), now] for api in self.limits}
+        # 滑动窗口计数: api -> [当前分钟序号, 当前分钟计数, 上一分钟计数]
+        self._windows = {api: [int(now // 60), 0, 0] for api in self.limits}
+        # 月度计数：_monthly_calls 为所有进程的合计（截至上次落盘），_pending 为本进程尚未落盘的增量
+        self._month = _current_month()
+        self._monthly_calls = {api: 0 for api in self.limits}
+        self._pending = {api: 0 for api in self.limits}
+        self._dirty = False
+        self._last_persist = now
+        
+        self._load_state()
+        if self.state_path:
+            atexit.register(self.flush)
+    
+    def _capacity(self, api_name: str) -> float:
+        """每分钟可用的令牌数（已扣除预留余量）"""
+        return self.limits[api_name]['per_minute'] * self.threshold
+    
+    def _refill(self, api_name: str, now: float) -> list:
+        """按流逝时间补充令牌"""
+        bucket = self._buckets[api_name]
+        capacity = self._capacity(api_name)
+        elapsed = now - bucket[1]
+        if elapsed > 0:
+            bucket[0] = min(capacity, bucket[0] + elapsed * capacity / 60.0)
+            bucket[1] = now
+        return bucket
+    
+    def _roll_window(self, api_name: str, now: float) -> list:
+        """推进每分钟计数窗口"""
+        window = self._windows[api_name]
+        minute = int(now // 60)
+        if minute != window[0]:
+            window[2] = window[1] if minute - window[0] == 1 else 0
+            window[1] = 0
+            window[0] = minute
+        return window
+    
+    def _roll_month(self):
+        """跨月时重置月度计数"""
+        month = _current_month()
+        if month != self._month:
+            self._month = month
+            self._monthly_calls = {api: 0 for api in self.limits}
+            self._pending = {api: 0 for api in self.limits}
+            self._dirty = True
+    
+    def is_rate_limited(self, api_name: str) -> bool:
+        """检查是否达到速率限制（每分钟令牌或月度配额）"""
+        now = time.time()
+        with self._lock:
+            self._roll_month()
+            if self._refill(api_name, now)[0] < 1:
+                return True
+            return self._monthly_calls[api_name] >= self.limits[api_name]['per_month'] * self.threshold
+    
+    def try_reserve(self, api_name: str, min_ratio: float = 0.0) -> bool:
+        """
+        预留一个令牌：检查与扣减在同一把锁内完成，并发调用方不会看到同一份剩余预算
+        
+        Args:
+            min_ratio: 预留后剩余令牌占每分钟容量的比例不得低于该值（低于此比例的部分留给更高优先级）
+        
+        Returns:
+            是否预留成功；成功后调用方须在请求发出后 record_call(reserved=True)，未发出则 release
+        """
+        now = time.time()
+        with self._lock:
+            self._roll_month()
+            if self._monthly_calls[api_name] >= self.limits[api_name]['per_month'] * self.threshold:
+                return False
+            bucket = self._refill(api_name, now)
+            capacity = self._capacity(api_name)
+            if bucket[0] < 1 or (bucket[0] - 1) / capacity < min_ratio:
+                return False
+            bucket[0] -= 1
+            return True
+    
+    def release(self, api_name: str):
+        """归还一个已预留但没有用于请求的令牌"""
+        now = time.time()
+        with self._lock:
+            bucket = self._refill(api_name, now)
+            bucket[0] = min(self._capacity(api_name), bucket[0] + 1)
+    
+    def record_call(self, api_name: str, reserved: bool = False):
+        """
+        记录API调用
+        
+        Args:
+            reserved: 令牌已通过 try_reserve 预留，不再重复扣减
+        """
+        now = time.time()
+        with self._lock:
+            self._roll_month()
+            bucket = self._refill(api_name, now)
+            if not reserved:
+                bucket[0] = max(0.0, bucket[0] - 1)
+            self._roll_window(api_name, now)[1] += 1
+            self._monthly_calls[api_name] += 1
+            self._pending[api_name] += 1
+            self._dirty = True
+            should_persist = now - self._last_persist >= self.persist_interval
+        
+        if should_persist:
+            self.flush()
+    
+    def get_call_count(self, api_name: str) -> int:
+        """最近一分钟的调用数（滑动窗口计数估算）"""
+        now = time.time()
+        with self._lock:
+            window = self._roll_window(api_name, now)
+            overlap = 1 - (now - window[0] * 60) / 60.0
+            return int(round(window[1] + window[2] * overlap))
+    
+    def get_monthly_calls(self, api_name: str) -> int:
+        """本月累计调用数"""
+        with self._lock:
+            self._roll_month()
+            return self._monthly_calls[api_name]
+    
+    def get_remaining_budget(self, api_name: str) -> Dict[str, float]:
+        """
+        获取剩余预算，供路由器参考
+        
+        Returns:
+            minute: 当前可用令牌数
+            minute_ratio: 当前可用令牌占每分钟容量的比例 (0~1)
+            month: 本月剩余调用数
+            month_ratio: 本月剩余配额比例 (0~1)
+        """
+        now = time.time()
+        with self._lock:
+            self._roll_month()
+            tokens = self._refill(api_name, now)[0]
+            capacity = self._capacity(api_name)
+            per_month = self.limits[api_name]['per_month']
+            month_left = max(0, per_month - self._monthly_calls[api_name])
+        return {
+            'minute': tokens,
+            'minute_ratio': tokens / capacity if capacity else 0.0,
+            'month': month_left,
+            'month_ratio': month_left / per_month if per_month else 0.0
+        }
+    
+    def _read_state(self) -> Dict:
+        """读取状态文件，不存在时返回空状态"""
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    @contextlib.contextmanager
+    def _state_file_lock(self) -> Iterator[None]:
+        """跨进程独占状态文件（读取-合并-写入期间）"""
+        with open(f"{self.state_path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _load_state(self):
+        """读取持久化的月度计数"""
+        if not self.state_path:
+            return
+        try:
+            state = self._read_state()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 无法读取限速状态 {self.state_path}: {e}")
+            return
+        
+        if state.get('month') == self._month:
+            for api_name, count in state.get('monthly_calls', {}).items():
+                if api_name in self._monthly_calls:
+                    self._monthly_calls[api_name] = int(count)
+    
+    def flush(self):
+        """
+        把本进程的月度调用增量合并进状态文件
+        
+        在文件锁内读取其他进程已写入的计数、加上本进程的增量后原子地替换文件，
+        并用合并结果刷新本进程的月度计数
+        """
+        if not self.state_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            month = self._month
+            pending = {api: count for api, count in self._pending.items() if count}
+            self._pending = {api: 0 for api in self.limits}
+            self._dirty = False
+            self._last_persist = time.time()
+        
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with self._state_file_lock():
+                try:
+                    state = self._read_state()
+                except ValueError as e:
+                    print(f"⚠️ 限速状态文件损坏，重新计数 {self.state_path}: {e}")
+                    state = {}
+                counts = state.get('monthly_calls', {}) if state.get('month') == month else {}
+                merged = {api_name: int(count) for api_name, count in counts.items()}
+                for api_name, count in pending.items():
+                    merged[api_name] = merged.get(api_name, 0) + count
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'month': month, 'monthly_calls': merged}, f)
+                os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️ 无法保存限速状态 {self.state_path}: {e}")
+            # 增量放回，下次落盘重试
+            with self._lock:
+                if self._month == month:
+                    for api_name, count in pending.items():
+                        self._pending[api_name] += count
+                    self._dirty = True
+            return
+        
+        # 合并结果包含其他进程的调用；加上落盘期间本进程新增的调用
+        with self._lock:
+            if self._month == month:
+                for api_name in self._monthly_calls:
+                    self._monthly_calls[api_name] = merged.get(api_name, 0) + self._pending[api_name]
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫缓存
+有容量上限的LRU+TTL缓存，过期条目主动清理，并按数据类型设置TTL；
+可为过期条目保留一段宽限期，供 stale-while-revalidate / stale-if-error 使用
+"""
+
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+def estimate_size(obj: Any, _depth: int = 0) -> int:
+    """粗略估算对象占用的内存字节数"""
+    size = sys.getsizeof(obj)
+    if _depth > 6:
+        return size
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), _depth + 1)
+    return size
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    value: Any
+    stored_at: float
+    expires_at: float
+    size: int
+    data_type: Optional[str] = None
+    stale_until: float = 0.0
+
+class TTLCache:
+    """有界LRU+TTL缓存"""
+    
+    def __init__(self, max_entries: int = 2048, default_ttl: float = 300,
+                 ttl_by_type: Optional[Dict[str, float]] = None,
+                 max_stale: float = 0.0, max_stale_by_type: Optional[Dict[str, float]] = None):
+        """
+        初始化缓存
+        
+        Args:
+            max_entries: 最大条目数，超出时淘汰最久未使用的条目
+            default_ttl: 默认过期时间（秒）
+            ttl_by_type: 按数据类型覆盖的过期时间
+            max_stale: 过期后仍保留、可作为过期数据读取的最长时间（秒），0表示过期即删除
+            max_stale_by_type: 按数据类型覆盖的过期保留时间
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttl_by_type = dict(ttl_by_type or {})
+        self.max_stale = max_stale
+        self.max_stale_by_type = dict(max_stale_by_type or {})
+        
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        self._heap_seq = 0
+        self._lock = threading.RLock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.memory_bytes = 0
+    
+    def ttl_for(self, data_type: Optional[str]) -> float:
+        """获取数据类型对应的TTL"""
+        return self.ttl_by_type.get(data_type, self.default_ttl)
+    
+    def stale_for(self, data_type: Optional[str]) -> float:
+        """获取数据类型对应的过期保留时间"""
+        return self.max_stale_by_type.get(data_type, self.max_stale)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取未过期的缓存值，命中时刷新LRU位置"""
+        lookup = self.lookup(key)
+        return lookup[0] if lookup else None
+    
+    def lookup(self, key: Hashable, allow_stale: bool = False) -> Optional[Tuple[Any, bool]]:
+        """
+        读取缓存值，命中时刷新LRU位置
+        
+        Args:
+            allow_stale: 是否返回已过期但仍在保留期内的条目
+            
+        Returns:
+            (缓存值, 是否已过期)，未命中返回None
+        """
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._data.get(key)
+            if entry is None or entry.stale_until <= now:
+                self.misses += 1
+                return None
+            stale = entry.expires_at <= now
+            if stale and not allow_stale:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return entry.value, stale
+    
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """距离条目过期的剩余秒数（已过期为负数），不存在或已超过保留期返回None；不计入命中统计"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.stale_until <= now:
+                return None
+            return entry.expires_at - now
+    
+    def set(self, key: Hashable, value: Any, data_type: Optional[str] = None, ttl: Optional[float] = None):
+        """写入缓存值"""
+        now = time.time()
+        ttl = self.ttl_for(data_type) if ttl is None else ttl
+        entry = CacheEntry(value, now, now + ttl, estimate_size(value), data_type,
+                           now + ttl + self.stale_for(data_type))
+        
+        with self._lock:
+            self._purge_expired(now)
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.memory_bytes -= old.size
+            self._data[key] = entry
+            self.memory_bytes += entry.size
+            self._heap_seq += 1
+            heapq.heappush(self._expiry_heap, (entry.stale_until, self._heap_seq, key))
+            
+            while len(self._data) > self.max_entries:
+                _, evicted = self._data.popitem(last=False)
+                self.memory_bytes -= evicted.size
+                self.evictions += 1
+    
+    def delete(self, key: Hashable) -> bool:
+        """删除缓存条目"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self.memory_bytes -= entry.size
+            return True
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._expiry_heap.clear()
+            self.memory_bytes = 0
+    
+    def purge_expired(self) -> int:
+        """主动清理所有过期条目，返回清理数量"""
+        with self._lock:
+            return self._purge_expired(time.time())
+    
+    def _purge_expired(self, now: float) -> int:
+        """按过期时间堆清理超过保留期的条目（调用方持有锁）"""
+        purged = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            stale_until, _, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # 堆中可能残留已被覆盖或淘汰的旧记录
+            if entry is not None and entry.stale_until == stale_until:
+                del self._data[key]
+                self.memory_bytes -= entry.size
+                self.expirations += 1
+                purged += 1
+        
+        # 被覆盖/淘汰的旧记录过多时重建堆，防止堆本身无限增长
+        if len(heap) > 2 * self.max_entries:
+            self._expiry_heap = [(e.stale_until, i, k) for i, (k, e) in enumerate(self._data.items())]
+            heapq.heapify(self._expiry_heap)
+            self._heap_seq = len(self._expiry_heap)
+        return purged
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry.expires_at > time.time()
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits,
+                'memory_bytes': self.memory_bytes
+            }
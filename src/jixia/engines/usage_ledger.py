@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稷下学宫调用账本
+每次上游调用追加一条记录（服务商、端点、延迟、状态码、字节数、调用方），
+写入时同步累加分钟/小时/天三级汇总，数月的配额与延迟报表只需读取汇总表
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.doppler_config import get_state_dir
+from src.jixia.engines.metrics import NON_ERROR_OUTCOMES, classify_status
+
+# 汇总粒度 -> 桶宽（秒），天按UTC划分，与限速器的月度计数一致
+ROLLUP_BUCKETS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+class UsageLedger:
+    """追加写入的上游调用账本"""
+    
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 1.0,
+                 sync_interval: float = 30.0, batch_size: int = 256, retention_days: int = 90):
+        """
+        初始化调用账本
+        
+        Args:
+            path: SQLite文件路径，默认位于状态目录下的 usage_ledger.db
+            flush_interval: 后台线程批量写入的间隔（秒），记录调用本身只追加到内存缓冲区
+            sync_interval: 执行WAL检查点（落盘fsync）的间隔（秒），进程崩溃最多丢失这段时间的记录
+            batch_size: 缓冲区达到该条数时立即唤醒写入线程
+            retention_days: 明细记录保留天数，汇总表永久保留
+        """
+        self.path = path or os.path.join(get_state_dir(), 'usage_ledger.db')
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        
+        self._buffer: List[Tuple[float, str, str, int, float, int, str]] = []
+        self._buffer_lock = threading.Lock()
+        # 写入与查询共用一个连接，查询前先写入缓冲区，保证报表包含刚发生的调用
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._last_sync = time.time()
+        self.dropped = 0
+        
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # WAL模式下NORMAL只在检查点时fsync，提交本身不落盘
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA wal_autocheckpoint=0')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS calls ('
+            ' ts REAL NOT NULL,'
+            ' provider TEXT NOT NULL,'
+            ' endpoint TEXT NOT NULL,'
+            ' status INTEGER NOT NULL,'
+            ' latency REAL NOT NULL,'
+            ' bytes INTEGER NOT NULL,'
+            ' caller TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls(ts)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS rollups ('
+            ' granularity TEXT NOT NULL,'
+            ' bucket INTEGER NOT NULL,'
+            ' provider TEXT NOT NULL,'
+            ' endpoint TEXT NOT NULL,'
+            ' calls INTEGER NOT NULL,'
+            ' errors INTEGER NOT NULL,'
+            ' bytes INTEGER NOT NULL,'
+            ' latency_sum REAL NOT NULL,'
+            ' latency_max REAL NOT NULL,'
+            ' PRIMARY KEY (granularity, bucket, provider, endpoint))'
+        )
+        self._conn.commit()
+        
+        self._thread = threading.Thread(target=self._run, name='jixia-usage-ledger', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def record(self, provider: str, endpoint: str, status: int, latency: float,
+               bytes_received: int = 0, caller: str = '', ts: Optional[float] = None):
+        """
+        记录一次上游调用（只追加到内存缓冲区，不触碰磁盘）
+        
+        Args:
+            provider: 服务商
+            endpoint: 端点或数据类型
+            status: HTTP状态码，请求未得到响应（超时、连接失败）时为0
+            latency: 耗时（秒）
+            bytes_received: 响应体字节数
+            caller: 发起调用的仙人或组件
+            ts: 调用时间戳，默认当前时间
+        """
+        entry = (time.time() if ts is None else ts, provider, endpoint, int(status or 0),
+                 float(latency), int(bytes_received or 0), caller or '')
+        with self._buffer_lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_sync >= self.sync_interval:
+                    self.sync()
+            except sqlite3.Error as e:
+                print(f"⚠️ 调用账本写入失败: {e}")
+    
+    def flush(self) -> int:
+        """
+        把缓冲区中的记录写入明细表并累加汇总表，一个事务完成
+        
+        Returns:
+            写入的记录数
+        """
+        with self._buffer_lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return 0
+        
+        rollups: Dict[Tuple[str, int, str, str], List[float]] = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+        for ts, provider, endpoint, status, latency, bytes_received, _ in entries:
+            # 与指标导出使用同一分类：2xx（含204空响应）不计为错误，状态码0（未得到响应）计为错误
+            error = classify_status(status) not in NON_ERROR_OUTCOMES
+            for granularity, width in ROLLUP_BUCKETS.items():
+                row = rollups[(granularity, int(ts // width) * width, provider, endpoint)]
+                row[0] += 1
+                row[1] += error
+                row[2] += bytes_received
+                row[3] += latency
+                row[4] = max(row[4], latency)
+        
+        with self._db_lock:
+            try:
+                with self._conn:
+                    self._conn.executemany('INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?)', entries)
+                    self._conn.executemany(
+                        'INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (granularity, bucket, provider, endpoint) DO UPDATE SET'
+                        ' calls = calls + excluded.calls,'
+                        ' errors = errors + excluded.errors,'
+                        ' bytes = bytes + excluded.bytes,'
+                        ' latency_sum = latency_sum + excluded.latency_sum,'
+                        ' latency_max = MAX(latency_max, excluded.latency_max)',
+                        [key + tuple(row) for key, row in rollups.items()]
+                    )
+            except sqlite3.Error:
+                # 写入失败时放回缓冲区，下一轮重试（缓冲区过大则丢弃最旧的记录）
+                with self._buffer_lock:
+                    self._buffer[:0] = entries
+                    overflow = len(self._buffer) - self.batch_size * 64
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        self.dropped += overflow
+                raise
+        return len(entries)
+    
+    def sync(self):
+        """执行WAL检查点，把已提交的记录fsync到数据库文件，并清理过期明细"""
+        with self._db_lock:
+            with self._conn:
+                self._conn.execute('DELETE FROM calls WHERE ts < ?', (time.time() - self.retention_days * 86400,))
+            self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        self._last_sync = time.time()
+    
+    def close(self):
+        """停止写入线程，写入剩余记录并落盘"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5.0)
+        try:
+            self.flush()
+            self.sync()
+            with self._db_lock:
+                self._conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ 调用账本关闭失败: {e}")
+    
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        if not self._stop.is_set():
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️ 调用账本写入失败: {e}")
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+    
+    def usage(self, granularity: str = 'day', since: Optional[float] = None, until: Optional[float] = None,
+              provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        按时间桶读取汇总
+        
+        Args:
+            granularity: minute / hour / day
+            since: 起始时间戳（含），默认不限
+            until: 结束时间戳（不含），默认不限
+            provider: 只看某个服务商
+        
+        Returns:
+            按时间桶、服务商汇总（合并端点）的调用数、错误数、字节数与平均/最大延迟
+        """
+        if granularity not in ROLLUP_BUCKETS:
+            raise ValueError(f"未知的汇总粒度: {granularity}")
+        width = ROLLUP_BUCKETS[granularity]
+        sql = ('SELECT bucket, provider, SUM(calls), SUM(errors), SUM(bytes), SUM(latency_sum), MAX(latency_max) '
+               'FROM rollups WHERE granularity = ?')
+        params: Tuple = (granularity,)
+        if since is not None:
+            sql += ' AND bucket >= ?'
+            params += (int(since // width) * width,)
+        if until is not None:
+            sql += ' AND bucket < ?'
+            params += (until,)
+        if provider:
+            sql += ' AND provider = ?'
+            params += (provider,)
+        sql += ' GROUP BY bucket, provider ORDER BY bucket, provider'
+        return [
+            {
+                'bucket': bucket,
+                'provider': provider_name,
+                'calls': calls,
+                'errors': errors,
+                'bytes': bytes_received,
+                'latency_mean': latency_sum / calls if calls else 0.0,
+                'latency_max': latency_max
+            }
+            for bucket, provider_name, calls, errors, bytes_received, latency_sum, latency_max
+            in self._query(sql, params)
+        ]
+    
+    def summary(self, since: Optional[float] = None, until: Optional[float] = None,
+                granularity: str = 'day') -> Dict[str, Dict[str, Any]]:
+        """
+        某段时间内各服务商的调用汇总
+        
+        Returns:
+            服务商 -> calls / errors / error_rate / bytes / latency_mean / latency_max
+        """
+        totals: Dict[str, Dict[str, Any]] = {}
+        for row in self.usage(granularity, since, until):
+            total = totals.setdefault(row['provider'], {
+                'calls': 0, 'errors': 0, 'bytes': 0, 'latency_sum': 0.0, 'latency_max': 0.0
+            })
+            total['calls'] += row['calls']
+            total['errors'] += row['errors']
+            total['bytes'] += row['bytes']
+            total['latency_sum'] += row['latency_mean'] * row['calls']
+            total['latency_max'] = max(total['latency_max'], row['latency_max'])
+        for total in totals.values():
+            latency_sum = total.pop('latency_sum')
+            total['error_rate'] = total['errors'] / total['calls'] if total['calls'] else 0.0
+            total['latency_mean'] = latency_sum / total['calls'] if total['calls'] else 0.0
+        return totals
+    
+    def monthly_summary(self, month: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        某个自然月（UTC，格式 YYYY-MM，默认本月）各服务商的调用汇总，用于核对月度配额
+        """
+        start = datetime.strptime(month, '%Y-%m').replace(tzinfo=timezone.utc) if month else \
+            datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+        return self.summary(start.timestamp(), end.timestamp())
+    
+    def recent_calls(self, limit: int = 100, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近的明细记录（最新在前）"""
+        sql = 'SELECT ts, provider, endpoint, status, latency, bytes, caller FROM calls'
+        params: Tuple = ()
+        if provider:
+            sql += ' WHERE provider = ?'
+            params = (provider,)
+        sql += ' ORDER BY ts DESC LIMIT ?'
+        columns = ('ts', 'provider', 'endpoint', 'status', 'latency', 'bytes', 'caller')
+        return [dict(zip(columns, row)) for row in self._query(sql, params + (limit,))]
+
+_ledgers: Dict[str, UsageLedger] = {}
+_ledgers_lock = threading.Lock()
+
+def get_usage_ledger(path: Optional[str] = None) -> UsageLedger:
+    """获取进程内共享的调用账本（同一文件只开一个写入线程）"""
+    path = os.path.abspath(path or os.path.join(get_state_dir(), 'usage_ledger.db'))
+    ledger = _ledgers.get(path)
+    if ledger is None:
+        with _ledgers_lock:
+            ledger = _ledgers.get(path)
+            if ledger is None:
+                ledger = _ledgers[path] = UsageLedger(path)
+    return ledger
@@ -377,7 +377,7 @@ ENV MCP_SERVER_PORT=8080
 EXPOSE 8080
 
 # 启动命令
-CMD ["python", "src/mcp/mongodb_mcp_server.py", "--port", "8080"]
+CMD ["python", "src/mcp/mongodb_mcp_server.py", "--host", "0.0.0.0", "--port", "8080"]
 """.strip()
     
     def generate_requirements(self) -> str:
@@ -9,6 +9,7 @@ MongoDB MCP Server
 - 聚合查询
 - 索引管理
 - 数据库统计
+- HTTP服务: POST /tools/{name}、GET /resources?uri=...，阻塞的pymongo调用在有界线程池中执行
 """
 
 import asyncio
@@ -16,8 +17,13 @@ import json
 import logging
 import os
 import sys
-from typing import Any, Dict, List, Optional, Union
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
 
 try:
     from pymongo import MongoClient
@@ -52,18 +58,33 @@ except ImportError:
                 'handler': handler
             }
 
+# 批量调用在事务中执行时，当前协程的MongoDB会话（各工具的驱动调用都带上该会话）
+_batch_session: ContextVar = ContextVar('mongodb_mcp_batch_session', default=None)
+
 class MongoDBMCPServer:
     """
     MongoDB MCP服务器
     提供MongoDB数据库访问功能
     """
     
-    def __init__(self, mongodb_url: Optional[str] = None):
+    def __init__(self, mongodb_url: Optional[str] = None, max_workers: int = 16, heavy_workers: int = 4):
+        """
+        Args:
+            mongodb_url: MongoDB连接URL
+            max_workers: 执行CRUD等轻量驱动调用的线程数
+            heavy_workers: 执行聚合、集合统计、建索引的线程数，慢查询只占用这组线程，
+                不会让其他代理的读写排队
+        """
         self.mongodb_url = mongodb_url or os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
         self.client = None
         self.db = None
         self.server = MCPServer("mongodb-mcp")
         
+        # pymongo是同步驱动，所有驱动调用都在线程池中执行，事件循环只负责收发请求
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mongodb-mcp')
+        self.heavy_executor = ThreadPoolExecutor(max_workers=heavy_workers, thread_name_prefix='mongodb-mcp-heavy')
+        self._connect_lock: Optional[asyncio.Lock] = None
+        
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -150,14 +171,28 @@ class MongoDBMCPServer:
             self.get_databases_list
         )
     
+    async def _run_blocking(self, func: Callable, *args, **kwargs) -> Any:
+        """在轻量线程池中执行阻塞的驱动调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def _run_heavy(self, func: Callable, *args, **kwargs) -> Any:
+        """在重查询线程池中执行聚合等可能很慢的驱动调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.heavy_executor, partial(func, *args, **kwargs))
+    
     async def connect_database(self, database_name: str = "default") -> Dict[str, Any]:
         """连接到MongoDB数据库"""
         try:
-            if not self.client:
-                self.client = MongoClient(self.mongodb_url)
-                # 测试连接
-                self.client.admin.command('ping')
-                self.logger.info(f"Connected to MongoDB at {self.mongodb_url}")
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:
+                if not self.client:
+                    client = MongoClient(self.mongodb_url)
+                    # 测试连接
+                    await self._run_blocking(client.admin.command, 'ping')
+                    self.client = client
+                    self.logger.info(f"Connected to MongoDB at {self.mongodb_url}")
             
             self.db = self.client[database_name]
             
@@ -167,7 +202,7 @@ class MongoDBMCPServer:
                 "database_name": database_name,
                 "connection_url": self.mongodb_url.replace(self.mongodb_url.split('@')[0].split('//')[1] + '@', '***@') if '@' in self.mongodb_url else self.mongodb_url
             }
-            
+        
         except ConnectionFailure as e:
             error_msg = f"Failed to connect to MongoDB: {str(e)}"
             self.logger.error(error_msg)
@@ -186,7 +221,7 @@ class MongoDBMCPServer:
     async def insert_document(self, collection_name: str, document: Union[Dict, str], many: bool = False) -> Dict[str, Any]:
         """插入文档到集合"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 如果document是字符串，尝试解析为JSON
@@ -196,19 +231,19 @@ class MongoDBMCPServer:
             collection = self.db[collection_name]
             
             if many and isinstance(document, list):
-                result = collection.insert_many(document)
+                result = await self._run_blocking(collection.insert_many, document, session=_batch_session.get())
                 return {
                     "success": True,
                     "inserted_ids": [str(id) for id in result.inserted_ids],
                     "count": len(result.inserted_ids)
                 }
             else:
-                result = collection.insert_one(document)
+                result = await self._run_blocking(collection.insert_one, document, session=_batch_session.get())
                 return {
                     "success": True,
                     "inserted_id": str(result.inserted_id)
                 }
-                
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -221,7 +256,7 @@ class MongoDBMCPServer:
                            skip: int = 0, sort: Union[Dict, str] = None) -> Dict[str, Any]:
         """查找文档"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 解析参数
@@ -237,14 +272,15 @@ class MongoDBMCPServer:
                 sort = json.loads(sort) if sort else None
             
             collection = self.db[collection_name]
-            cursor = collection.find(query, projection)
+            cursor = collection.find(query, projection, session=_batch_session.get())
             
             if sort:
                 cursor = cursor.sort(list(sort.items()))
             
             cursor = cursor.skip(skip).limit(limit)
             
-            documents = list(cursor)
+            # 游标在迭代时才真正查询
+            documents = await self._run_blocking(list, cursor)
             
             # 转换ObjectId为字符串
             for doc in documents:
@@ -259,7 +295,7 @@ class MongoDBMCPServer:
                 "limit": limit,
                 "skip": skip
             }
-            
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -268,10 +304,10 @@ class MongoDBMCPServer:
             return {"success": False, "error": f"Unexpected error: {str(e)}"}
     
     async def update_document(self, collection_name: str, query: Union[Dict, str], 
-                            update: Union[Dict, str], many: bool = False) -> Dict[str, Any]:
+                            update: Union[Dict, str], many: bool = False, upsert: bool = False) -> Dict[str, Any]:
         """更新文档"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 解析参数
@@ -283,20 +319,22 @@ class MongoDBMCPServer:
             collection = self.db[collection_name]
             
             if many:
-                result = collection.update_many(query, update)
+                result = await self._run_blocking(collection.update_many, query, update, upsert=upsert, session=_batch_session.get())
                 return {
                     "success": True,
                     "matched_count": result.matched_count,
-                    "modified_count": result.modified_count
+                    "modified_count": result.modified_count,
+                    "upserted_id": str(result.upserted_id) if result.upserted_id is not None else None
                 }
             else:
-                result = collection.update_one(query, update)
+                result = await self._run_blocking(collection.update_one, query, update, upsert=upsert, session=_batch_session.get())
                 return {
                     "success": True,
                     "matched_count": result.matched_count,
-                    "modified_count": result.modified_count
+                    "modified_count": result.modified_count,
+                    "upserted_id": str(result.upserted_id) if result.upserted_id is not None else None
                 }
-                
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -308,7 +346,7 @@ class MongoDBMCPServer:
                             many: bool = False) -> Dict[str, Any]:
         """删除文档"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 解析参数
@@ -318,18 +356,18 @@ class MongoDBMCPServer:
             collection = self.db[collection_name]
             
             if many:
-                result = collection.delete_many(query)
+                result = await self._run_blocking(collection.delete_many, query, session=_batch_session.get())
                 return {
                     "success": True,
                     "deleted_count": result.deleted_count
                 }
             else:
-                result = collection.delete_one(query)
+                result = await self._run_blocking(collection.delete_one, query, session=_batch_session.get())
                 return {
                     "success": True,
                     "deleted_count": result.deleted_count
                 }
-                
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -340,7 +378,7 @@ class MongoDBMCPServer:
     async def aggregate_query(self, collection_name: str, pipeline: Union[List, str]) -> Dict[str, Any]:
         """执行聚合查询"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 解析参数
@@ -348,7 +386,8 @@ class MongoDBMCPServer:
                 pipeline = json.loads(pipeline)
             
             collection = self.db[collection_name]
-            result = list(collection.aggregate(pipeline))
+            session = _batch_session.get()
+            result = await self._run_heavy(lambda: list(collection.aggregate(pipeline, session=session)))
             
             # 转换ObjectId为字符串
             for doc in result:
@@ -361,7 +400,7 @@ class MongoDBMCPServer:
                 "count": len(result),
                 "pipeline": pipeline
             }
-            
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -372,17 +411,17 @@ class MongoDBMCPServer:
     async def list_collections(self) -> Dict[str, Any]:
         """列出数据库中的所有集合"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
-            collections = self.db.list_collection_names()
+            collections = await self._run_blocking(self.db.list_collection_names, session=_batch_session.get())
             
             return {
                 "success": True,
                 "collections": collections,
                 "count": len(collections)
             }
-            
+        
         except PyMongoError as e:
             return {"success": False, "error": f"MongoDB error: {str(e)}"}
         except Exception as e:
@@ -392,7 +431,7 @@ class MongoDBMCPServer:
                           unique: bool = False, background: bool = True) -> Dict[str, Any]:
         """创建索引"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             # 解析参数
@@ -404,10 +443,12 @@ class MongoDBMCPServer:
             # 转换为pymongo格式
             index_list = [(key, value) for key, value in index_spec.items()]
             
-            result = collection.create_index(
+            result = await self._run_heavy(
+                collection.create_index,
                 index_list,
                 unique=unique,
-                background=background
+                background=background,
+                session=_batch_session.get()
             )
             
             return {
@@ -415,7 +456,7 @@ class MongoDBMCPServer:
                 "index_name": result,
                 "index_spec": index_spec
             }
-            
+        
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"Invalid JSON: {str(e)}"}
         except PyMongoError as e:
@@ -426,19 +467,20 @@ class MongoDBMCPServer:
     async def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """获取集合统计信息"""
         try:
-            if not self.db:
+            if self.db is None:
                 return {"success": False, "error": "Database not connected"}
             
             collection = self.db[collection_name]
             
             # 获取基本统计
-            stats = self.db.command("collStats", collection_name)
+            session = _batch_session.get()
+            stats = await self._run_heavy(self.db.command, "collStats", collection_name, session=session)
             
             # 获取文档数量
-            count = collection.count_documents({})
+            count = await self._run_heavy(collection.count_documents, {}, session=session)
             
             # 获取索引信息
-            indexes = list(collection.list_indexes())
+            indexes = await self._run_blocking(lambda: list(collection.list_indexes(session=session)))
             
             return {
                 "success": True,
@@ -453,7 +495,7 @@ class MongoDBMCPServer:
                 } for idx in indexes],
                 "index_count": len(indexes)
             }
-            
+        
         except PyMongoError as e:
             return {"success": False, "error": f"MongoDB error: {str(e)}"}
         except Exception as e:
@@ -469,23 +511,23 @@ class MongoDBMCPServer:
                 }
             
             # 测试连接
-            self.client.admin.command('ping')
+            await self._run_blocking(self.client.admin.command, 'ping')
             
             # 获取服务器信息
-            server_info = self.client.server_info()
+            server_info = await self._run_blocking(self.client.server_info)
             
             return {
                 "connected": True,
                 "server_version": server_info.get('version'),
                 "connection_url": self.mongodb_url.replace(self.mongodb_url.split('@')[0].split('//')[1] + '@', '***@') if '@' in self.mongodb_url else self.mongodb_url,
-                "current_database": self.db.name if self.db else None,
+                "current_database": self.db.name if self.db is not None else None,
                 "server_info": {
                     "version": server_info.get('version'),
                     "git_version": server_info.get('gitVersion'),
                     "platform": server_info.get('platform')
                 }
             }
-            
+        
         except Exception as e:
             return {
                 "connected": False,
@@ -498,14 +540,14 @@ class MongoDBMCPServer:
             if not self.client:
                 return {"success": False, "error": "Not connected to MongoDB"}
             
-            databases = self.client.list_database_names()
+            databases = await self._run_blocking(self.client.list_database_names)
             
             return {
                 "success": True,
                 "databases": databases,
                 "count": len(databases)
             }
-            
+        
         except PyMongoError as e:
             return {"success": False, "error": f"MongoDB error: {str(e)}"}
         except Exception as e:
@@ -518,6 +560,268 @@ class MongoDBMCPServer:
             self.client = None
             self.db = None
             self.logger.info("MongoDB connection closed")
+    
+    def shutdown(self):
+        """关闭数据库连接并停止驱动线程池"""
+        self.close_connection()
+        self.executor.shutdown(wait=False)
+        self.heavy_executor.shutdown(wait=False)
+    
+    # === HTTP服务 ===
+    
+    # 请求体上限，与MongoDB单个文档的大小上限一致
+    MAX_BODY_BYTES = 16 * 1024 * 1024
+    # 请求头的行数与总长度上限
+    MAX_HEADER_COUNT = 100
+    MAX_HEADER_BYTES = 64 * 1024
+    # keep-alive连接等待下一个请求的空闲超时；读取请求头、请求体的超时（秒）
+    IDLE_TIMEOUT = 60.0
+    READ_TIMEOUT = 30.0
+    
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        调用已注册的工具
+        
+        Returns:
+            (HTTP状态码, 工具返回值)；工具自身的失败以 success=False 返回，状态码仍为200
+        """
+        tool = self.server.tools.get(tool_name)
+        if tool is None:
+            return 404, {"success": False, "error": f"Unknown tool: {tool_name}"}
+        if not isinstance(arguments, dict):
+            return 400, {"success": False, "error": "Tool arguments must be a JSON object"}
+        
+        try:
+            return 200, await tool['handler'](**arguments)
+        except TypeError as e:
+            # 工具内部的异常都已转换为 success=False，这里只剩参数与签名不匹配
+            return 400, {"success": False, "error": f"Invalid arguments for {tool_name}: {str(e)}"}
+    
+    async def call_batch(self, calls: List[Dict[str, Any]], transaction: bool = False,
+                         ordered: bool = True) -> Tuple[int, Dict[str, Any]]:
+        """
+        按顺序执行一组工具调用，结果一次返回
+        
+        Args:
+            calls: [{"tool": 工具名称, "arguments": 参数对象}, ...]
+            transaction: 是否在同一个MongoDB会话的事务中执行（需要副本集）；
+                任一调用失败则回滚全部写入
+            ordered: 遇到失败的调用后是否停止执行后续调用（事务模式下总是停止）
+        
+        Returns:
+            (HTTP状态码, {"success", "results", "completed", "total", ...})，
+            results 与已执行的调用一一对应
+        """
+        if not isinstance(calls, list) or not all(
+            isinstance(call, dict) and isinstance(call.get('tool'), str) for call in calls
+        ):
+            return 400, {"success": False, "error": "calls must be a list of {\"tool\": ..., \"arguments\": {...}}"}
+        
+        unknown = sorted({call['tool'] for call in calls if call['tool'] not in self.server.tools})
+        if unknown:
+            return 404, {"success": False, "error": f"Unknown tools: {', '.join(unknown)}"}
+        
+        session = None
+        if transaction:
+            if not self.client:
+                return 200, {"success": False, "error": "Not connected to MongoDB"}
+            try:
+                session = await self._run_blocking(self.client.start_session)
+                session.start_transaction()
+            except PyMongoError as e:
+                return 200, {"success": False, "error": f"MongoDB error: {str(e)}"}
+        
+        results = []
+        failed = None
+        token = _batch_session.set(session)
+        try:
+            for index, call in enumerate(calls):
+                status, result = await self.call_tool(call['tool'], call.get('arguments') or {})
+                results.append(result)
+                if status != 200 or not result.get("success", True):
+                    failed = failed if failed is not None else index
+                    if ordered or transaction:
+                        break
+            
+            response = {
+                "success": failed is None,
+                "results": results,
+                "completed": len(results),
+                "total": len(calls),
+                "transaction": transaction
+            }
+            if failed is not None:
+                response["failed_index"] = failed
+                response["error"] = results[failed].get("error", "Tool call failed")
+            
+            if session is not None:
+                try:
+                    if failed is None:
+                        await self._run_blocking(session.commit_transaction)
+                    else:
+                        await self._run_blocking(session.abort_transaction)
+                        response["aborted"] = True
+                except PyMongoError as e:
+                    response.update(success=False, aborted=True, error=f"Transaction failed: {str(e)}")
+            return 200, response
+        finally:
+            _batch_session.reset(token)
+            if session is not None:
+                await self._run_blocking(session.end_session)
+    
+    async def read_resource(self, resource_uri: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        读取已注册的资源
+        
+        Returns:
+            (HTTP状态码, 资源内容)
+        """
+        resource = self.server.resources.get(resource_uri)
+        if resource is None:
+            return 404, {"success": False, "error": f"Unknown resource: {resource_uri}"}
+        return 200, await resource['handler']()
+    
+    async def _route(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """把HTTP请求分发到工具或资源"""
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/') or '/'
+        
+        if path.startswith('/tools/'):
+            if method != 'POST':
+                return 405, {"success": False, "error": f"Method {method} not allowed"}
+            try:
+                # 扩展JSON：客户端可以用 {"$oid": ...}、{"$date": ...} 传递ObjectId与时间
+                arguments = json_util.loads(body.decode('utf-8')) if body.strip() else {}
+            except (ValueError, UnicodeDecodeError) as e:
+                return 400, {"success": False, "error": f"Invalid JSON: {str(e)}"}
+            if path == '/tools/batch':
+                if not isinstance(arguments, dict):
+                    return 400, {"success": False, "error": "Batch request must be a JSON object"}
+                return await self.call_batch(
+                    arguments.get('calls'),
+                    transaction=bool(arguments.get('transaction', False)),
+                    ordered=bool(arguments.get('ordered', True))
+                )
+            return await self.call_tool(unquote(path[len('/tools/'):]), arguments)
+        
+        if method != 'GET':
+            return 405, {"success": False, "error": f"Method {method} not allowed"}
+        
+        if path == '/tools':
+            return 200, {
+                "success": True,
+                "tools": [{"name": name, "description": info['description']} for name, info in self.server.tools.items()]
+            }
+        
+        if path == '/resources':
+            resource_uri = parse_qs(parts.query).get('uri', [None])[0]
+            if resource_uri is None:
+                return 200, {
+                    "success": True,
+                    "resources": [
+                        {"uri": uri, "name": info['name'], "description": info['description']}
+                        for uri, info in self.server.resources.items()
+                    ]
+                }
+            return await self.read_resource(resource_uri)
+        
+        if path == '/health':
+            return 200, {"success": True, "status": "ok", "connected": self.client is not None}
+        
+        return 404, {"success": False, "error": f"Not found: {path}"}
+    
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                              keep_alive: bool):
+        body = json.dumps(payload, default=json_util.default, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Optional[Dict[str, str]]:
+        """读取请求头；行数或总长度超过上限时返回None"""
+        headers = {}
+        count = 0
+        size = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            count += 1
+            size += len(line)
+            if count > self.MAX_HEADER_COUNT or size > self.MAX_HEADER_BYTES:
+                return None
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个HTTP/1.1连接（支持keep-alive，同一连接上的请求依次处理）"""
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.IDLE_TIMEOUT)
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write_response(writer, 400, {"success": False, "error": "Malformed request line"}, False)
+                    break
+                
+                # 整个请求头共用一个超时，逐行缓慢发送也无法一直占用连接
+                headers = await asyncio.wait_for(self._read_headers(reader), self.READ_TIMEOUT)
+                if headers is None:
+                    await self._write_response(writer, 431, {"success": False, "error": "Request header fields too large"}, False)
+                    break
+                
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                
+                if 'chunked' in headers.get('transfer-encoding', '').lower():
+                    await self._write_response(writer, 411, {"success": False, "error": "Content-Length required"}, False)
+                    break
+                content_length = headers.get('content-length', '')
+                if content_length and not (content_length.isascii() and content_length.isdigit()):
+                    await self._write_response(writer, 400, {"success": False, "error": "Invalid Content-Length"}, False)
+                    break
+                length = int(content_length or 0)
+                if length > self.MAX_BODY_BYTES:
+                    await self._write_response(writer, 413, {"success": False, "error": "Request body too large"}, False)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), self.READ_TIMEOUT) if length else b''
+                
+                try:
+                    status, payload = await self._route(method.upper(), target, body)
+                except Exception as e:
+                    self.logger.exception(f"Request failed: {method} {target}")
+                    status, payload = 500, {"success": False, "error": f"Unexpected error: {str(e)}"}
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+            # 客户端断开、空闲或读取超时，或请求行/头部超过StreamReader的长度上限
+            pass
+        finally:
+            writer.close()
+    
+    async def start_http_server(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+        """
+        启动HTTP服务
+        
+        路由:
+            POST /tools/{name}      调用工具，请求体为参数JSON对象
+            POST /tools/batch       按顺序执行一组工具调用，可选在一个事务中执行
+            GET  /tools             工具列表
+            GET  /resources?uri=... 读取资源（不带uri时返回资源列表）
+            GET  /health            存活检查
+        """
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        self.logger.info(f"MongoDB MCP HTTP server listening on {host}:{port}")
+        return server
 
 
 def main():
@@ -535,17 +839,28 @@ def main():
         default="default",
         help="默认数据库名称"
     )
+    parser.add_argument(
+        "--host",
+        default=os.getenv('MCP_SERVER_HOST', '127.0.0.1'),
+        help="MCP服务器监听地址（容器中使用0.0.0.0）"
+    )
     parser.add_argument(
         "--port",
         type=int,
-        default=8080,
+        default=int(os.getenv('MCP_SERVER_PORT', '8080')),
         help="MCP服务器端口"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="执行MongoDB驱动调用的线程数"
+    )
     
     args = parser.parse_args()
     
     # 创建MCP服务器
-    mcp_server = MongoDBMCPServer(args.mongodb_url)
+    mcp_server = MongoDBMCPServer(args.mongodb_url, max_workers=args.workers)
     
     print(f"🚀 Starting MongoDB MCP Server...")
     print(f"📊 MongoDB URL: {args.mongodb_url}")
@@ -560,26 +875,27 @@ def main():
     for resource_uri, resource_info in mcp_server.server.resources.items():
         print(f"  - {resource_uri}: {resource_info['description']}")
     
-    try:
-        # 自动连接到默认数据库
-        asyncio.run(mcp_server.connect_database(args.database))
+    async def serve():
+        # 自动连接到默认数据库；失败时仍然提供服务，客户端可以稍后调用 connect_database
+        result = await mcp_server.connect_database(args.database)
+        if not result.get("success"):
+            print(f"⚠️  {result.get('error')}")
         
-        # 这里应该启动实际的MCP服务器
-        # 由于我们没有完整的MCP库，这里只是演示
-        print(f"\n✅ MongoDB MCP Server is ready!")
+        server = await mcp_server.start_http_server(args.host, args.port)
+        print(f"\n✅ MongoDB MCP Server is ready on http://{args.host}:{args.port}")
         print(f"💡 Use this server with Swarm MCP client to access MongoDB")
-        
-        # 保持服务器运行
-        try:
-            while True:
-                asyncio.run(asyncio.sleep(1))
-        except KeyboardInterrupt:
-            print("\n🛑 Shutting down MongoDB MCP Server...")
-            mcp_server.close_connection()
-            
+        async with server:
+            await server.serve_forever()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down MongoDB MCP Server...")
     except Exception as e:
         print(f"❌ Error starting server: {e}")
         sys.exit(1)
+    finally:
+        mcp_server.shutdown()
 
 
 if __name__ == "__main__":
@@ -15,8 +15,8 @@ import json
 import logging
 import os
 import sys
-from typing import Any, Dict, List, Optional, Union
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+from datetime import datetime, timezone
 
 try:
     import requests
@@ -24,6 +24,14 @@ except ImportError:
     print("Error: requests is required. Install with: pip install requests")
     sys.exit(1)
 
+def _to_extended_json(value: Any) -> Any:
+    """json.dumps的default：时间编码为MongoDB扩展JSON，服务器端还原为BSON日期"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 class SwarmMongoDBClient:
     """
     Swarm MongoDB MCP客户端
@@ -62,7 +70,8 @@ class SwarmMongoDBClient:
         """
         try:
             url = f"{self.mcp_server_url}/tools/{tool_name}"
-            response = self.session.post(url, json=kwargs, timeout=30)
+            body = json.dumps(kwargs, default=_to_extended_json, ensure_ascii=False).encode('utf-8')
+            response = self.session.post(url, data=body, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -214,7 +223,7 @@ class SwarmMongoDBClient:
         )
     
     def update_document(self, collection_name: str, query: Dict, update: Dict,
-                       many: bool = False) -> Dict[str, Any]:
+                       many: bool = False, upsert: bool = False) -> Dict[str, Any]:
         """
         更新文档
         
@@ -223,9 +232,10 @@ class SwarmMongoDBClient:
             query: 查询条件
             update: 更新操作
             many: 是否批量更新
+            upsert: 没有匹配的文档时是否插入
         
         Returns:
-            更新结果
+            更新结果，插入新文档时 upserted_id 为其ID
         """
         if not self.connected:
             return {"success": False, "error": "Not connected to database"}
@@ -235,7 +245,8 @@ class SwarmMongoDBClient:
             collection_name=collection_name,
             query=query,
             update=update,
-            many=many
+            many=many,
+            upsert=upsert
         )
     
     def delete_document(self, collection_name: str, query: Dict,
@@ -261,6 +272,48 @@ class SwarmMongoDBClient:
             many=many
         )
     
+    # === 批量调用 ===
+    
+    def batch(self, calls: List[Tuple[str, Dict[str, Any]]], transaction: bool = False,
+              ordered: bool = True, timeout: float = 60) -> Dict[str, Any]:
+        """
+        在一次往返中按顺序执行多个工具调用
+        
+        Args:
+            calls: [(工具名称, 参数), ...]，如 ("insert_document", {"collection_name": ..., "document": ...})
+            transaction: 是否在同一个MongoDB事务中执行（需要副本集），任一调用失败则全部回滚
+            ordered: 遇到失败后是否停止执行后续调用
+            timeout: 整个批次的超时时间（秒）
+        
+        Returns:
+            批量结果，results 与已执行的调用一一对应；失败时 failed_index 为第一个失败调用的下标
+        """
+        if not self.connected:
+            return {"success": False, "error": "Not connected to database"}
+        
+        payload = {
+            "calls": [{"tool": tool_name, "arguments": arguments} for tool_name, arguments in calls],
+            "transaction": transaction,
+            "ordered": ordered
+        }
+        try:
+            body = json.dumps(payload, default=_to_extended_json, ensure_ascii=False).encode('utf-8')
+            response = self.session.post(f"{self.mcp_server_url}/tools/batch", data=body, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"MCP batch call failed: {e}")
+            return {
+                "success": False,
+                "error": f"MCP communication error: {str(e)}"
+            }
+        except (TypeError, ValueError) as e:
+            self.logger.error(f"Invalid batch payload or response: {e}")
+            return {
+                "success": False,
+                "error": f"Invalid batch format: {str(e)}"
+            }
+    
     # === 高级查询 ===
     
     def aggregate(self, collection_name: str, pipeline: List[Dict]) -> Dict[str, Any]:
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+单元测试公共配置：不访问网络，限速状态、缓存等持久化文件写入临时目录
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """每个测试使用独立的状态目录"""
+    monkeypatch.setenv('JIXIA_STATE_DIR', str(tmp_path))
+    return tmp_path
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+自适应路由测试：评分在最优评分容差内的候选视为持平，保留分配表顺序
+"""
+
+from src.jixia.engines.adaptive_router import AdaptiveRouter
+
+def make_router(scores):
+    router = AdaptiveRouter(tie_tolerance=0.15)
+    router.score = lambda api_name, data_type, quota_ratio=None: scores[api_name]
+    return router
+
+def test_small_difference_keeps_configured_order():
+    router = make_router({'alpha_vantage': 1.01, 'webull': 1.0})
+    assert router.rank(['alpha_vantage', 'webull'], 'stock_quote') == ['alpha_vantage', 'webull']
+
+def test_tie_boundary():
+    router = make_router({'alpha_vantage': 1.15, 'webull': 1.0})
+    assert router.rank(['alpha_vantage', 'webull'], 'stock_quote') == ['alpha_vantage', 'webull']
+    
+    router = make_router({'alpha_vantage': 1.16, 'webull': 1.0})
+    assert router.rank(['alpha_vantage', 'webull'], 'stock_quote') == ['webull', 'alpha_vantage']
+
+def test_slower_candidates_ranked_after_tied_group():
+    router = make_router({'alpha_vantage': 3.0, 'webull': 1.1, 'yahoo_finance_15': 1.0, 'seeking_alpha': 2.0})
+    ranked = router.rank(['alpha_vantage', 'webull', 'yahoo_finance_15', 'seeking_alpha'], 'stock_quote')
+    assert ranked == ['webull', 'yahoo_finance_15', 'seeking_alpha', 'alpha_vantage']
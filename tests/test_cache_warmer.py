@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+缓存预热测试：预热关注列表与论道日程后，论道中的请求命中仙人级缓存
+"""
+
+import time
+
+from src.jixia.engines import jixia_load_balancer
+from src.jixia.engines.cache_warmer import CacheWarmer
+from src.jixia.engines.jixia_load_balancer import APIResult, JixiaLoadBalancer, get_shared_load_balancer
+from src.jixia.engines.priority_scheduler import Priority
+
+class FakeProviders:
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, api_name, data_type, symbol=None, priority=None):
+        self.calls.append((api_name, data_type, symbol, priority))
+        return APIResult(True, {'symbol': symbol, 'price': 100.0}, api_name, 0.0)
+
+def make_balancer():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.adaptive_routing = False
+    balancer._try_api = FakeProviders()
+    return balancer
+
+def test_warmed_symbol_is_cache_hit():
+    balancer = make_balancer()
+    warmer = CacheWarmer(balancer, watchlist=[' tsla '])
+    
+    result = warmer.run_pending()
+    immortals = list(balancer.immortal_api_mapping['stock_quote'])
+    assert result == {'warmed': len(immortals), 'failed': 0, 'deferred': 0}
+    assert all(priority == Priority.PREFETCH for *_, priority in balancer._try_api.calls)
+    
+    # 预热之后论道的请求（无论代码大小写）都命中缓存，不再调用上游
+    calls = len(balancer._try_api.calls)
+    for symbol in ('TSLA', 'tsla'):
+        cached = balancer.get_data_for_immortal(immortals[0], 'stock_quote', symbol)
+        assert cached.cached
+    assert len(balancer._try_api.calls) == calls
+    
+    # 条目仍然新鲜，下一轮不需要预热
+    assert warmer.due_entries() == []
+
+def test_scheduled_debate_warmed_first():
+    balancer = make_balancer()
+    warmer = CacheWarmer(balancer, watchlist=['AAPL'], lead_time=30.0)
+    now = time.time()
+    warmer.schedule_debate('nvda', now + 10, immortals=('吕洞宾',))
+    warmer.schedule_debate('msft', now + 600, immortals=('吕洞宾',))
+    
+    due = warmer.due_entries(now)
+    # 开始前 lead_time 内的论道排在关注列表之前，较远的论道暂不预热
+    assert due[0] == ('吕洞宾', 'stock_quote', 'NVDA')
+    assert all(symbol in ('NVDA', 'AAPL') for _, _, symbol in due)
+
+def test_max_warms_per_pass_defers_rest():
+    balancer = make_balancer()
+    warmer = CacheWarmer(balancer, watchlist=['TSLA'], max_warms_per_pass=2)
+    total = len(warmer.due_entries())
+    
+    assert warmer.run_pending() == {'warmed': 2, 'failed': 0, 'deferred': total - 2}
+    assert len(warmer.due_entries()) == total - 2
+
+def test_env_watchlist_normalized(monkeypatch):
+    monkeypatch.setenv('JIXIA_PREWARM_WATCHLIST', ' tsla, nvda ,,')
+    monkeypatch.setattr(CacheWarmer, 'start', lambda self: None)
+    try:
+        balancer = get_shared_load_balancer('warmer-test-key')
+        assert sorted(balancer.warmer._watchlist) == ['NVDA', 'TSLA']
+    finally:
+        jixia_load_balancer._shared_balancers.pop('warmer-test-key', None)
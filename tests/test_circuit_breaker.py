@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+熔断器测试：closed → open → half-open → closed 状态循环、分桶时间窗口，
+以及状态变化回调在释放锁之后执行
+"""
+
+import threading
+
+import pytest
+
+from src.jixia.engines import circuit_breaker
+from src.jixia.engines.circuit_breaker import CircuitBreaker, CircuitState
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', fake)
+    return fake
+
+def make_breaker(transitions=None, **options):
+    on_transition = (lambda name, old, new, reason: transitions.append((old, new))) if transitions is not None else None
+    return CircuitBreaker('yh_finance/stock_quote', window=60.0, buckets=12, min_requests=5,
+                          error_threshold=0.5, base_cooldown=5.0, on_transition=on_transition, **options)
+
+def test_full_cycle(clock):
+    transitions = []
+    breaker = make_breaker(transitions)
+    for _ in range(5):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+    assert not breaker.is_available()
+    
+    # 冷却结束后只放行一个探测请求
+    clock.now += 5.0
+    assert breaker.is_available()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow_request()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()['window_requests'] == 0
+    assert transitions == [
+        (CircuitState.CLOSED, CircuitState.OPEN),
+        (CircuitState.OPEN, CircuitState.HALF_OPEN),
+        (CircuitState.HALF_OPEN, CircuitState.CLOSED)
+    ]
+
+def test_failed_probe_doubles_cooldown(clock):
+    breaker = make_breaker()
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 5.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    
+    clock.now += 9.9
+    assert not breaker.allow_request()
+    clock.now += 0.1
+    assert breaker.allow_request()
+
+def test_probe_timeout_allows_new_probe(clock):
+    breaker = make_breaker(probe_timeout=30.0)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 5.0
+    assert breaker.allow_request()
+    clock.now += 30.0
+    assert not breaker.allow_request()
+    clock.now += 0.1
+    assert breaker.allow_request()
+
+def test_error_rate_below_threshold_stays_closed(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    snapshot = breaker.snapshot()
+    assert snapshot['state'] == CircuitState.CLOSED
+    assert snapshot['window_requests'] == 5
+    assert snapshot['window_error_rate'] == pytest.approx(0.4)
+    
+    # 30秒后仍在窗口内，再失败一次达到阈值
+    clock.now += 30.0
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+def test_old_buckets_leave_window(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    
+    # 超过窗口后旧桶不再计入，单次失败达不到最小请求数
+    clock.now += 61.0
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()['window_requests'] == 1
+    
+    # 部分过期：只有窗口内的桶计入
+    for _ in range(2):
+        breaker.record_failure()
+    clock.now += 40.0
+    for _ in range(2):
+        breaker.record_success()
+    assert breaker.snapshot()['window_requests'] == 5
+    clock.now += 25.0
+    assert breaker.snapshot()['window_requests'] == 2
+
+def test_callback_may_read_breaker_state(clock):
+    seen = []
+    breaker = CircuitBreaker('webull/stock_quote', min_requests=1,
+                             on_transition=lambda *args: seen.append(breaker.snapshot()['state']))
+    
+    worker = threading.Thread(target=breaker.record_failure)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert seen == [CircuitState.OPEN]
+
+def test_slow_callback_does_not_block_requests(clock):
+    release = threading.Event()
+    entered = threading.Event()
+    
+    def slow_listener(*args):
+        entered.set()
+        release.wait(timeout=5)
+    
+    breaker = CircuitBreaker('webull/stock_quote', min_requests=1, on_transition=slow_listener)
+    worker = threading.Thread(target=breaker.record_failure)
+    worker.start()
+    try:
+        assert entered.wait(timeout=5)
+        # 回调仍在执行，其他请求照常得到熔断结果
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.snapshot()['state'] == CircuitState.OPEN
+    finally:
+        release.set()
+        worker.join(timeout=5)
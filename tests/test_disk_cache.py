@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+持久化缓存测试：数据库不可用时所有操作退化为未命中，不向调用方抛出异常
+"""
+
+from src.jixia.engines.disk_cache import DiskCache
+
+def test_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.db'), namespace='test')
+    cache.set('quote', {'price': 1.5}, ttl=60)
+    assert cache.get('quote') == {'price': 1.5}
+    cache.delete('quote')
+    assert cache.get('quote') is None
+    assert cache.stats()['entries'] == 0
+
+def test_database_errors_degrade_to_miss(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.db'), namespace='test')
+    cache.set('quote', {'price': 1.5}, ttl=60)
+    
+    # 关闭当前线程的连接后，所有语句都会抛出 sqlite3.Error
+    cache._local.conn.close()
+    
+    assert cache.get('quote') is None
+    cache.set('quote', {'price': 2.0}, ttl=60)
+    cache.delete('quote')
+    assert cache.purge_expired() == 0
+    stats = cache.stats()
+    assert stats['entries'] is None
+    assert stats['misses'] == 1
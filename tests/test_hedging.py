@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+对冲请求测试：首选API超过p90延迟才对冲，对冲受预算限制，快速失败直接转向下一个服务商
+"""
+
+import threading
+import time
+
+from src.jixia.engines.jixia_load_balancer import APIResult, HedgeBudget, JixiaLoadBalancer
+
+HEDGE_DELAY = 0.05
+
+def make_balancer(budget=None):
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.hedging = True
+    balancer.adaptive_routing = False
+    balancer.hedge_budget = budget or HedgeBudget(ratio=0.0, burst=1.0)
+    # 首选API的最近延迟样本，p90 即对冲等待时间
+    for _ in range(10):
+        balancer.router.record('alpha_vantage', 'stock_quote', HEDGE_DELAY, True)
+    return balancer
+
+class FakeProviders:
+    """按服务商返回预设结果的 _try_api 替身；slow 中的服务商等待 release 后才返回"""
+    
+    def __init__(self, results, slow=(), delay=5.0):
+        self.results = results
+        self.slow = set(slow)
+        self.delay = delay
+        self.release = threading.Event()
+        self.calls = []
+        self.started = time.monotonic()
+    
+    def __call__(self, api_name, data_type, symbol=None, priority=None):
+        self.calls.append((api_name, time.monotonic() - self.started))
+        if api_name in self.slow:
+            self.release.wait(self.delay)
+        success = self.results[api_name]
+        return APIResult(success, {'symbol': symbol} if success else {}, api_name, 0.0,
+                         None if success else 'HTTP 503', error_class=None if success else 'http_5xx')
+
+def test_hedge_fires_after_p90_delay():
+    balancer = make_balancer()
+    providers = FakeProviders({'alpha_vantage': True, 'webull': True}, slow={'alpha_vantage'})
+    balancer._try_api = providers
+    try:
+        result, hedged = balancer._try_api_hedged('alpha_vantage', 'webull', 'stock_quote', 'AAPL')
+    finally:
+        providers.release.set()
+    
+    assert hedged
+    assert result.api_used == 'webull'
+    calls = dict(providers.calls)
+    assert calls['webull'] - calls['alpha_vantage'] >= HEDGE_DELAY
+    stats = balancer.get_request_stats()
+    assert stats['hedged_requests'] == 1
+    assert stats['hedge_wins'] == 1
+
+def test_budget_caps_hedges():
+    balancer = make_balancer()
+    # 首选API稍慢于p90但最终成功
+    providers = FakeProviders({'alpha_vantage': True, 'webull': True}, slow={'alpha_vantage'}, delay=0.2)
+    balancer._try_api = providers
+    
+    first, first_hedged = balancer._try_api_hedged('alpha_vantage', 'webull', 'stock_quote', 'AAPL')
+    second, second_hedged = balancer._try_api_hedged('alpha_vantage', 'webull', 'stock_quote', 'AAPL')
+    
+    # 唯一的对冲令牌用完后，第二次只能等待首选API
+    assert first_hedged and first.api_used == 'webull'
+    assert not second_hedged and second.api_used == 'alpha_vantage'
+    assert [api for api, _ in providers.calls].count('webull') == 1
+    assert balancer.get_request_stats()['hedged_requests'] == 1
+
+def test_budget_refills_with_requests():
+    budget = HedgeBudget(ratio=0.5, burst=1.0)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    budget.record_request()
+    assert not budget.try_acquire()
+    budget.record_request()
+    assert budget.try_acquire()
+
+def test_fast_failure_falls_through_without_spending_budget():
+    balancer = make_balancer()
+    providers = FakeProviders({'alpha_vantage': False, 'webull': True, 'yahoo_finance_15': True})
+    balancer._try_api = providers
+    
+    result = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    
+    assert result.success
+    assert result.api_used == 'webull'
+    assert [api for api, _ in providers.calls] == ['alpha_vantage', 'webull']
+    assert balancer.get_request_stats()['hedged_requests'] == 0
+    # 对冲令牌没有被消耗
+    assert balancer.hedge_budget.try_acquire()
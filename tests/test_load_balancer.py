@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+负载均衡器测试：上游响应的失败分类与负缓存、批量报价，以及流式八仙论道
+"""
+
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from src.jixia.engines.jixia_load_balancer import APIResult, JixiaLoadBalancer
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.content = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+
+class FakeHttp:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.calls = 0
+    
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(self.payload, self.status_code)
+
+def make_balancer(payload, status_code=200):
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.http = FakeHttp(payload, status_code)
+    return balancer
+
+def test_unparseable_quote_is_parse_error():
+    balancer = make_balancer({'stocks': [{'symbol': 'AAPL', 'close': 'n/a'}]})
+    result = balancer._try_api('webull', 'stock_quote', 'AAPL')
+    
+    assert not result.success
+    assert result.error_class == 'parse_error'
+    assert result.error.startswith('Data normalization failed')
+    # 解析错误只做短TTL负缓存
+    assert balancer.negative_cache.expires_in(('webull', 'stock_quote', 'AAPL')) <= balancer.negative_cache_ttls['parse_error']
+
+def test_empty_quote_is_empty_response():
+    balancer = make_balancer({'Global Quote': {}})
+    result = balancer._try_api('alpha_vantage', 'stock_quote', 'NOSUCH')
+    
+    assert not result.success
+    assert result.error_class == 'empty_response'
+    
+    # 负缓存命中，不再请求上游
+    assert balancer._try_api('alpha_vantage', 'stock_quote', 'NOSUCH').error_class == 'empty_response'
+    assert balancer.http.calls == 1
+
+def test_no_content_is_empty_response():
+    balancer = make_balancer(None, status_code=204)
+    result = balancer._try_api('alpha_vantage', 'stock_quote', 'NOSUCH')
+    
+    assert not result.success
+    assert result.error_class == 'empty_response'
+    # 204 不是上游故障
+    assert balancer.health_checker.is_healthy('alpha_vantage', 'stock_quote')
+    assert balancer.health_checker.get_circuit_states()['alpha_vantage']['stock_quote']['consecutive_failures'] == 0
+
+def test_cached_data_is_not_shared_with_callers():
+    balancer = make_balancer({'Global Quote': {'01. symbol': 'AAPL', '05. price': '190.50', '09. change': '1.5',
+                                               '10. change percent': '0.79%', '06. volume': '1000',
+                                               '03. high': '191.0', '04. low': '189.0'}})
+    fetched = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert fetched.success
+    price = fetched.data['price']
+    
+    # 修改刚取回的结果与缓存命中的结果都不影响缓存中的数据
+    fetched.data['price'] = -1
+    first = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert first.cached
+    assert first.data['price'] == price
+    first.data['price'] = -2
+    first.data.clear()
+    
+    second = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert second.data['price'] == price
+    assert balancer.http.calls == 1
+
+class QuoteHttp:
+    """yh_finance 批量端点只认识 KNOWN 中的代码，alpha_vantage 单股端点认识所有代码"""
+    
+    KNOWN = {'AAPL', 'MSFT'}
+    
+    def __init__(self):
+        self.urls = []
+    
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        query = parse_qs(urlsplit(url).query)
+        if 'symbols' in query:
+            symbols = query['symbols'][0].split(',')
+            return FakeResponse({'quoteResponse': {'result': [
+                {'symbol': symbol, 'regularMarketPrice': 100.0, 'regularMarketChange': 1.0,
+                 'regularMarketChangePercent': 1.0, 'regularMarketVolume': 1000}
+                for symbol in symbols if symbol in self.KNOWN
+            ], 'error': None}})
+        symbol = query['symbol'][0]
+        return FakeResponse({'Global Quote': {'01. symbol': symbol, '05. price': '50.0', '09. change': '0.5',
+                                              '10. change percent': '1.0%', '06. volume': '10'}})
+
+def make_quote_balancer():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.http = QuoteHttp()
+    balancer.batch_quote_priority = ['yh_finance']
+    balancer.single_quote_priority = ['alpha_vantage']
+    return balancer
+
+def test_get_quotes_batch_partial_and_fallback():
+    balancer = make_quote_balancer()
+    quotes = balancer.get_quotes(['aapl', 'MSFT', 'TSLA'])
+    
+    # 批量端点覆盖 AAPL、MSFT，TSLA 走单股故障转移
+    assert quotes['AAPL']['price'] == 100.0
+    assert quotes['MSFT']['source'] == 'yh_finance'
+    assert quotes['TSLA']['price'] == 50.0
+    assert quotes['TSLA']['source'] == 'alpha_vantage'
+    assert len(balancer.http.urls) == 2
+    
+    # 标准化报价单独缓存，不占用上游请求级缓存
+    assert balancer.quote_cache.stats()['entries'] == 3
+    assert balancer.provider_cache.stats()['entries'] == 2
+    
+    # 再次请求全部命中报价缓存
+    assert balancer.get_quotes(['AAPL', 'MSFT', 'TSLA']) == quotes
+    assert len(balancer.http.urls) == 2
+
+def test_batch_request_uses_provider_cache():
+    balancer = make_quote_balancer()
+    balancer.get_quotes(['AAPL', 'MSFT'])
+    
+    # 报价缓存过期后，同一批次URL仍在上游请求级缓存中
+    balancer.quote_cache.clear()
+    quotes = balancer.get_quotes(['AAPL', 'MSFT'])
+    assert quotes['AAPL']['price'] == 100.0
+    assert len(balancer.http.urls) == 1
+    assert balancer.get_request_stats()['provider_cache_hits'] == 1
+
+def test_concurrent_batches_coalesced():
+    balancer = make_quote_balancer()
+    get = balancer.http.get
+    
+    def slow_get(url, headers=None, timeout=None):
+        time.sleep(0.2)
+        return get(url, headers, timeout)
+    
+    balancer.http.get = slow_get
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(balancer.get_quotes(['AAPL', 'MSFT'])))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    assert results[0] == results[1]
+    assert len(balancer.http.urls) == 1
+    assert balancer.get_request_stats()['coalesced_calls'] == 1
+
+def test_batch_negative_cache():
+    balancer = make_quote_balancer()
+    balancer.single_quote_priority = []
+    
+    # 整批都不认识：空响应写入负缓存，再次请求不再调用上游
+    assert 'error' in balancer.get_quotes(['ZZZZ'])['ZZZZ']
+    assert 'error' in balancer.get_quotes(['ZZZZ'])['ZZZZ']
+    assert len(balancer.http.urls) == 1
+    assert balancer.get_request_stats()['negative_cache_hits'] == 1
+
+class DelayedProviders:
+    """_try_api 替身：按服务商延迟返回，raising 中的服务商抛出异常"""
+    
+    def __init__(self, delays, raising=()):
+        self.delays = delays
+        self.raising = set(raising)
+        self.calls = []
+    
+    def __call__(self, api_name, data_type, symbol=None, priority=None):
+        self.calls.append(api_name)
+        time.sleep(self.delays.get(api_name, 0))
+        if api_name in self.raising:
+            raise RuntimeError(f'{api_name} exploded')
+        return APIResult(True, {'symbol': symbol, 'price': 100.0}, api_name, 0.0)
+
+async def collect(stream):
+    return [item async for item in stream]
+
+def test_stream_debate_in_completion_order():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.adaptive_routing = False
+    balancer._try_api = DelayedProviders({'alpha_vantage': 0.1, 'webull': 0.2})
+    
+    streamed = asyncio.run(collect(balancer.stream_immortal_debate('TSLA')))
+    
+    # seeking_alpha 没有报价端点，曹国舅改用 alpha_vantage
+    names = [name for name, _ in streamed]
+    assert set(names[:2]) == {'何仙姑', '汉钟离'}
+    assert set(names[2:6]) == {'吕洞宾', '韩湘子', '铁拐李', '曹国舅'}
+    assert set(names[6:]) == {'张果老', '蓝采和'}
+    assert all(result.success for _, result in streamed)
+    
+    # 同一个实例上的下一场论道直接命中缓存
+    calls = len(balancer._try_api.calls)
+    again = asyncio.run(collect(balancer.stream_immortal_debate('TSLA')))
+    assert all(result.cached for _, result in again)
+    assert len(balancer._try_api.calls) == calls
+
+def test_stream_debate_finishes_when_fetch_raises():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.adaptive_routing = False
+    balancer._try_api = DelayedProviders({}, raising={'webull'})
+    
+    streamed = dict(asyncio.run(collect(balancer.stream_immortal_debate('TSLA'))))
+    
+    # 请求抛出异常的仙人得到失败结果，其余仙人照常发言
+    assert set(streamed) == set(balancer.immortal_api_mapping['stock_quote'])
+    assert [name for name, result in streamed.items() if not result.success] == ['张果老', '蓝采和']
+    assert streamed['张果老'].error == 'Unexpected error: webull exploded'
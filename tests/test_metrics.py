@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+指标测试：HTTP状态码分类
+"""
+
+from src.jixia.engines.metrics import OUTCOME_EMPTY, OUTCOME_SUCCESS, classify_status
+
+def test_classify_2xx():
+    assert classify_status(200) == OUTCOME_SUCCESS
+    assert classify_status(201) == OUTCOME_SUCCESS
+    assert classify_status(206) == OUTCOME_SUCCESS
+    # 204 没有响应体（yh_finance 对未知代码的响应）
+    assert classify_status(204) == OUTCOME_EMPTY
+
+def test_classify_errors():
+    assert classify_status(400) == 'http_4xx'
+    assert classify_status(404) == 'http_4xx'
+    assert classify_status(429) == 'http_429'
+    assert classify_status(500) == 'http_5xx'
+    assert classify_status(503) == 'http_5xx'
+    assert classify_status(302) == 'http_other'
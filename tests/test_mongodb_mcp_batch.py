@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+MongoDB MCP批量调用测试：按顺序分发、逐项报告失败、事务会话只传给本批次的驱动调用；
+用内存中的集合替身代替MongoDB，不需要安装pymongo
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import types
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import pytest
+
+from src.mcp.swarm_mongodb_client import SwarmMongoDBClient
+
+SERVER_MODULE = 'src.mcp.mongodb_mcp_server'
+
+@pytest.fixture
+def mcp(monkeypatch):
+    """导入MCP服务模块；没有安装pymongo时用只提供导入名称的替身模块导入，测试结束后移除"""
+    try:
+        import pymongo  # noqa: F401
+        return importlib.import_module(SERVER_MODULE)
+    except ImportError:
+        pass
+    
+    class PyMongoError(Exception):
+        pass
+    
+    pymongo = types.ModuleType('pymongo')
+    pymongo.MongoClient = None
+    errors = types.ModuleType('pymongo.errors')
+    errors.PyMongoError = PyMongoError
+    errors.ConnectionFailure = type('ConnectionFailure', (PyMongoError,), {})
+    pymongo.errors = errors
+    bson = types.ModuleType('bson')
+    bson.ObjectId = type('ObjectId', (str,), {})
+    json_util = types.ModuleType('bson.json_util')
+    json_util.loads = json.loads
+    json_util.default = str
+    bson.json_util = json_util
+    for name, module in (('pymongo', pymongo), ('pymongo.errors', errors), ('bson', bson), ('bson.json_util', json_util)):
+        monkeypatch.setitem(sys.modules, name, module)
+    
+    monkeypatch.delitem(sys.modules, SERVER_MODULE, raising=False)
+    module = importlib.import_module(SERVER_MODULE)
+    monkeypatch.setitem(sys.modules, SERVER_MODULE, module)
+    return module
+
+class FakeCursor(list):
+    def sort(self, keys):
+        return self
+    
+    def skip(self, count):
+        return FakeCursor(self[count:])
+    
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+class FakeCollection:
+    """集合替身：记录每次驱动调用带的会话；插入重复的 _id 时抛出驱动异常"""
+    
+    def __init__(self, db):
+        self.db = db
+        self.docs = []
+    
+    def insert_one(self, document, session=None):
+        self.db.calls.append((document.get('_id'), session))
+        if any(doc['_id'] == document.get('_id') for doc in self.docs):
+            raise self.db.error(f"E11000 duplicate key error: {document.get('_id')}")
+        document.setdefault('_id', f"id{len(self.docs)}")
+        self.docs.append(document)
+        return SimpleNamespace(inserted_id=document['_id'])
+    
+    def find(self, query, projection=None, session=None):
+        self.db.calls.append(('find', session))
+        return FakeCursor(dict(doc) for doc in self.docs if all(doc.get(k) == v for k, v in query.items()))
+
+class FakeDatabase:
+    def __init__(self, error):
+        self.error = error
+        self.calls = []
+        self.collections = {}
+    
+    @property
+    def sessions(self):
+        return [session for _, session in self.calls]
+    
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(self))
+
+class FakeSession:
+    def __init__(self):
+        self.events = []
+    
+    def start_transaction(self):
+        self.events.append('start')
+    
+    def commit_transaction(self):
+        self.events.append('commit')
+    
+    def abort_transaction(self):
+        self.events.append('abort')
+    
+    def end_session(self):
+        self.events.append('end')
+
+class FakeClient:
+    def __init__(self):
+        self.sessions = []
+    
+    def start_session(self):
+        session = FakeSession()
+        self.sessions.append(session)
+        return session
+
+@pytest.fixture
+def server(mcp):
+    mcp_server = mcp.MongoDBMCPServer('mongodb://localhost:27017')
+    mcp_server.client = FakeClient()
+    mcp_server.db = FakeDatabase(mcp.PyMongoError)
+    yield mcp_server
+    mcp_server.executor.shutdown(wait=True)
+    mcp_server.heavy_executor.shutdown(wait=True)
+
+def insert(doc_id, value=0):
+    return {"tool": "insert_document", "arguments": {"collection_name": "signals", "document": {"_id": doc_id, "v": value}}}
+
+def test_batch_dispatches_in_order(server):
+    calls = [insert('a', 1), insert('b', 2),
+             {"tool": "find_documents", "arguments": {"collection_name": "signals", "query": {"v": 2}}}]
+    status, response = asyncio.run(server.call_batch(calls))
+    
+    assert status == 200
+    assert response['success'] and response['completed'] == response['total'] == 3
+    assert [result['inserted_id'] for result in response['results'][:2]] == ['a', 'b']
+    assert response['results'][2]['documents'] == [{'_id': 'b', 'v': 2}]
+    # 非事务批次的驱动调用不带会话
+    assert server.db.sessions == [None, None, None]
+    assert server.client.sessions == []
+
+@pytest.mark.parametrize('ordered, completed', [(True, 2), (False, 3)])
+def test_failed_item_reported(server, ordered, completed):
+    calls = [insert('a'), insert('a'), insert('c')]
+    status, response = asyncio.run(server.call_batch(calls, ordered=ordered))
+    
+    assert status == 200
+    assert not response['success']
+    assert response['completed'] == completed
+    assert response['failed_index'] == 1
+    assert 'duplicate key' in response['error']
+    assert response['results'][1] == {"success": False, "error": response['error']}
+    assert 'aborted' not in response
+
+def test_invalid_batches_rejected(server):
+    assert asyncio.run(server.call_batch({"tool": "find_documents"}))[0] == 400
+    status, response = asyncio.run(server.call_batch([insert('a'), {"tool": "drop_everything"}]))
+    assert status == 404
+    assert response['error'] == "Unknown tools: drop_everything"
+    # 任何调用都没有执行
+    assert server.db.sessions == []
+
+def test_transaction_commits_with_shared_session(mcp, server):
+    status, response = asyncio.run(server.call_batch([insert('a'), insert('b')], transaction=True))
+    
+    assert status == 200 and response['success'] and response['transaction']
+    session, = server.client.sessions
+    assert server.db.sessions == [session, session]
+    assert session.events == ['start', 'commit', 'end']
+    assert mcp._batch_session.get() is None
+
+def test_transaction_aborts_on_failure(server):
+    status, response = asyncio.run(server.call_batch([insert('a'), insert('a'), insert('c')],
+                                                     transaction=True, ordered=False))
+    
+    # 事务模式下第一个失败就停止并回滚
+    assert status == 200
+    assert response['aborted'] and response['failed_index'] == 1 and response['completed'] == 2
+    assert server.client.sessions[0].events == ['start', 'abort', 'end']
+
+def test_transaction_requires_connection(server):
+    server.client = None
+    status, response = asyncio.run(server.call_batch([insert('a')], transaction=True))
+    assert status == 200
+    assert response == {"success": False, "error": "Not connected to MongoDB"}
+
+def test_session_isolated_between_concurrent_batches(server):
+    async def run_both():
+        return await asyncio.gather(
+            server.call_batch([insert('t1'), insert('t2'), insert('t3')], transaction=True),
+            server.call_batch([insert('p1'), insert('p2'), insert('p3')])
+        )
+    
+    (_, transactional), (_, plain) = asyncio.run(run_both())
+    
+    assert transactional['success'] and plain['success']
+    session, = server.client.sessions
+    by_id = dict(server.db.calls)
+    # 并发执行的非事务批次不会拿到另一个批次的事务会话
+    assert [by_id[doc_id] for doc_id in ('t1', 't2', 't3')] == [session] * 3
+    assert [by_id[doc_id] for doc_id in ('p1', 'p2', 'p3')] == [None] * 3
+
+class RoutingSession:
+    """requests.Session 替身：把客户端的POST请求直接交给服务端路由"""
+    
+    def __init__(self, server):
+        self.server = server
+        self.requests = []
+    
+    def post(self, url, data=None, timeout=None):
+        path = urlsplit(url).path
+        self.requests.append(path)
+        status, payload = asyncio.run(self.server._route('POST', path, data))
+        return SimpleNamespace(status_code=status, json=lambda: payload, raise_for_status=lambda: None)
+
+def test_client_batch_round_trip(server):
+    client = SwarmMongoDBClient('http://localhost:8080')
+    client.session = RoutingSession(server)
+    client.connected = True
+    
+    response = client.batch([
+        ('insert_document', {'collection_name': 'signals', 'document': {'_id': 'a', 'v': 1}}),
+        ('insert_document', {'collection_name': 'signals', 'document': {'_id': 'a', 'v': 2}}),
+        ('find_documents', {'collection_name': 'signals'})
+    ], ordered=False)
+    
+    # 一次往返执行全部调用
+    assert client.session.requests == ['/tools/batch']
+    assert response['completed'] == 3 and response['failed_index'] == 1
+    assert response['results'][2]['documents'] == [{'_id': 'a', 'v': 1}]
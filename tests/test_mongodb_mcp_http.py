@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+MongoDB MCP HTTP服务测试：非法请求返回JSON错误而不是直接断开连接，
+请求头超过上限返回431，空闲或读取缓慢的连接超时关闭
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('pymongo')
+
+from src.mcp.mongodb_mcp_server import MongoDBMCPServer
+
+async def exchange(request: bytes, **settings) -> bytes:
+    """发送原始请求，读取到服务端关闭连接为止；settings 覆盖服务端的上限与超时"""
+    mcp_server = MongoDBMCPServer('mongodb://localhost:27017')
+    for name, value in settings.items():
+        setattr(mcp_server, name, value)
+    server = await mcp_server.start_http_server('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+        mcp_server.shutdown()
+    return response
+
+async def send_raw(request: bytes, **settings):
+    response = await exchange(request, **settings)
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    return status, json.loads(body)
+
+@pytest.mark.parametrize('content_length', ['abc', '-5', '1e3'])
+def test_invalid_content_length_returns_400(content_length):
+    request = (f"POST /tools/list_collections HTTP/1.1\r\nHost: localhost\r\n"
+               f"Content-Length: {content_length}\r\n\r\n{{}}").encode('latin-1')
+    status, payload = asyncio.run(send_raw(request))
+    
+    assert status == 400
+    assert payload == {"success": False, "error": "Invalid Content-Length"}
+
+def test_health_still_served():
+    status, payload = asyncio.run(send_raw(b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"))
+    assert status == 200
+
+def test_too_many_headers_returns_431():
+    extra = ''.join(f"X-Header-{i}: {i}\r\n" for i in range(10))
+    request = f"GET /health HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode('latin-1')
+    status, payload = asyncio.run(send_raw(request, MAX_HEADER_COUNT=5))
+    
+    assert status == 431
+    assert payload == {"success": False, "error": "Request header fields too large"}
+
+def test_oversized_headers_return_431():
+    # 每行都在StreamReader的单行上限内，合计超过请求头总长度上限
+    extra = ''.join(f"X-Header-{i}: {'a' * 30000}\r\n" for i in range(3))
+    request = f"GET /health HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode('latin-1')
+    status, _ = asyncio.run(send_raw(request))
+    assert status == 431
+
+def test_idle_keep_alive_connection_closed():
+    # 第一个请求之后不再发送，服务端在空闲超时后关闭连接
+    response = asyncio.run(exchange(b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n", IDLE_TIMEOUT=0.1))
+    assert response.startswith(b'HTTP/1.1 200')
+    assert response.count(b'HTTP/1.1') == 1
+
+@pytest.mark.parametrize('request_bytes', [
+    b"GET /health HTTP/1.1\r\nHost: localhost\r\n",
+    b"POST /tools/list_collections HTTP/1.1\r\nHost: localhost\r\nContent-Length: 100\r\n\r\n{}"
+], ids=['headers', 'body'])
+def test_stalled_request_times_out(request_bytes):
+    # 请求头或请求体没有发送完，服务端在读取超时后关闭连接，不返回响应
+    assert asyncio.run(exchange(request_bytes, READ_TIMEOUT=0.1)) == b''
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+永动机引擎数据计划测试：相同(端点, 股票)的需求合并为一次请求，失败的仙人改用备用API时复用已请求的URL；
+流式论道按完成先后返回结果，某个请求抛出异常时仍能结束
+"""
+
+import asyncio
+import threading
+import time
+
+from src.jixia.engines.perpetual_engine import APIResult, JixiaPerpetualEngine
+
+class FakeFetch:
+    """_fetch 替身：记录请求的URL；failing 中的服务商返回失败，raising 中的服务商抛出异常，delays 为各服务商的响应延迟"""
+    
+    def __init__(self, failing=(), raising=(), delays=None):
+        self.failing = set(failing)
+        self.raising = set(raising)
+        self.delays = delays or {}
+        self.calls = []
+        self.lock = threading.Lock()
+    
+    def __call__(self, fetch, caller=''):
+        with self.lock:
+            self.calls.append((fetch.url, caller))
+        time.sleep(self.delays.get(fetch.api_name, 0))
+        if fetch.api_name in self.raising:
+            raise RuntimeError(f'{fetch.api_name} exploded')
+        if fetch.api_name in self.failing:
+            return APIResult(success=False, error='HTTP 503')
+        return APIResult(success=True, data={'url': fetch.url}, api_used=fetch.api_name)
+
+def make_engine(fake_fetch):
+    engine = JixiaPerpetualEngine('test-key', disk_cache_path='', usage_ledger_path='')
+    engine._fetch = fake_fetch
+    return engine
+
+def test_shared_urls_fetched_once():
+    fake = FakeFetch()
+    engine = make_engine(fake)
+    plan = engine.compile_debate_plan('TSLA')
+    
+    # 吕洞宾/铁拐李、张果老/曹国舅、韩湘子/蓝采和 的首选请求落到同一个URL
+    assert len(plan.primary_fetches) == 5
+    assert plan.calls_saved == 3
+    
+    results = engine.execute_plan(plan)
+    urls = [url for url, _ in fake.calls]
+    assert sorted(urls) == sorted(plan.primary_fetches)
+    assert all(result.success for result in results.values())
+    assert list(results) == list(engine.immortal_apis)
+    
+    # 共享URL的仙人拿到同一份结果，调用方记为所有共享的仙人
+    assert results['吕洞宾'] is results['铁拐李']
+    assert dict(fake.calls)[plan.chains['张果老'][0].url] == '张果老、曹国舅'
+    assert engine.plan_stats == {'planned_requests': 8, 'fetches': 5}
+
+def test_failover_reuses_fetched_urls():
+    fake = FakeFetch(failing={'alpha_vantage'})
+    engine = make_engine(fake)
+    plan = engine.compile_debate_plan('TSLA')
+    
+    results = engine.execute_plan(plan)
+    
+    # 吕洞宾、铁拐李的备用URL已被其他仙人请求过，直接复用，不再请求
+    assert len(fake.calls) == len(set(url for url, _ in fake.calls)) == 5
+    assert results['吕洞宾'].api_used == 'yahoo_finance_1'
+    assert results['铁拐李'].api_used == 'seeking_alpha'
+    assert engine.plan_stats == {'planned_requests': 10, 'fetches': 5}
+
+def test_fetch_exception_fails_over():
+    fake = FakeFetch(raising={'seeking_alpha'})
+    engine = make_engine(fake)
+    
+    results = engine.execute_plan(engine.compile_debate_plan('TSLA'))
+    
+    assert results['张果老'].success and results['张果老'].api_used == 'alpha_vantage'
+    assert results['曹国舅'].success and results['曹国舅'].api_used == 'alpha_vantage'
+    assert all(result.success for result in results.values())
+
+async def collect(stream):
+    return [item async for item in stream]
+
+def test_stream_yields_in_completion_order():
+    fake = FakeFetch(raising={'seeking_alpha'},
+                     delays={'webull': 0.1, 'alpha_vantage': 0.2, 'seeking_alpha': 0.3})
+    engine = make_engine(fake)
+    
+    streamed = asyncio.run(collect(engine.stream_jixia_debate('TSLA')))
+    
+    names = [name for name, _ in streamed]
+    # 数据先到的仙人先发言；seeking_alpha 抛出异常后，张果老、曹国舅改用已请求过的 alpha_vantage
+    assert set(names[:2]) == {'何仙姑', '汉钟离'}
+    assert set(names[2:4]) == {'韩湘子', '蓝采和'}
+    assert set(names[4:6]) == {'吕洞宾', '铁拐李'}
+    assert set(names[6:]) == {'张果老', '曹国舅'}
+    assert all(result.success for _, result in streamed)
+    assert dict(streamed)['张果老'].api_used == 'alpha_vantage'
+    assert len(fake.calls) == 5
+    assert engine.plan_stats == {'planned_requests': 10, 'fetches': 5}
+
+def test_stream_finishes_when_fetch_raises():
+    fake = FakeFetch(raising={'webull'})
+    engine = make_engine(fake)
+    engine.immortal_apis = {name: engine.immortal_apis[name] for name in ('韩湘子', '蓝采和', '何仙姑')}
+    engine.immortal_apis['韩湘子'].backup = []
+    
+    streamed = dict(asyncio.run(collect(engine.stream_jixia_debate('TSLA'))))
+    
+    # 没有备用API的仙人得到失败结果，其余仙人照常发言
+    assert set(streamed) == {'韩湘子', '蓝采和', '何仙姑'}
+    assert not streamed['韩湘子'].success
+    assert streamed['蓝采和'].api_used == 'alpha_vantage'
+    assert streamed['何仙姑'].success
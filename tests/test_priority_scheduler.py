@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+请求调度器测试：放行即预留令牌，低优先级的批量请求停在其预留余量处
+"""
+
+from src.jixia.engines.jixia_load_balancer import APIResult, JixiaLoadBalancer
+from src.jixia.engines.priority_scheduler import Priority, PriorityScheduler
+from src.jixia.engines.rate_limiter import RateLimiter
+
+LIMITS = {'yh_finance': {'per_minute': 20, 'per_month': 100000}}
+
+def make_scheduler():
+    limiter = RateLimiter(LIMITS, state_path='', threshold=1.0)
+    return limiter, PriorityScheduler(limiter)
+
+def test_admit_reserves_a_token():
+    limiter, scheduler = make_scheduler()
+    assert scheduler.admit('yh_finance', Priority.DEBATE)
+    assert limiter.get_remaining_budget('yh_finance')['minute'] < 20
+    
+    # 归还后预算恢复
+    limiter.release('yh_finance')
+    assert limiter.get_remaining_budget('yh_finance')['minute'] >= 19.99
+
+def test_backfill_stops_at_headroom():
+    limiter, scheduler = make_scheduler()
+    admitted = 0
+    while scheduler.admit('yh_finance', Priority.BACKFILL):
+        admitted += 1
+        assert admitted <= 20
+    
+    assert admitted == 10
+    assert limiter.get_remaining_budget('yh_finance')['minute_ratio'] >= 0.5
+    stats = scheduler.snapshot()[Priority.BACKFILL]
+    assert stats['admitted'] == 10
+    assert stats['shed'] == 1
+    
+    # 剩余预算仍可供交互请求使用
+    assert scheduler.admit('yh_finance', Priority.INTERACTIVE)
+
+def test_interactive_rejected_without_tokens():
+    _, scheduler = make_scheduler()
+    admitted = sum(scheduler.admit('yh_finance', Priority.INTERACTIVE) for _ in range(25))
+    assert admitted == 20
+    assert scheduler.snapshot()[Priority.INTERACTIVE]['shed'] == 0
+
+def test_bulk_backfill_quotes_stop_at_headroom():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.rate_limiter = RateLimiter(LIMITS, state_path='', threshold=1.0)
+    balancer.scheduler = PriorityScheduler(balancer.rate_limiter)
+    balancer.batch_quote_priority = ['yh_finance']
+    balancer.single_quote_priority = []
+    
+    requested = []
+    
+    def fake_fetch_upstream(api_name, data_type, url):
+        requested.append(url)
+        balancer.rate_limiter.record_call(api_name, reserved=True)
+        return APIResult(False, {}, api_name, 0.0, 'HTTP 503', error_class='http_5xx')
+    
+    balancer._fetch_upstream = fake_fetch_upstream
+    balancer.get_quotes([f"S{i:04d}" for i in range(1000)], Priority.BACKFILL)
+    
+    stats = balancer.scheduler.snapshot()[Priority.BACKFILL]
+    assert len(requested) == stats['admitted'] == 10
+    assert balancer.rate_limiter.get_remaining_budget('yh_finance')['minute_ratio'] >= 0.5
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+服务商注册表测试：负载均衡器与模拟服务器的服务商列表都来自注册表
+"""
+
+from src.jixia.engines.jixia_load_balancer import APIHealthChecker, JixiaLoadBalancer
+from src.jixia.engines.provider_registry import get_registry
+
+def test_batch_providers_ordered_by_cost_per_symbol():
+    # yh_finance 单次50只 < yahoo_finance_15 单次20只 < seeking_alpha 单次20只但成本1.5倍
+    assert get_registry().batch_providers_for('stock_quote') == ('yh_finance', 'yahoo_finance_15', 'seeking_alpha')
+
+def test_failover_order_only_lists_capable_providers():
+    registry = get_registry()
+    assert registry.failover_order('seeking_alpha', 'company_overview') == ['seeking_alpha', 'alpha_vantage']
+    assert registry.failover_order('yahoo_finance_1', 'market_news') == ['yahoo_finance_15', 'seeking_alpha']
+
+def test_consumers_derive_from_registry():
+    registry = get_registry()
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    assert balancer.providers == list(registry.routable)
+    assert balancer.batch_quote_priority == list(registry.batch_providers_for('stock_quote'))
+    assert balancer.single_quote_priority == list(registry.providers_for('stock_quote'))
+    assert set(APIHealthChecker().health_status) == set(registry.routable)
+    assert set(balancer.rate_limiter.limits) == set(registry.routable)
+
+def test_fake_server_hosts_come_from_registry():
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+    from fake_rapidapi_server import PROVIDER_HOSTS
+    
+    registry = get_registry()
+    assert PROVIDER_HOSTS == {name: registry.host(name) for name in registry.routable}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+报价字段映射测试：用录制的服务商响应样本检查各服务商的提取结果
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from src.jixia.engines.quote_record import QuoteRecord
+from src.jixia.engines.quote_schema import QUOTE_EXTRACTORS, compile_extractor
+
+FIXTURES_DIR = Path(__file__).parent.parent / 'scripts' / 'fixtures' / 'rapidapi'
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('fixture, source, count, expected', [
+    ('alpha_vantage_quote.json', 'alpha_vantage', 1, QuoteRecord(
+        'AAPL', 193.12, -3.77, -1.9148, 97262077, 'alpha_vantage', 196.94, 191.97, '2024-06-10')),
+    ('yahoo_finance_15_quote.json', 'yahoo_finance_15', 1, QuoteRecord(
+        'TSLA', 304.97, -10.47, -3.4331, 88366946, 'yahoo_finance_15', 308.02, 301.92, 1718049600)),
+    ('yahoo_finance_15_batch.json', 'yahoo_finance_15', 20, QuoteRecord(
+        'AAPL', 71.04, 0.22, 0.3097, 6032582, 'yahoo_finance_15', 71.75, 70.33, 1718049600)),
+    ('yh_finance_quotes.json', 'yh_finance', 30, QuoteRecord(
+        'AAPL', 150.72, -7.43, -4.9297, 47625835, 'yh_finance', 152.23, 149.21, 1718049600)),
+    ('webull_search.json', 'webull', 1, QuoteRecord(
+        'NVDA', 121.79, 0.79, 0.65, 314162684, 'webull', 123.1, 117.01, 1718049600000)),
+    ('seeking_alpha_profile.json', 'seeking_alpha', 5, QuoteRecord(
+        'aapl', 578.31, 6.03, -2.4975, 30851095, 'seeking_alpha', market_cap=1169927311542.0, pe_ratio=70.12))
+])
+def test_extract_recorded_payload(fixture, source, count, expected):
+    extractor = QUOTE_EXTRACTORS[source]
+    payload = load_fixture(fixture)
+    
+    first = extractor.first(payload)
+    assert first.symbol == expected.symbol
+    assert first.source == expected.source
+    for field in ('price', 'change', 'change_percent', 'high', 'low', 'market_cap', 'pe_ratio'):
+        assert getattr(first, field) == pytest.approx(getattr(expected, field)), field
+    assert first.volume == expected.volume
+    assert first.timestamp == expected.timestamp
+    
+    records = extractor.records(payload)
+    assert len(records) == count
+    assert records[0] == first
+
+def test_alternative_path_falls_back():
+    # seeking_alpha 缺少 slug 时使用 id
+    payload = {'data': [{'id': 'msft', 'attributes': {'lastPrice': 1, 'dayChange': 0, 'dayChangePercent': 0,
+                                                      'volume': 10}}]}
+    assert QUOTE_EXTRACTORS['seeking_alpha'].first(payload).symbol == 'msft'
+
+def test_unparseable_items_skipped():
+    payload = {'quoteResponse': {'result': [
+        {'symbol': 'AAPL', 'regularMarketPrice': 'n/a'},
+        {'symbol': 'MSFT', 'regularMarketPrice': 410.5}
+    ]}}
+    extractor = QUOTE_EXTRACTORS['yh_finance']
+    assert [record.symbol for record in extractor.records(payload)] == ['MSFT']
+    with pytest.raises(ValueError):
+        extractor.first(payload)
+
+def test_unknown_field_rejected():
+    with pytest.raises(ValueError):
+        compile_extractor('custom', {'bid': ('bid', 'float')})
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+限速器测试：多个实例（进程）共享同一状态文件时月度计数累加而不是互相覆盖
+"""
+
+import json
+import multiprocessing
+
+from src.jixia.engines.rate_limiter import RateLimiter
+
+LIMITS = {'yh_finance': {'per_minute': 1000, 'per_month': 100000}}
+
+def make_limiter(state_path):
+    return RateLimiter(LIMITS, state_path=state_path, persist_interval=3600)
+
+def record_calls(state_path, count):
+    limiter = make_limiter(state_path)
+    for _ in range(count):
+        limiter.record_call('yh_finance')
+    limiter.flush()
+
+def test_shared_state_path_accumulates(tmp_path):
+    state_path = str(tmp_path / 'rate_limits.json')
+    first = make_limiter(state_path)
+    second = make_limiter(state_path)
+    
+    for _ in range(3):
+        first.record_call('yh_finance')
+    for _ in range(5):
+        second.record_call('yh_finance')
+    first.flush()
+    second.flush()
+    
+    # 后落盘的实例看到两者合计，文件中没有丢失先落盘的计数
+    assert second.get_monthly_calls('yh_finance') == 8
+    assert make_limiter(state_path).get_monthly_calls('yh_finance') == 8
+    
+    # 先落盘的实例在下次落盘时同步到其他实例的调用
+    first.record_call('yh_finance')
+    first.flush()
+    assert first.get_monthly_calls('yh_finance') == 9
+    
+    with open(state_path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['monthly_calls']['yh_finance'] == 9
+
+def test_flush_without_new_calls_is_noop(tmp_path):
+    state_path = str(tmp_path / 'rate_limits.json')
+    limiter = make_limiter(state_path)
+    limiter.record_call('yh_finance')
+    limiter.flush()
+    limiter.flush()
+    assert make_limiter(state_path).get_monthly_calls('yh_finance') == 1
+
+def test_concurrent_processes_share_state_path(tmp_path):
+    state_path = str(tmp_path / 'rate_limits.json')
+    workers = [multiprocessing.Process(target=record_calls, args=(state_path, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    assert make_limiter(state_path).get_monthly_calls('yh_finance') == 200
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+过期数据降级测试：stale-while-revalidate 在宽限期内返回旧数据并只发起一个后台刷新，
+stale-if-error 在所有API都失败时返回宽限期内的旧数据
+"""
+
+import threading
+
+import pytest
+
+from src.jixia.engines import ttl_cache
+from src.jixia.engines.jixia_load_balancer import APIResult, JixiaLoadBalancer
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache, 'time', fake)
+    return fake
+
+class FakeProviders:
+    """_try_api 替身：按调用次数返回递增的价格；failing 时全部失败，blocking 时等待 release"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        self.blocking = False
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+    
+    def __call__(self, api_name, data_type, symbol=None, priority=None):
+        with self.lock:
+            self.calls += 1
+            price = self.calls
+        if self.blocking:
+            self.release.wait(5)
+        if self.failing:
+            return APIResult(False, {}, api_name, 0.0, 'HTTP 503', error_class='http_5xx')
+        return APIResult(True, {'symbol': symbol, 'price': price}, api_name, 0.0)
+
+def make_balancer():
+    balancer = JixiaLoadBalancer('test-key', disk_cache_path='')
+    balancer.adaptive_routing = False
+    balancer._try_api = FakeProviders()
+    return balancer
+
+def wait_for_refreshes(balancer):
+    balancer._refresh_executor.shutdown(wait=True)
+    balancer._refresh_executor = None
+
+def test_fresh_entry_served_from_cache(clock):
+    balancer = make_balancer()
+    assert balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL').data['price'] == 1
+    clock.now += 59
+    cached = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert cached.cached and not cached.stale
+    assert balancer._try_api.calls == 1
+
+def test_stale_while_revalidate_single_refresh(clock):
+    balancer = make_balancer()
+    providers = balancer._try_api
+    balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    
+    # 报价TTL 60秒，宽限期 300秒：过期后立即返回旧数据，只发起一个后台刷新
+    clock.now += 61
+    providers.blocking = True
+    first = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    second = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert first.stale and second.stale
+    assert first.data['price'] == second.data['price'] == 1
+    
+    providers.release.set()
+    wait_for_refreshes(balancer)
+    assert providers.calls == 2
+    stats = balancer.get_request_stats()
+    assert stats['stale_served'] == 2
+    assert stats['background_refreshes'] == 1
+    
+    # 刷新完成后返回新数据
+    refreshed = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert not refreshed.stale
+    assert refreshed.data['price'] == 2
+
+def test_past_grace_period_fetches_synchronously(clock):
+    balancer = make_balancer()
+    balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    clock.now += 60 + 301
+    result = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert not result.cached
+    assert result.data['price'] == 2
+    assert balancer.get_request_stats()['stale_served'] == 0
+
+def test_stale_if_error(clock):
+    balancer = make_balancer()
+    balancer.stale_while_revalidate = False
+    providers = balancer._try_api
+    balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    
+    clock.now += 61
+    providers.failing = True
+    result = balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL')
+    assert result.success and result.stale
+    assert result.data['price'] == 1
+    assert balancer.get_request_stats()['stale_if_error'] == 1
+    
+    # 超过宽限期后不再有旧数据可用
+    clock.now += 300
+    assert not balancer.get_data_for_immortal('吕洞宾', 'stock_quote', 'AAPL').success
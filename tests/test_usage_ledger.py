@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+调用账本测试：分钟/小时/天汇总与永动机引擎的月度计数恢复
+"""
+
+import time
+
+from src.jixia.engines.perpetual_engine import JixiaPerpetualEngine
+from src.jixia.engines.usage_ledger import UsageLedger, get_usage_ledger
+
+# 2024-05-01 10:15:00 UTC
+BASE = 1714558500.0
+
+def test_rollups_by_granularity(tmp_path):
+    ledger = UsageLedger(str(tmp_path / 'usage.db'))
+    try:
+        ledger.record('alpha_vantage', 'stock_quote', 200, 0.2, 100, ts=BASE)
+        ledger.record('alpha_vantage', 'stock_quote', 204, 0.1, 0, ts=BASE + 10)
+        ledger.record('alpha_vantage', 'stock_quote', 503, 0.6, 20, ts=BASE + 70)
+        ledger.record('alpha_vantage', 'stock_quote', 0, 1.0, 0, ts=BASE + 3600)
+        ledger.record('webull', 'stock_quote', 201, 0.3, 50, ts=BASE + 5)
+        
+        minutes = [(row['bucket'], row['provider'], row['calls'], row['errors'])
+                   for row in ledger.usage('minute')]
+        assert minutes == [
+            (BASE - BASE % 60, 'alpha_vantage', 2, 0),
+            (BASE - BASE % 60, 'webull', 1, 0),
+            (BASE - BASE % 60 + 60, 'alpha_vantage', 1, 1),
+            (BASE - BASE % 60 + 3600, 'alpha_vantage', 1, 1)
+        ]
+        
+        hours = {(row['bucket'], row['provider']): row for row in ledger.usage('hour')}
+        first_hour = BASE - BASE % 3600
+        assert hours[(first_hour, 'alpha_vantage')]['calls'] == 3
+        assert hours[(first_hour, 'alpha_vantage')]['errors'] == 1
+        assert hours[(first_hour, 'alpha_vantage')]['bytes'] == 120
+        assert abs(hours[(first_hour, 'alpha_vantage')]['latency_mean'] - 0.3) < 1e-9
+        assert hours[(first_hour, 'alpha_vantage')]['latency_max'] == 0.6
+        assert hours[(first_hour + 3600, 'alpha_vantage')]['calls'] == 1
+        
+        days = ledger.usage('day', provider='alpha_vantage')
+        assert [(row['bucket'], row['calls'], row['errors']) for row in days] == [(BASE - BASE % 86400, 4, 2)]
+        
+        summary = ledger.monthly_summary('2024-05')
+        assert summary['alpha_vantage']['error_rate'] == 0.5
+        assert summary['webull'] == dict(summary['webull'], calls=1, errors=0)
+    finally:
+        ledger.close()
+
+def test_engine_usage_seeded_from_ledger(tmp_path):
+    path = str(tmp_path / 'usage.db')
+    ledger = get_usage_ledger(path)
+    now = time.time()
+    for _ in range(3):
+        ledger.record('alpha_vantage', 'overview', 200, 0.2, ts=now)
+    ledger.record('webull', 'quote', 500, 0.2, ts=now)
+    
+    engine = JixiaPerpetualEngine('test-key', disk_cache_path='', usage_ledger_path=path)
+    assert engine.usage_tracker['alpha_vantage'] == 3
+    assert engine.usage_tracker['webull'] == 1
+    assert engine.usage_tracker['seeking_alpha'] == 0
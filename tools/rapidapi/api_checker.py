@@ -4,10 +4,11 @@ RapidAPI检查工具
 从cauldron_new迁移的简化版本
 """
 
-import requests
 import time
 from typing import Dict, List, Any
 from config.doppler_config import get_rapidapi_key
+from src.jixia.engines.http_pool import get_http_pool, upstream_url
+from src.jixia.engines.provider_registry import get_registry
 
 class RapidAPIChecker:
     """RapidAPI服务检查器"""
@@ -24,6 +25,7 @@ class RapidAPIChecker:
             'X-RapidAPI-Key': self.api_key,
             'Content-Type': 'application/json'
         }
+        self.http = get_http_pool()
     
     def test_api(self, host: str, endpoint: str, params: Dict = None, method: str = 'GET') -> Dict[str, Any]:
         """
@@ -39,13 +41,13 @@ class RapidAPIChecker:
             测试结果
         """
         self.headers['X-RapidAPI-Host'] = host
-        url = f"https://{host}{endpoint}"
+        url = upstream_url(host, endpoint)
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, headers=self.headers, params=params, timeout=8)
+                response = self.http.get(url, headers=self.headers, params=params, timeout=8)
             else:
-                response = requests.post(url, headers=self.headers, json=params, timeout=8)
+                response = self.http.post(url, headers=self.headers, json=params, timeout=8)
             
             return {
                 'success': response.status_code == 200,
@@ -67,23 +69,15 @@ class RapidAPIChecker:
         """检查常用的RapidAPI服务"""
         print("🔍 检查RapidAPI订阅状态")
         
-        # 常用API列表
+        # 常用API列表（主机与测试端点来自服务商注册表）
+        registry = get_registry()
         apis_to_check = [
             {
-                'name': 'Yahoo Finance',
-                'host': 'yahoo-finance15.p.rapidapi.com',
-                'endpoint': '/api/yahoo/qu/quote/AAPL'
-            },
-            {
-                'name': 'Alpha Vantage',
-                'host': 'alpha-vantage.p.rapidapi.com',
-                'endpoint': '/query?function=GLOBAL_QUOTE&symbol=AAPL'
-            },
-            {
-                'name': 'Seeking Alpha',
-                'host': 'seeking-alpha.p.rapidapi.com',
-                'endpoint': '/symbols/get-profile?symbols=AAPL'
+                'name': provider.display_name,
+                'host': provider.host,
+                'endpoint': provider.health_check
             }
+            for provider in (registry.get(name) for name in ('yahoo_finance_15', 'alpha_vantage', 'seeking_alpha'))
         ]
         
         results = {}